@@ -1,12 +1,33 @@
 """后台管理路由"""
-from fastapi import APIRouter, Depends, Query, HTTPException, Body
+from datetime import datetime
+from fastapi import APIRouter, Depends, Path, Query, HTTPException, Body, File, UploadFile, Header
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from sqlalchemy.orm import Session
-from app.db import get_db
+from app.api.deps import (
+    get_archive_service, get_export_service, get_import_service, get_inventory_digest_service,
+    get_inventory_service, get_menu_service, get_option_service, get_order_service,
+)
+from app.events import SSE_HEADERS, order_events, parse_last_event_id, stream_events
+from app.responses import FastJSONResponse
 from app.schemas.dish import DishCreate, DishResponse
-from app.schemas.order import OrderResponse, OrderDetailResponse
-from app.services.menu_service import MenuService
-from app.services.inventory_service import InventoryService
+from app.schemas.order import (
+    OrderResponse, OrderDetailResponse, OrderBulkRequest, OrderBulkCancelRequest, OrderBulkResult,
+)
+from app.services.menu_service import MenuService, VersionConflictError
+from app.services.inventory_digest import BUCKET_WIDTH, MAX_LEAVES, InventoryDigestService, bucket_range
+from app.services.inventory_service import InventoryService, StockBatchError
+from app.schemas.inventory import (
+    InventoryBucketResponse, InventoryDigestCheck, InventoryDigestDiff, InventoryDigestResponse, StockBatchResult,
+)
+from app.schemas.option import (
+    OptionAvailabilityUpdate, OptionCloneRequest, OptionGroupCreate, OptionGroupResponse, OptionGroupUpdate,
+    OptionItemCreate, OptionItemResponse, OptionItemUpdate,
+)
+from app.schemas.imports import ImportReport
+from app.services.archive_service import ArchiveService
+from app.services.export_service import OrderExportService, EXPORT_MEDIA_TYPES
+from app.services.import_service import MenuImportService, IMPORT_CHUNK_SIZE, detect_format, read_records
+from app.services.option_service import OptionInUseError, OptionService
 from app.services.order_service import OrderService
 from pydantic import BaseModel
 from typing import Optional
@@ -20,6 +41,7 @@ class BatchAdjustItem(BaseModel):
 class CategoryCU(BaseModel):
     name: str
     sort_order: int = 0
+    version: Optional[int] = None  # 乐观锁：编辑前读取到的版本号
 
 class DishUpdateDTO(BaseModel):
     name: Optional[str] = None
@@ -28,15 +50,15 @@ class DishUpdateDTO(BaseModel):
     stock: Optional[int] = None
     status: Optional[str] = None
     category_id: Optional[int] = None
+    version: Optional[int] = None  # 乐观锁：编辑前读取到的版本号
 
 
 @router.post("/dishes", response_model=DishResponse, status_code=201)
-def create_dish(dto: DishCreate, db: Session = Depends(get_db)):
+def create_dish(dto: DishCreate, service: MenuService = Depends(get_menu_service)):
     """
     创建菜品
     权限：管理员（本演示暂不验证权限）
     """
-    service = MenuService(db)
     try:
         dish = service.create_dish(
             category_id=dto.category_id,
@@ -55,13 +77,12 @@ def create_dish(dto: DishCreate, db: Session = Depends(get_db)):
 def update_dish_status(
     dish_id: int,
     status: str = Body(..., embed=True, pattern="^(OnShelf|OffShelf)$"),
-    db: Session = Depends(get_db)
+    service: MenuService = Depends(get_menu_service)
 ):
     """
     上下架菜品
     参数：dish_id, status ("OnShelf" | "OffShelf")
     """
-    service = MenuService(db)
     try:
         dish = service.update_dish_status(dish_id, status)
         return DishResponse.model_validate(dish)
@@ -73,30 +94,128 @@ def update_dish_status(
 def adjust_inventory(
     dish_id: int = Query(..., description="菜品ID"),
     delta: int = Query(..., description="调整量（可正可负）"),
-    db: Session = Depends(get_db)
+    service: InventoryService = Depends(get_inventory_service)
 ):
     """
     调整库存
     参数：dish_id, delta (可正可负)
     契约：调用 InventoryService.adjust_stock()
     """
-    service = InventoryService(db)
     try:
         service.adjust_stock(dish_id, delta)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/inventory/adjust-batch", status_code=204)
-def adjust_inventory_batch(items: list[BatchAdjustItem], db: Session = Depends(get_db)):
+@router.post("/inventory/adjust-batch", response_model=StockBatchResult)
+def adjust_inventory_batch(
+    items: list[BatchAdjustItem],
+    atomic: bool = Query(True, description="任一失败是否整体回滚"),
+    service: InventoryService = Depends(get_inventory_service)
+):
     """
     批量调整库存
     入参：[{dish_id:int, delta:int}, ...]
+    返回：{applied: [dish_id], failures: [{dish_id, delta, reason, message, stock}]}
+    异常：atomic=true 且存在失败时返回 400，detail 中包含逐菜品失败明细
+    """
+    try:
+        return service.adjust_stock_batch([(i.dish_id, i.delta) for i in items], atomic=atomic)
+    except StockBatchError as e:
+        raise HTTPException(status_code=400, detail={
+            "message": str(e),
+            "failures": [f.model_dump() for f in e.result.failures],
+        })
+
+
+@router.get("/inventory/digest", response_model=InventoryDigestResponse)
+def get_inventory_digest(
+    level: int = Query(0, ge=0, description="Merkle 树层号（0 为根）"),
+    leaves: Optional[int] = Query(None, ge=1, le=MAX_LEAVES, description="叶子数下限（与对端树形对齐）"),
+    service: InventoryDigestService = Depends(get_inventory_digest_service)
+):
+    """
+    库存摘要（增量维护的 Merkle 树）
+    用法：副本/缓存层比较 root；不同时按 level 逐层取节点，只对不同的节点下钻，
+          到叶子层（level=depth）后用 /inventory/digest/buckets/{bucket} 比较桶内菜品
+    异常：400 - level 超过树高
+    """
+    tree = service.tree(leaves)
+    if level > tree.depth:
+        raise HTTPException(status_code=400, detail=f"层号超出范围：树高为 {tree.depth}")
+    return InventoryDigestResponse(
+        root=tree.root, bucket_width=BUCKET_WIDTH, leaves=tree.leaves, depth=tree.depth,
+        level=level, nodes=tree.level(level),
+    )
+
+
+@router.get("/inventory/digest/buckets/{bucket}", response_model=InventoryBucketResponse)
+def get_inventory_digest_bucket(
+    bucket: int = Path(..., ge=0, description="桶号（dish_id // bucket_width）"),
+    service: InventoryDigestService = Depends(get_inventory_digest_service)
+):
+    """摘要桶详情：已保存的桶摘要与桶内菜品的实时库存"""
+    start, end = bucket_range(bucket)
+    return InventoryBucketResponse(
+        bucket=bucket, start=start, end=end,
+        digest=service.buckets().get(bucket, 0), stock=service.bucket_stock(bucket),
+    )
+
+
+@router.post("/inventory/digest/diff", response_model=InventoryDigestCheck)
+def diff_inventory_digest(
+    dto: InventoryDigestDiff,
+    service: InventoryDigestService = Depends(get_inventory_digest_service)
+):
+    """
+    与对端的桶摘要比较
+    入参：{buckets: {bucket: digest}}（对端用 digest_stock 对其库存副本计算）
+    返回：{ok, buckets: 不一致的桶号}
+    异常：400 - 桶号为负或远超本端最大 dish_id 所在的桶
     """
-    service = InventoryService(db)
     try:
-        service.adjust_stock_batch([(i.dish_id, i.delta) for i in items])
+        buckets = service.diff(dto.buckets)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return InventoryDigestCheck(ok=not buckets, buckets=buckets)
+
+
+@router.get("/inventory/digest/verify", response_model=InventoryDigestCheck)
+def verify_inventory_digest(service: InventoryDigestService = Depends(get_inventory_digest_service)):
+    """
+    校验已保存的摘要与 dishes 表是否一致（全表扫描，运维排查用）
+    返回：{ok, buckets: 不一致的桶号}
+    """
+    buckets = service.verify()
+    return InventoryDigestCheck(ok=not buckets, buckets=buckets)
+
+
+@router.post("/inventory/digest/rebuild")
+def rebuild_inventory_digest(service: InventoryDigestService = Depends(get_inventory_digest_service)):
+    """
+    按 dishes 表全量重算库存摘要（绕过服务直接改表之后）
+    返回：{"buckets": 非空桶数}
+    """
+    return {"buckets": service.rebuild()}
+
+
+@router.post("/import", response_model=ImportReport)
+def import_menu(
+    file: UploadFile = File(..., description="CSV 或 NDJSON 文件"),
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$",
+                               description="文件格式（默认按扩展名推断）"),
+    chunk_size: int = Query(IMPORT_CHUNK_SIZE, ge=1, le=5000, description="每次提交的记录数"),
+    service: MenuImportService = Depends(get_import_service)
+):
+    """
+    批量导入分类、菜品、口味组与选项（按自然键 upsert）
+    上传文件由框架落盘缓冲，服务端逐行解析、分块提交，不整体读入内存
+    返回：ImportReport（各类新增/更新数与错误行）
+    """
+    try:
+        records = read_records(file.file, fmt or detect_format(file.filename))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return service.import_records(records, chunk_size=chunk_size)
 
 
 @router.get("/orders", response_model=List[OrderResponse])
@@ -104,81 +223,179 @@ def list_all_orders(
     status: Optional[str] = Query(None, description="订单状态筛选"),
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(20, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db)
+    service: OrderService = Depends(get_order_service)
 ):
     """
     查看所有订单（后台管理）
     参数：可选按 status 筛选
     """
-    service = OrderService(db)
-    return service.list_orders(user_id=None, status=status, page=page, size=size)
+    return FastJSONResponse(service.list_orders(user_id=None, status=status, page=page, size=size))
+
+@router.get("/orders/export")
+def export_orders(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv|parquet)$", description="导出格式"),
+    start: Optional[datetime] = Query(None, description="起始时间（含）"),
+    end: Optional[datetime] = Query(None, description="截止时间（不含）"),
+    status: Optional[str] = Query(None, description="订单状态筛选"),
+    include_archive: bool = Query(False, description="是否包含已归档订单"),
+    service: OrderExportService = Depends(get_export_service)
+):
+    """
+    流式导出订单（对账用）
+    ndjson：每行一个订单（含明细）；csv / parquet：每行一条订单明细
+    """
+    try:
+        chunks = service.iter_export(
+            fmt, start=start, end=end, status=status, include_archive=include_archive
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def stream():
+        # 响应体在依赖清理之后才开始迭代，由生成器自行归还连接
+        try:
+            yield from chunks
+        finally:
+            service.db.close()
+
+    filename = f"orders.{fmt}"
+    return StreamingResponse(
+        stream(),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/orders/stream")
+async def stream_order_events(
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    订单事件流（SSE）
+    事件：order_created（含明细）、order_completed、order_cancelled；
+    断线重连时浏览器自动携带 Last-Event-ID 补发期间事件，收到 reset 事件应重新加载列表
+    """
+    return StreamingResponse(
+        stream_events(order_events, parse_last_event_id(last_event_id)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@router.post("/orders/archive")
+def archive_orders(
+    older_than_days: Optional[int] = Query(None, ge=0, description="归档下单超过该天数的订单（默认取配置）"),
+    service: ArchiveService = Depends(get_archive_service)
+):
+    """
+    归档历史订单
+    把已完成/已取消的历史订单移入归档表，详情查询仍可读取
+    """
+    archived = service.archive_orders(older_than_days=older_than_days)
+    return {"archived": archived}
+
+
+@router.post("/orders/complete", response_model=OrderBulkResult)
+def complete_orders(dto: OrderBulkRequest, service: OrderService = Depends(get_order_service)):
+    """
+    批量完成订单（后厨"全部出餐"）
+    逻辑：一个事务内条件更新，只有 Submitted 的订单被完成，其余列入 skipped
+    """
+    updated = service.complete_orders(dto.order_ids)
+    return OrderBulkResult(updated=updated, skipped=sorted(set(dto.order_ids) - set(updated)))
+
+
+@router.post("/orders/cancel", response_model=OrderBulkResult)
+def cancel_orders(dto: OrderBulkCancelRequest, service: OrderService = Depends(get_order_service)):
+    """
+    批量取消订单
+    逻辑：一个事务内条件更新，只有 Created / Submitted 的订单被取消，其余列入 skipped；
+         restock 时所有取消订单的菜品数量合并后一次加回库存
+    """
+    updated = service.cancel_orders(dto.order_ids, restock=dto.restock)
+    return OrderBulkResult(updated=updated, skipped=sorted(set(dto.order_ids) - set(updated)))
+
 
 @router.get("/orders/{order_id}", response_model=OrderDetailResponse)
-def get_order_detail_admin(order_id: int, db: Session = Depends(get_db)):
+def get_order_detail_admin(order_id: int, service: OrderService = Depends(get_order_service)):
     """
     管理员查询订单详情（含明细与选项）
     """
-    service = OrderService(db)
     order = service.get_order_by_id(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="订单不存在")
-    return order
+    return FastJSONResponse(order)
 
 
 @router.post("/orders/{order_id}/complete", status_code=204)
-def complete_order(order_id: int, db: Session = Depends(get_db)):
+def complete_order(order_id: int, service: OrderService = Depends(get_order_service)):
     """
     完成订单
     前置条件：status == Submitted
     后置条件：status = Completed
     """
-    service = OrderService(db)
     try:
         service.complete_order(order_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/orders/{order_id}/cancel", status_code=204)
-def cancel_order(order_id: int, db: Session = Depends(get_db)):
+def cancel_order(
+    order_id: int,
+    restock: Optional[bool] = Query(None, description="是否退库存（默认取配置 RESTOCK_ON_CANCEL）"),
+    service: OrderService = Depends(get_order_service)
+):
     """
     取消订单
     前置条件：status in [Created, Submitted]
-    后置条件：status = Cancelled
+    后置条件：status = Cancelled；restock 时库存加回下单数量
     """
-    service = OrderService(db)
     try:
-        service.cancel_order(order_id)
+        service.cancel_order(order_id, restock=restock)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 # ------- Category CRUD -------
 @router.get("/categories")
-def list_categories(db: Session = Depends(get_db)):
-    return MenuService(db).get_all_categories()
+def list_categories(service: MenuService = Depends(get_menu_service)):
+    return service.get_all_categories()
 
 @router.post("/categories")
-def create_category(dto: CategoryCU, db: Session = Depends(get_db)):
-    svc = MenuService(db)
-    cat = svc.create_category(dto.name, dto.sort_order)
-    return {"category_id": cat.category_id, "name": cat.name, "sort_order": cat.sort_order}
+def create_category(dto: CategoryCU, service: MenuService = Depends(get_menu_service)):
+    cat = service.create_category(dto.name, dto.sort_order)
+    return {"category_id": cat.category_id, "name": cat.name, "sort_order": cat.sort_order,
+            "version": cat.version}
 
 @router.patch("/categories/{category_id}")
-def update_category(category_id: int, dto: CategoryCU, db: Session = Depends(get_db)):
-    svc = MenuService(db)
-    cat = svc.update_category(category_id, dto.name, dto.sort_order)
-    return {"category_id": cat.category_id, "name": cat.name, "sort_order": cat.sort_order}
+def update_category(category_id: int, dto: CategoryCU, service: MenuService = Depends(get_menu_service)):
+    """
+    更新分类
+    乐观锁：携带 version 时若已被他人修改返回 409
+    """
+    try:
+        cat = service.update_category(category_id, dto.name, dto.sort_order, expected_version=dto.version)
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"category_id": cat.category_id, "name": cat.name, "sort_order": cat.sort_order,
+            "version": cat.version}
 
 @router.delete("/categories/{category_id}", status_code=204)
-def delete_category(category_id: int, db: Session = Depends(get_db)):
-    MenuService(db).delete_category(category_id)
+def delete_category(category_id: int, service: MenuService = Depends(get_menu_service)):
+    service.delete_category(category_id)
     return {}
 
 @router.patch("/dishes/{dish_id}")
-def update_dish(dish_id: int, dto: DishUpdateDTO, db: Session = Depends(get_db)):
-    svc = MenuService(db)
+def update_dish(dish_id: int, dto: DishUpdateDTO, service: MenuService = Depends(get_menu_service)):
+    """
+    编辑菜品
+    乐观锁：携带 version 时若已被他人修改返回 409
+    """
     try:
-        dish = svc.update_dish(
+        dish = service.update_dish(
             dish_id,
+            expected_version=dto.version,
             name=dto.name,
             price=dto.price,
             image_url=dto.image_url,
@@ -187,11 +404,94 @@ def update_dish(dish_id: int, dto: DishUpdateDTO, db: Session = Depends(get_db))
             category_id=dto.category_id,
         )
         return DishResponse.model_validate(dish)
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.delete("/dishes/{dish_id}", status_code=204)
-def delete_dish(dish_id: int, db: Session = Depends(get_db)):
-    MenuService(db).delete_dish(dish_id)
+def delete_dish(dish_id: int, service: MenuService = Depends(get_menu_service)):
+    service.delete_dish(dish_id)
     return {}
 
+
+# ------- 口味选项管理 -------
+@router.get("/dishes/{dish_id}/options", response_model=List[OptionGroupResponse])
+def list_option_groups(dish_id: int, service: OptionService = Depends(get_option_service)):
+    """菜品的全部选项组（含停售选项）"""
+    return service.list_groups(dish_id)
+
+
+@router.post("/dishes/{dish_id}/options", response_model=OptionGroupResponse, status_code=201)
+def create_option_group(dish_id: int, dto: OptionGroupCreate, service: OptionService = Depends(get_option_service)):
+    """新增选项组（可同时带选项）"""
+    try:
+        return service.create_group(dish_id, dto)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/options/availability")
+def set_option_availability(dto: OptionAvailabilityUpdate, service: OptionService = Depends(get_option_service)):
+    """
+    按选项名批量上下架（如所有菜品的"加辣"停售）
+    返回：{"updated": 更新的选项数}
+    """
+    updated = service.set_availability_by_name(dto.name, dto.available, dto.dish_ids)
+    return {"updated": updated}
+
+
+@router.post("/options/clone")
+def clone_option_groups(dto: OptionCloneRequest, service: OptionService = Depends(get_option_service)):
+    """
+    把一道菜的选项组复制到其他菜品（同名组/选项已存在时跳过）
+    返回：{"groups": 新建组数, "items": 新建选项数}
+    """
+    return service.clone_groups(dto.source_dish_id, dto.target_dish_ids)
+
+
+@router.patch("/options/groups/{group_id}", response_model=OptionGroupResponse)
+def update_option_group(group_id: int, dto: OptionGroupUpdate, service: OptionService = Depends(get_option_service)):
+    try:
+        return service.update_group(group_id, dto)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.delete("/options/groups/{group_id}", status_code=204)
+def delete_option_group(group_id: int, service: OptionService = Depends(get_option_service)):
+    """删除选项组；组内选项已被订单引用时返回 409"""
+    try:
+        service.delete_group(group_id)
+    except OptionInUseError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/options/groups/{group_id}/items", response_model=OptionItemResponse, status_code=201)
+def create_option_item(group_id: int, dto: OptionItemCreate, service: OptionService = Depends(get_option_service)):
+    try:
+        return service.create_item(group_id, dto)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.patch("/options/items/{item_id}", response_model=OptionItemResponse)
+def update_option_item(item_id: int, dto: OptionItemUpdate, service: OptionService = Depends(get_option_service)):
+    try:
+        return service.update_item(item_id, dto)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.delete("/options/items/{item_id}", status_code=204)
+def delete_option_item(item_id: int, service: OptionService = Depends(get_option_service)):
+    """删除选项；已被订单引用时返回 409（应改为停售）"""
+    try:
+        service.delete_item(item_id)
+    except OptionInUseError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
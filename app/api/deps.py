@@ -0,0 +1,60 @@
+"""
+路由依赖：每个请求构造一次服务
+
+服务都依赖 get_db；FastAPI 在同一请求内缓存依赖结果，同一请求用到的多个服务共享同一个惰性会话，
+缓存命中或提前返回的请求不会创建会话，也不会占用连接（见 app/db.py 的 LazySession）。
+测试中覆盖 get_db 即可替换全部服务使用的会话。
+"""
+from fastapi import Depends
+from sqlalchemy.orm import Session
+from app.db import get_db
+from app.services.archive_service import ArchiveService
+from app.services.export_service import OrderExportService
+from app.services.import_service import MenuImportService
+from app.services.inventory_digest import InventoryDigestService
+from app.services.inventory_service import InventoryService
+from app.services.menu_service import MenuService
+from app.services.option_service import OptionService
+from app.services.order_service import OrderService
+from app.services.report_service import ReportService
+from app.services.user_service import UserService
+
+
+def get_menu_service(db: Session = Depends(get_db)) -> MenuService:
+    return MenuService(db)
+
+
+def get_order_service(db: Session = Depends(get_db)) -> OrderService:
+    return OrderService(db)
+
+
+def get_inventory_service(db: Session = Depends(get_db)) -> InventoryService:
+    return InventoryService(db)
+
+
+def get_inventory_digest_service(db: Session = Depends(get_db)) -> InventoryDigestService:
+    return InventoryDigestService(db)
+
+
+def get_option_service(db: Session = Depends(get_db)) -> OptionService:
+    return OptionService(db)
+
+
+def get_user_service(db: Session = Depends(get_db)) -> UserService:
+    return UserService(db)
+
+
+def get_report_service(db: Session = Depends(get_db)) -> ReportService:
+    return ReportService(db)
+
+
+def get_archive_service(db: Session = Depends(get_db)) -> ArchiveService:
+    return ArchiveService(db)
+
+
+def get_export_service(db: Session = Depends(get_db)) -> OrderExportService:
+    return OrderExportService(db)
+
+
+def get_import_service(db: Session = Depends(get_db)) -> MenuImportService:
+    return MenuImportService(db)
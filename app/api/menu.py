@@ -1,8 +1,10 @@
 """菜品浏览路由"""
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Header
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from sqlalchemy.orm import Session
-from app.db import get_db
+from app.api.deps import get_inventory_service, get_menu_service
+from app.events import SSE_HEADERS, parse_last_event_id, stock_events, stream_events
+from app.responses import FastJSONResponse
 from app.schemas.dish import CategoryResponse, DishResponse
 from app.schemas.option import OptionGroupResponse
 from app.services.menu_service import MenuService
@@ -12,13 +14,12 @@ router = APIRouter(prefix="/api", tags=["菜品"])
 
 
 @router.get("/categories", response_model=List[CategoryResponse])
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(service: MenuService = Depends(get_menu_service)):
     """
     获取所有分类
     返回：按 sort_order 排序的分类列表
     """
-    service = MenuService(db)
-    return service.get_all_categories()
+    return FastJSONResponse(service.get_all_categories())
 
 
 @router.get("/dishes", response_model=List[DishResponse])
@@ -26,7 +27,7 @@ def get_dishes(
     category_id: Optional[int] = Query(None, description="分类ID（可选）"),
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(20, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db)
+    service: MenuService = Depends(get_menu_service)
 ):
     """
     分页查询菜品
@@ -36,48 +37,73 @@ def get_dishes(
       - size: 每页数量
     返回：菜品列表
     """
-    service = MenuService(db)
-    return service.get_dishes_by_category(category_id, page, size)
+    return FastJSONResponse(service.get_dishes_by_category(category_id, page, size))
+
+
+@router.get("/dishes/search", response_model=List[DishResponse])
+def search_dishes(
+    q: str = Query(..., min_length=1, max_length=50, description="关键词：菜名、拼音、首字母、分类或口味"),
+    limit: int = Query(20, ge=1, le=100, description="最多返回数量"),
+    service: MenuService = Depends(get_menu_service)
+):
+    """
+    搜索菜品（须声明在 /dishes/{dish_id} 之前）
+    参数：q 以空格分隔多个关键词时须全部命中
+    返回：按相关度排序的菜品列表
+    """
+    return FastJSONResponse(service.search_dishes(q, limit))
 
 
 @router.get("/dishes/{dish_id}", response_model=DishResponse)
-def get_dish_detail(dish_id: int, db: Session = Depends(get_db)):
+def get_dish_detail(dish_id: int, service: MenuService = Depends(get_menu_service)):
     """
     获取菜品详情
     返回：菜品信息
     """
-    service = MenuService(db)
     dish = service.get_dish_detail(dish_id)
     if not dish:
         raise HTTPException(status_code=404, detail="菜品不存在")
-    return DishResponse.model_validate(dish)
+    return FastJSONResponse(DishResponse.model_validate(dish))
 
 
 @router.get("/dishes/{dish_id}/options", response_model=List[OptionGroupResponse])
-def get_dish_options(dish_id: int, db: Session = Depends(get_db)):
+def get_dish_options(dish_id: int, service: MenuService = Depends(get_menu_service)):
     """
     获取菜品的口味选项
     返回：口味组列表
     """
-    service = MenuService(db)
     dish = service.get_dish_detail(dish_id)
     if not dish:
         raise HTTPException(status_code=404, detail="菜品不存在")
     
-    return [OptionGroupResponse.model_validate(group) for group in dish.option_groups]
+    return FastJSONResponse([OptionGroupResponse.model_validate(group) for group in dish.option_groups])
 
 
 @router.get("/stock", response_model=dict)
-def get_stock(dish_id: int = Query(..., description="菜品ID"), db: Session = Depends(get_db)):
+def get_stock(dish_id: int = Query(..., description="菜品ID"), service: InventoryService = Depends(get_inventory_service)):
     """
     查询菜品库存
     参数：dish_id
     返回：{"dish_id": int, "stock": int}
     """
-    service = InventoryService(db)
     try:
         stock = service.get_stock(dish_id)
         return {"dish_id": dish_id, "stock": stock}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+
+@router.get("/stock/stream")
+async def stream_stock_changes(
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    库存变化事件流（SSE）
+    每 100ms 窗口合并一次：{"dishes": [{"dish_id", "delta", "stock"?, "status"?}]}
+    数据仅用于界面提示，下单时仍以服务端库存校验为准
+    """
+    return StreamingResponse(
+        stream_events(stock_events, parse_last_event_id(last_event_id)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
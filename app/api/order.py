@@ -1,15 +1,16 @@
 """订单路由"""
-from fastapi import APIRouter, Depends, Path, HTTPException
-from sqlalchemy.orm import Session
-from app.db import get_db
-from app.schemas.order import OrderCreate, OrderResponse, OrderDetailResponse
+from typing import Optional
+from fastapi import APIRouter, Depends, Path, HTTPException, Query
+from app.api.deps import get_order_service
+from app.responses import FastJSONResponse
+from app.schemas.order import OrderCreate, OrderResponse, OrderDetailResponse, OrderHistoryPage
 from app.services.order_service import OrderService
 
 router = APIRouter(prefix="/api", tags=["订单"])
 
 
 @router.post("/orders", response_model=OrderResponse, status_code=201)
-def create_order(dto: OrderCreate, db: Session = Depends(get_db)):
+def create_order(dto: OrderCreate, service: OrderService = Depends(get_order_service)):
     """
     创建订单
     入参：OrderCreate (user_id, items, remark)
@@ -17,7 +18,6 @@ def create_order(dto: OrderCreate, db: Session = Depends(get_db)):
     返回：{"order_id": int, "total_price": Decimal, "status": "Submitted"}
     异常：400 - 菜品下架/库存不足
     """
-    service = OrderService(db)
     try:
         return service.create_order(dto)
     except ValueError as e:
@@ -25,28 +25,43 @@ def create_order(dto: OrderCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/orders/{order_id}", response_model=OrderDetailResponse)
-def get_order(order_id: int = Path(..., description="订单ID"), db: Session = Depends(get_db)):
+def get_order(order_id: int = Path(..., description="订单ID"), service: OrderService = Depends(get_order_service)):
     """
     查询订单详情
     返回：订单完整信息（含订单项）
     """
-    service = OrderService(db)
     order = service.get_order_by_id(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="订单不存在")
-    return order
+    return FastJSONResponse(order)
 
 
 @router.post("/orders/{order_id}/cancel", status_code=204)
-def cancel_order(order_id: int = Path(..., description="订单ID"), db: Session = Depends(get_db)):
+def cancel_order(order_id: int = Path(..., description="订单ID"), service: OrderService = Depends(get_order_service)):
     """
     取消订单
     前置条件：订单状态允许取消
     后置条件：状态变更为 Cancelled
     """
-    service = OrderService(db)
     try:
         service.cancel_order(order_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+
+@router.get("/users/{user_id}/orders", response_model=OrderHistoryPage)
+def list_user_orders(
+    user_id: int = Path(..., description="用户ID"),
+    limit: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    service: OrderService = Depends(get_order_service)
+):
+    """
+    用户订单历史（keyset 分页，按下单时间倒序）
+    返回：{"items": [订单摘要], "next_cursor": str | null}
+    异常：400 - 游标无效
+    """
+    try:
+        return FastJSONResponse(service.list_user_orders(user_id, limit=limit, cursor=cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,65 @@
+"""报表路由（仪表盘）"""
+from datetime import date, datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from app.api.deps import get_report_service
+from app.responses import FastJSONResponse
+from app.schemas.report import (
+    DishDailyRow, DishRankingRow, CategoryHourlyRow, StatusDailyRow, SalesSummary,
+)
+from app.services.report_service import ReportService
+
+router = APIRouter(prefix="/api/admin/reports", tags=["报表"])
+
+
+@router.get("/summary", response_model=SalesSummary)
+def sales_summary(
+    start: Optional[date] = Query(None, description="起始日期（含，UTC）"),
+    end: Optional[date] = Query(None, description="截止日期（不含，UTC）"),
+    service: ReportService = Depends(get_report_service)
+):
+    """区间汇总：有效订单数、营业额与各状态订单数"""
+    return FastJSONResponse(service.summary(start, end))
+
+
+@router.get("/dishes/daily", response_model=List[DishDailyRow])
+def dish_daily(
+    start: Optional[date] = Query(None, description="起始日期（含，UTC）"),
+    end: Optional[date] = Query(None, description="截止日期（不含，UTC）"),
+    dish_id: Optional[int] = Query(None, description="菜品ID（可选）"),
+    service: ReportService = Depends(get_report_service)
+):
+    """菜品日销量（不含已取消订单）"""
+    return FastJSONResponse(service.dish_daily(start, end, dish_id))
+
+
+@router.get("/dishes/top", response_model=List[DishRankingRow])
+def dish_ranking(
+    start: Optional[date] = Query(None, description="起始日期（含，UTC）"),
+    end: Optional[date] = Query(None, description="截止日期（不含，UTC）"),
+    limit: int = Query(10, ge=1, le=100, description="返回条数"),
+    service: ReportService = Depends(get_report_service)
+):
+    """菜品销售额排行"""
+    return FastJSONResponse(service.dish_ranking(start, end, limit))
+
+
+@router.get("/categories/hourly", response_model=List[CategoryHourlyRow])
+def category_hourly(
+    start: Optional[datetime] = Query(None, description="起始时间（含，UTC）"),
+    end: Optional[datetime] = Query(None, description="截止时间（不含，UTC）"),
+    category_id: Optional[int] = Query(None, description="分类ID（可选）"),
+    service: ReportService = Depends(get_report_service)
+):
+    """分类小时销量（不含已取消订单）"""
+    return FastJSONResponse(service.category_hourly(start, end, category_id))
+
+
+@router.get("/status/daily", response_model=List[StatusDailyRow])
+def status_daily(
+    start: Optional[date] = Query(None, description="起始日期（含，UTC）"),
+    end: Optional[date] = Query(None, description="截止日期（不含，UTC）"),
+    service: ReportService = Depends(get_report_service)
+):
+    """订单状态日统计"""
+    return FastJSONResponse(service.status_daily(start, end))
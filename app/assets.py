@@ -0,0 +1,112 @@
+"""
+静态资源：内容哈希文件名与预压缩变体
+
+部署时运行 scripts/build_assets.py，把 app/static 下的资源复制为
+app/static/dist/<目录>/<文件名>.<内容哈希>.<扩展名>，为文本类资源生成 .br / .gz 预压缩文件，
+并写出 manifest.json（逻辑路径 -> 哈希路径）。
+
+  - asset_url("/static/images/dish_1.jpg") -> "/static/dist/images/dish_1.3f2a9c1b.jpg"
+    （未构建或不在清单中时原样返回）；只在输出时映射，数据库与 API 模型中保存逻辑路径
+  - logical_asset_url：反向映射，写入前把哈希路径还原为逻辑路径
+  - StaticAssets：/static 的挂载点；客户端接受时直接发送预压缩文件，
+    哈希文件名的资源带一年期 immutable 缓存头，其余资源每次协商缓存
+"""
+import json
+import os
+import re
+import threading
+from mimetypes import guess_type
+from typing import Dict, Optional
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+from app.compression import accepted_encodings
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "/static"
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+
+# 文件名中内容哈希的十六进制位数
+HASH_LENGTH = 8
+
+# dist 文件名中的 ".<哈希>"（位于扩展名之前，或文件名末尾）
+_HASH_SUFFIX_RE = re.compile(r"\.[0-9a-f]{%d}(?=(\.[^./]*)?$)" % HASH_LENGTH)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+# (编码, 预压缩文件后缀)，按优先级排列
+PRECOMPRESSED_VARIANTS = (("br", ".br"), ("gzip", ".gz"))
+
+_manifest: Optional[Dict[str, str]] = None
+_manifest_lock = threading.Lock()
+
+
+def manifest_path(static_dir: str = STATIC_DIR) -> str:
+    return os.path.join(static_dir, DIST_DIRNAME, MANIFEST_NAME)
+
+
+def load_manifest(static_dir: str = STATIC_DIR) -> Dict[str, str]:
+    """读取资源清单；未构建时返回空清单"""
+    try:
+        with open(manifest_path(static_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def reload_manifest() -> Dict[str, str]:
+    """重新加载清单（构建资源后调用，或重启进程）"""
+    global _manifest
+    with _manifest_lock:
+        _manifest = load_manifest()
+        return _manifest
+
+
+def asset_url(url: Optional[str]) -> Optional[str]:
+    """把 /static 下的逻辑路径映射为带内容哈希的路径"""
+    if not url or not url.startswith(STATIC_URL + "/"):
+        return url
+    manifest = _manifest if _manifest is not None else reload_manifest()
+    hashed = manifest.get(url[len(STATIC_URL) + 1:])
+    return f"{STATIC_URL}/{DIST_DIRNAME}/{hashed}" if hashed else url
+
+
+def logical_asset_url(url: Optional[str]) -> Optional[str]:
+    """
+    把带内容哈希的 /static/dist 路径还原为逻辑路径
+    "/static/dist/images/dish_1.3f2a9c1b.jpg" -> "/static/images/dish_1.jpg"；其他地址原样返回
+    不依赖当前清单：资源重新构建、旧哈希文件被清理后仍能还原
+    """
+    prefix = f"{STATIC_URL}/{DIST_DIRNAME}/"
+    if not url or not url.startswith(prefix):
+        return url
+    directory, _, name = url[len(prefix):].rpartition("/")
+    name = _HASH_SUFFIX_RE.sub("", name, count=1)
+    return f"{STATIC_URL}/{directory}/{name}" if directory else f"{STATIC_URL}/{name}"
+
+
+class StaticAssets(StaticFiles):
+    """支持预压缩变体与分级缓存头的 StaticFiles"""
+
+    async def get_response(self, path: str, scope):
+        response = None
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding, suffix in PRECOMPRESSED_VARIANTS:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = self.lookup_path(path + suffix)
+            if stat_result is None or scope["method"] not in ("GET", "HEAD"):
+                continue
+            response = self.file_response(full_path, stat_result, scope)
+            media_type, _ = guess_type(path)
+            response.headers["content-type"] = media_type or "application/octet-stream"
+            response.headers["content-encoding"] = encoding
+            break
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["vary"] = "Accept-Encoding"
+            immutable = path.replace("\\", "/").startswith(DIST_DIRNAME + "/")
+            response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        return response
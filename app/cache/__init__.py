@@ -0,0 +1,27 @@
+"""
+缓存子系统：命名空间、TTL + LRU、single-flight、命中率指标与可插拔后端
+
+  from app.cache import Cache, cached
+  user_cache = Cache("user", max_entries=10000)
+
+  class MenuService:
+      @cached("menu.categories", ttl=300, key=lambda: "all")
+      def get_all_categories(self): ...
+
+后端：memory（进程内，默认）、sqlite（同机多进程共享文件）、redis（Redis 兼容服务，app/cache/redis.py）
+"""
+from app.cache.backends import CacheBackend, MemoryBackend, SQLiteBackend
+from app.cache.core import BACKENDS, MISSING, Cache, cached, caches, clear_all, create_backend
+
+__all__ = [
+    "BACKENDS",
+    "MISSING",
+    "Cache",
+    "CacheBackend",
+    "MemoryBackend",
+    "SQLiteBackend",
+    "cached",
+    "caches",
+    "clear_all",
+    "create_backend",
+]
@@ -0,0 +1,196 @@
+"""
+缓存后端
+
+每个命名空间一个后端实例，键为命名空间内的短键（str），值为任意可 pickle 的对象：
+  - MemoryBackend：进程内 OrderedDict，LRU + TTL，直接保存对象（调用方不得修改缓存的值）
+  - SQLiteBackend：同一台机器上多个进程共享的 SQLite 文件（WAL），值以 pickle 保存，
+    按最近访问时间做 LRU 淘汰；适合 uvicorn --workers N 时共享加载代价高的结果
+  - RedisBackend（app/cache/redis.py）：多主机共享
+"""
+import pickle
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# SQLite 每次 IN 查询的键数（低于 SQLITE_MAX_VARIABLE_NUMBER 的默认值）
+SQLITE_BATCH = 500
+
+# SQLite 后端每写入 EVICT_EVERY 次检查一次容量
+EVICT_EVERY = 100
+
+
+def dumps(value: Any) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loads(data: bytes) -> Any:
+    # 共享存储只由本应用写入（SQLite 文件权限 / Redis 访问控制保证），不缓存外部输入
+    return pickle.loads(data)  # nosec B301
+
+
+class CacheBackend(ABC):
+    """后端接口；get_many / set_many 为批量原语，单键操作由其派生（缺少任一方法的子类无法实例化）"""
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """返回命中的 {键: 值}（过期视为未命中）"""
+
+    @abstractmethod
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """写入；ttl 为秒数，None 表示不过期"""
+
+    @abstractmethod
+    def delete(self, keys: Iterable[str]) -> None:
+        """删除键（不存在的键忽略）"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """清空本命名空间"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """当前条目数"""
+
+
+class MemoryBackend(CacheBackend):
+    """进程内 LRU + TTL（线程安全）"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._items.get(key)
+                if entry is None:
+                    continue
+                value, deadline = entry
+                if deadline is not None and deadline <= now:
+                    del self._items[key]
+                    continue
+                self._items.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        deadline = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            for key, value in items.items():
+                self._items[key] = (value, deadline)
+                self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    多进程共享的 SQLite 文件缓存
+    所有命名空间共用 cache_entries 表，键存为 "命名空间:键"；过期时间与访问时间为墙上时钟（跨进程可比）
+    """
+
+    def __init__(self, path: str, namespace: str, max_entries: int = 10000, timeout: float = 5.0):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._prefix = namespace + ":"
+        self._upper = namespace + ";"       # ":" 的下一个字符，[prefix, upper) 即本命名空间
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, accessed_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed ON cache_entries (accessed_at)")
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_BATCH):
+                batch = [self._prefix + key for key in keys[start:start + SQLITE_BATCH]]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM cache_entries WHERE key IN ({','.join('?' * len(batch))})"
+                    " AND (expires_at IS NULL OR expires_at > ?)",
+                    [*batch, now],
+                ).fetchall()
+                for key, value in rows:
+                    found[key[len(self._prefix):]] = loads(value)
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE cache_entries SET accessed_at = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                    )
+        return found
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if self.max_entries <= 0 or not items:
+            return
+        now = time.time()
+        expires_at = None if ttl is None else now + ttl
+        rows = [(self._prefix + key, dumps(value), expires_at, now) for key, value in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._writes += len(rows)
+            if self._writes >= EVICT_EVERY:
+                self._writes = 0
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """删除本命名空间的过期条目，再按最近访问时间淘汰超出容量的条目"""
+        self._conn.execute(
+            "DELETE FROM cache_entries WHERE key >= ? AND key < ? AND expires_at <= ?",
+            (self._prefix, self._upper, now),
+        )
+        excess = self._count() - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                " SELECT key FROM cache_entries WHERE key >= ? AND key < ? ORDER BY accessed_at LIMIT ?)",
+                (self._prefix, self._upper, excess),
+            )
+
+    def _count(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE key >= ? AND key < ?", (self._prefix, self._upper)
+        ).fetchone()[0]
+
+    def delete(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM cache_entries WHERE key = ?", [(self._prefix + k,) for k in keys])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE key >= ? AND key < ?", (self._prefix, self._upper))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,249 @@
+"""
+缓存命名空间与服务方法缓存装饰器
+
+Cache(namespace, ...)：
+  - 键在命名空间内唯一；后端按 backend 参数或 settings.CACHE_BACKEND 创建（memory / sqlite / redis）
+  - TTL（秒，None 不过期）+ 后端的 LRU 容量淘汰
+  - get_or_load / get_many_or_load：未命中时同一进程内同一个键只加载一次（single-flight），
+    并发请求等待首个加载者的结果，避免缓存失效瞬间的击穿；
+    加载期间命名空间发生过失效（代数变化）时不写回，避免把失效前读到的旧值重新缓存
+  - 命中 / 未命中计入 cache_requests_total{cache=命名空间}
+  - 命名空间即失效总线主题：cache.invalidate(keys) 经总线让所有进程丢弃这些键（见 app/invalidation.py）
+  - 后端故障只记录日志，读视为未命中、写忽略，不影响请求
+@cached(namespace, ...)：服务方法按需启用缓存，键由除 self 外的参数生成
+"""
+import functools
+import logging
+import re
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Union
+from app.cache.backends import CacheBackend, MemoryBackend, SQLiteBackend
+from app.config import settings
+from app.invalidation import bus
+from app.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("memory", "sqlite", "redis")
+
+_NAMESPACE_RE = re.compile(r"^[a-z0-9_.]+$")
+
+
+class _Missing:
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+# namespace -> Cache
+caches: Dict[str, "Cache"] = {}
+
+
+def create_backend(kind: str, namespace: str, max_entries: int) -> CacheBackend:
+    """按名称创建命名空间的后端"""
+    if kind == "memory":
+        return MemoryBackend(max_entries)
+    if kind == "sqlite":
+        return SQLiteBackend(settings.CACHE_SQLITE_PATH, namespace, max_entries)
+    if kind == "redis":
+        from app.cache.redis import RedisBackend, RespClient  # pylint: disable=import-outside-toplevel
+        if not settings.CACHE_REDIS_URL:
+            raise ValueError("CACHE_BACKEND=redis 需要配置 CACHE_REDIS_URL")
+        return RedisBackend(RespClient.from_url(settings.CACHE_REDIS_URL), namespace)
+    raise ValueError(f"未知的缓存后端：{kind}（可选 {', '.join(BACKENDS)}）")
+
+
+class _Flight:
+    """一次进行中的加载"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = MISSING
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class Cache:
+    """一个缓存命名空间"""
+
+    def __init__(self, namespace: str, ttl: Optional[float] = None, max_entries: int = 10000,
+                 backend: Union[str, CacheBackend, None] = None):
+        """
+        参数：
+          - namespace: 小写字母、数字、下划线与点；同时是失效总线主题与指标标签
+          - ttl: 默认过期秒数，None 不过期
+          - max_entries: LRU 容量（redis 后端由服务端淘汰）
+          - backend: 后端名称或实例，默认 settings.CACHE_BACKEND
+        异常：命名空间格式错误或重复时抛出 ValueError
+        """
+        if not _NAMESPACE_RE.match(namespace):
+            raise ValueError(f"缓存命名空间格式错误：{namespace}")
+        if namespace in caches:
+            raise ValueError(f"缓存命名空间重复：{namespace}")
+        self.namespace = namespace
+        self.ttl = ttl
+        if not isinstance(backend, CacheBackend):
+            backend = create_backend(backend or settings.CACHE_BACKEND, namespace, max_entries)
+        self.backend = backend
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._generation = 0        # 每次 delete / clear 递增
+        caches[namespace] = self
+        bus.subscribe(namespace, self.delete)
+
+    # ------- 读写 -------
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """返回命中的 {键: 值}"""
+        wanted = {str(key): key for key in keys}
+        if not wanted:
+            return {}
+        try:
+            found = self.backend.get_many(list(wanted))
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("缓存读取失败：%s", self.namespace)
+            found = {}
+        if found:
+            CACHE_REQUESTS.inc(len(found), cache=self.namespace, result="hit")
+        if len(found) < len(wanted):
+            CACHE_REQUESTS.inc(len(wanted) - len(found), cache=self.namespace, result="miss")
+        return {wanted[key]: value for key, value in found.items()}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, items: Dict[Hashable, Any], ttl: Optional[float] = None) -> None:
+        if not items:
+            return
+        try:
+            self.backend.set_many({str(k): v for k, v in items.items()}, self.ttl if ttl is None else ttl)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("缓存写入失败：%s", self.namespace)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    # ------- 加载（single-flight） -------
+    def get_many_or_load(self, keys: Iterable[Hashable],
+                         loader: Callable[[List[Hashable]], Dict[Hashable, Any]],
+                         ttl: Optional[float] = None) -> Dict[Hashable, Any]:
+        """
+        批量读取，未命中的键调用一次 loader(未命中的键) 加载并写回
+        契约：
+          - 其他线程正在加载的键不重复加载，等待其结果
+          - loader 未返回的键视为不存在，不缓存、不出现在结果中
+          - loader 抛出的异常传给所有等待该键的调用方
+          - loader 执行期间发生失效时，结果只返回给本次调用方，不写回缓存
+        """
+        keys = list(dict.fromkeys(keys))
+        found = self.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if not missing:
+            return found
+
+        leading: Dict[Hashable, _Flight] = {}
+        following: Dict[Hashable, _Flight] = {}
+        with self._lock:
+            generation = self._generation
+            for key in missing:
+                flight = self._flights.get(str(key))
+                if flight is None:
+                    flight = self._flights[str(key)] = _Flight()
+                    leading[key] = flight
+                else:
+                    following[key] = flight
+        if leading:
+            try:
+                loaded = loader(list(leading))
+                with self._lock:
+                    # 与 delete 互斥：代数未变说明加载期间没有失效，写回的不是旧值
+                    if self._generation == generation:
+                        self.set_many({key: loaded[key] for key in leading if key in loaded}, ttl)
+                for key, flight in leading.items():
+                    flight.value = loaded.get(key, MISSING)
+                    if flight.value is not MISSING:
+                        found[key] = flight.value
+            except BaseException as e:
+                for flight in leading.values():
+                    flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    for key, flight in leading.items():
+                        self._flights.pop(str(key), None)
+                        flight.done.set()
+        for key, flight in following.items():
+            value = flight.wait()
+            if value is not MISSING:
+                found[key] = value
+        return found
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """单键读取，未命中时加载（single-flight）；loader 的返回值（含 None）都会被缓存"""
+        return self.get_many_or_load([key], lambda keys: {key: loader()}, ttl)[key]
+
+    # ------- 失效 -------
+    def delete(self, keys: Optional[Iterable[Hashable]] = None) -> None:
+        """
+        只在本进程（及共享后端）删除；keys 为 None 时清空命名空间。也是失效总线的回调
+        契约：递增代数，正在进行的加载不再写回
+        """
+        with self._lock:
+            self._generation += 1
+            try:
+                if keys is None:
+                    self.backend.clear()
+                else:
+                    self.backend.delete([str(key) for key in keys])
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("缓存删除失败：%s", self.namespace)
+
+    def clear(self) -> None:
+        self.delete(None)
+
+    def invalidate(self, keys: Optional[Iterable[Hashable]] = None) -> None:
+        """经失效总线让所有进程删除这些键（写事务提交之后调用）；keys 为 None 时清空命名空间"""
+        bus.publish(self.namespace, keys)
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+
+def clear_all() -> None:
+    """清空本进程全部命名空间（测试）"""
+    for cache in list(caches.values()):
+        cache.clear()
+
+
+def _call_key(args: tuple, kwargs: dict) -> str:
+    parts = [repr(arg) for arg in args]
+    parts.extend(f"{name}={value!r}" for name, value in sorted(kwargs.items()))
+    return ",".join(parts) or "_"
+
+
+def cached(namespace: str, ttl: Optional[float] = None, key: Optional[Callable[..., Hashable]] = None,
+           max_entries: int = 10000, backend: Union[str, CacheBackend, None] = None):
+    """
+    服务方法缓存装饰器
+    参数：key(*args, **kwargs) 由除 self 外的参数生成缓存键，默认取参数的 repr
+    契约：
+      - 返回值须可 pickle（跨进程后端），且不能是绑定会话的 ORM 对象（应返回 DTO）
+      - 写操作后调用 方法.cache.invalidate(...) 或 bus.publish(namespace, ...)
+    """
+    def decorator(fn):
+        cache = Cache(namespace, ttl=ttl, max_entries=max_entries, backend=backend)
+
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            cache_key = key(*args, **kwargs) if key is not None else _call_key(args, kwargs)
+            return cache.get_or_load(cache_key, lambda: fn(self, *args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
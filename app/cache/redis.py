@@ -0,0 +1,167 @@
+"""
+Redis 兼容后端（可选）
+
+不依赖 redis-py：RespClient 是只覆盖缓存所需命令的最小 RESP2 客户端（单连接 + 锁，断线自动重连一次），
+可连接 Redis、KeyDB、Dragonfly 等兼容服务。容量淘汰交给服务端（maxmemory-policy allkeys-lru），
+TTL 使用 SET ... PX。
+"""
+import socket
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+from app.cache.backends import CacheBackend, dumps, loads
+
+# SCAN 每批数量 / DEL 每批键数
+SCAN_COUNT = 1000
+
+
+class RespError(Exception):
+    """服务端返回的错误（-ERR ...）"""
+
+
+class RespClient:
+    """最小 RESP2 客户端（线程安全）"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, timeout: float = 1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 1.0) -> "RespClient":
+        """redis://[:password@]host[:port][/db]"""
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"不支持的缓存地址：{url}（仅支持 redis://）")
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "127.0.0.1", parsed.port or 6379, db, parsed.password, timeout)
+
+    # ------- 连接 -------
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._file = self._sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._file = None
+
+    # ------- 协议 -------
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, bytes):
+                data = arg
+            else:
+                data = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read(self) -> Any:
+        line = self._file.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("缓存服务连接已断开")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            raise RespError(body.decode("utf-8"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("缓存服务连接已断开")
+            return data[:-2]
+        if kind == b"*":
+            count = int(body)
+            return None if count < 0 else [self._read() for _ in range(count)]
+        raise ConnectionError(f"无法解析的缓存服务响应：{line[:20]!r}")
+
+    def _call(self, *args) -> Any:
+        self._sock.sendall(self._encode(args))
+        return self._read()
+
+    def execute(self, *args) -> Any:
+        """
+        执行一条命令
+        契约：连接失效（服务重启、空闲断开）时重连并重试一次；RespError 不重试
+        """
+        with self._lock:
+            for attempt in (0, 1):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt:
+                        raise
+        return None  # pragma: no cover
+
+
+class RedisBackend(CacheBackend):
+    """Redis 兼容服务上的一个命名空间（键为 "命名空间:键"）"""
+
+    def __init__(self, client: RespClient, namespace: str):
+        self.client = client
+        self.namespace = namespace
+        self._prefix = namespace + ":"
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        values = self.client.execute("MGET", *(self._prefix + key for key in keys))
+        return {key: loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        for key, value in items.items():
+            if ttl is None:
+                self.client.execute("SET", self._prefix + key, dumps(value))
+            else:
+                self.client.execute("SET", self._prefix + key, dumps(value), "PX", max(int(ttl * 1000), 1))
+
+    def delete(self, keys: Iterable[str]) -> None:
+        keys = [self._prefix + key for key in keys]
+        for start in range(0, len(keys), SCAN_COUNT):
+            self.client.execute("DEL", *keys[start:start + SCAN_COUNT])
+
+    def _scan(self) -> List[bytes]:
+        """本命名空间的全部键（SCAN 游标遍历，不阻塞服务端）"""
+        keys, cursor = [], "0"
+        while True:
+            cursor, batch = self.client.execute("SCAN", cursor, "MATCH", self._prefix + "*", "COUNT", SCAN_COUNT)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else str(cursor)
+            keys.extend(batch)
+            if cursor == "0":
+                return keys
+
+    def clear(self) -> None:
+        keys = self._scan()
+        for start in range(0, len(keys), SCAN_COUNT):
+            self.client.execute("DEL", *keys[start:start + SCAN_COUNT])
+
+    def __len__(self) -> int:
+        return len(self._scan())
@@ -0,0 +1,147 @@
+"""
+响应压缩中间件（gzip / brotli）
+
+  - 按 Accept-Encoding 协商：优先 br（需安装 brotli），其次 gzip
+  - 只压缩文本类响应（HTML / JSON / CSS / JS / CSV / NDJSON 等），且体积不小于 minimum_size
+  - 已带 Content-Encoding 的响应（如预压缩静态文件）与 text/event-stream 原样透传
+  - 流式响应逐块压缩并 flush，不缓冲整个响应体
+使用纯 ASGI 实现，与 MetricsMiddleware 一致
+"""
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 仅在未安装 brotli 的环境中执行
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/html", "text/plain", "text/css", "text/csv", "text/javascript",
+    "application/json", "application/javascript", "application/x-ndjson",
+    "application/xml", "image/svg+xml",
+)
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """解析 Accept-Encoding，返回 q > 0 的编码集合"""
+    result = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            result.add(name)
+    return result
+
+
+def choose_encoding(accept_encoding: str, allow_brotli: bool = True) -> Optional[str]:
+    """选择响应编码：br > gzip；都不接受时返回 None"""
+    accepted = accepted_encodings(accept_encoding)
+    if allow_brotli and brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """统一 gzip / brotli 的流式压缩接口"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=brotli_quality)
+            self._compress = self._impl.process
+            self._flush = self._impl.flush
+            self._finish = self._impl.finish
+        else:
+            # wbits=31：gzip 封装
+            self._impl = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._compress = self._impl.compress
+            self._flush = lambda: self._impl.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._impl.flush
+
+    def compress(self, data: bytes, more: bool) -> bytes:
+        chunk = self._compress(data)
+        return chunk + (self._flush() if more else self._finish())
+
+
+class CompressionMiddleware:
+    """ASGI 中间件：按阈值压缩文本类响应"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, allow_brotli: bool = True):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.allow_brotli = allow_brotli
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.allow_brotli)
+        if encoding is None or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+                if ("content-encoding" in headers or content_type not in COMPRESSIBLE_TYPES
+                        or message["status"] in (204, 304)):
+                    state["passthrough"] = True
+                    await send(message)
+                else:
+                    # 等到第一块响应体才能判断大小
+                    state["start"] = message
+                return
+
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if state["compressor"] is None:
+                start = state["start"]
+                if not more and len(body) < self.minimum_size:
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+                state["compressor"] = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                del headers["content-length"]
+                # 压缩后的表示与原始字节不同，强 ETag 降为弱 ETag
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                if not more:
+                    compressed = state["compressor"].compress(body, more=False)
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send(start)
+            await send({
+                "type": "http.response.body",
+                "body": state["compressor"].compress(body, more),
+                "more_body": more,
+            })
+
+        await self.app(scope, receive, send_wrapper)
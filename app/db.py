@@ -1,7 +1,9 @@
 """SQLAlchemy 数据库会话管理"""
-from sqlalchemy import create_engine
+from sqlalchemy import String, create_engine
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.sql.functions import FunctionElement
 from app.config import settings
 
 # 创建引擎
@@ -18,12 +20,46 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+class LazySession:
+    """
+    请求级会话代理：第一次访问会话属性（query / execute / commit ...）时才创建 Session
+    契约：
+      - 缓存命中、参数校验失败、提前 404 的请求不创建会话
+      - 连接仍由 Session 在第一条语句时从连接池取出，close() 归还；未创建会话时 close() 无操作
+      - close() 之后再次使用会创建新的会话（流式响应在依赖清理后继续读取时依赖这一点）
+    """
+
+    __slots__ = ("_factory", "_session")
+
+    def __init__(self, factory=None):
+        self._factory = factory or SessionLocal
+        self._session = None
+
+    @property
+    def started(self) -> bool:
+        """是否已创建会话"""
+        return self._session is not None
+
+    def _get(self) -> Session:
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def close(self) -> None:
+        if self._session is not None:
+            session, self._session = self._session, None
+            session.close()
+
+
 def get_db() -> Session:
     """
-    FastAPI 依赖注入：提供数据库会话
+    FastAPI 依赖注入：提供数据库会话（惰性创建，见 LazySession）
     自动管理会话生命周期（yield 后关闭）
     """
-    db = SessionLocal()
+    db = LazySession(SessionLocal)
     try:
         yield db
     finally:
@@ -32,12 +68,97 @@ def get_db() -> Session:
 
 def init_db():
     """
-    创建所有表（开发环境使用）
-    生产环境应使用 Alembic 迁移
+    创建缺失的表并执行结构迁移（幂等，见 app/migrations.py）
+    部署时由 scripts/migrate.py 调用；服务进程按 DB_STARTUP_MODE 决定是否调用
+    """
+    from app.migrations import migrate
+    return migrate(engine)
+
+
+def upsert_increment(db: Session, table, rows: list, key_columns: list, increment_columns: list) -> None:
+    """
+    批量"插入或累加"：主键冲突时把 increment_columns 累加到已有行
+    SQLite: INSERT ... ON CONFLICT DO UPDATE；MySQL: INSERT ... ON DUPLICATE KEY UPDATE
+    其他方言退化为逐行 UPDATE，未命中再 INSERT
     """
-    from app.models import (
-        User, Category, Dish, OptionGroup, OptionItem,
-        Order, OrderItem, order_item_options
-    )
-    Base.metadata.create_all(bind=engine)
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={c: table.c[c] + stmt.excluded[c] for c in increment_columns},
+        )
+        db.execute(stmt, rows)
+    elif dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            {c: table.c[c] + stmt.inserted[c] for c in increment_columns}
+        )
+        db.execute(stmt, rows)
+    else:
+        from sqlalchemy import and_, insert, update
+        for row in rows:
+            result = db.execute(
+                update(table)
+                .where(and_(*(table.c[k] == row[k] for k in key_columns)))
+                .values({c: table.c[c] + row[c] for c in increment_columns})
+            )
+            if result.rowcount == 0:
+                db.execute(insert(table).values(row))
+
+
+def insert_ignore(db: Session, table, rows: list, key_columns: list) -> None:
+    """
+    批量"插入，已存在则跳过"：唯一键冲突不报错，并发插入同一行时只有一个生效
+    SQLite: INSERT ... ON CONFLICT DO NOTHING；MySQL: INSERT IGNORE
+    其他方言退化为逐行在 SAVEPOINT 中插入，捕获唯一约束冲突
+    """
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        db.execute(dialect_insert(table).on_conflict_do_nothing(index_elements=key_columns), rows)
+    elif dialect == "mysql":
+        from sqlalchemy import insert
+        db.execute(insert(table).prefix_with("IGNORE"), rows)
+    else:
+        from sqlalchemy import insert
+        from sqlalchemy.exc import IntegrityError
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(table).values(row))
+            except IntegrityError:
+                pass
+
+
+class group_concat(FunctionElement):
+    """
+    字符串聚合：按 separator 拼接组内的 expr
+    SQLite: group_concat(x, sep)；MySQL: GROUP_CONCAT(x SEPARATOR sep)（第二个参数会被当作值拼接）；
+    PostgreSQL: string_agg(x, sep)
+    """
+    type = String()
+    inherit_cache = True
+    name = "group_concat"
+
+
+@compiles(group_concat)
+def _compile_group_concat(element, compiler, **kw):
+    return "group_concat(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(group_concat, "mysql")
+def _compile_group_concat_mysql(element, compiler, **kw):
+    expr, separator = list(element.clauses)
+    return "GROUP_CONCAT(%s SEPARATOR %s)" % (compiler.process(expr, **kw), compiler.process(separator, **kw))
+
 
+@compiles(group_concat, "postgresql")
+def _compile_group_concat_postgresql(element, compiler, **kw):
+    return "string_agg(%s)" % compiler.process(element.clauses, **kw)
@@ -0,0 +1,218 @@
+"""
+进程内事件广播（Server-Sent Events）
+
+EventBroadcaster：
+  - publish() 可在任意线程调用（同步路由运行在线程池中），事件按序分配递增 id
+  - 最近 history 条事件保存在环形缓冲区，订阅时携带 Last-Event-ID 即可补发断线期间的事件；
+    若所需事件已被挤出缓冲区，先发送 reset 事件，客户端应重新全量加载
+  - 每个订阅者一个有界 asyncio.Queue；消费过慢导致队列写满时断开该订阅者，由客户端重连续传
+StockChangeCoalescer：把短时间内的大量库存变化合并为一个事件，避免高峰期刷屏
+事件只在本进程内广播：多 worker 部署时每个 worker 各自广播自己处理的请求
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Set
+
+# 心跳间隔（秒）：保持连接并让代理不因空闲断开
+SSE_HEARTBEAT_SECONDS = 15.0
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # 关闭 Nginx 缓冲
+}
+
+
+@dataclass(frozen=True)
+class Event:
+    """广播事件"""
+    id: int
+    type: str
+    data: dict
+
+
+class Subscription:
+    """单个订阅者：事件队列 + 所属事件循环"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def deliver(self, event: Optional[Event]) -> None:
+        """在订阅者的事件循环中执行；None 表示结束"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """取下一个事件；超时抛出 asyncio.TimeoutError"""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventBroadcaster:
+    """进程内一对多事件广播"""
+
+    def __init__(self, history: int = 1000, queue_size: int = 1000):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._subscribers: Set[Subscription] = set()
+        self._queue_size = queue_size
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            return self._history[-1].id if self._history else 0
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type: str, data: dict) -> Event:
+        """
+        发布事件（线程安全）
+        data 须可 JSON 序列化
+        """
+        with self._lock:
+            event = Event(id=next(self._ids), type=event_type, data=data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, event)
+            except RuntimeError:
+                # 订阅者的事件循环已关闭
+                self._discard(sub)
+        return event
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> "tuple[Subscription, List[Event]]":
+        """
+        订阅（须在事件循环内调用）
+        返回：(订阅, 需补发的事件)；缓冲区已不包含 last_event_id 之后的全部事件时，补发列表以 reset 事件开头
+        """
+        sub = Subscription(asyncio.get_running_loop(), self._queue_size)
+        with self._lock:
+            self._subscribers.add(sub)
+            backlog: List[Event] = []
+            if last_event_id is not None:
+                backlog = [e for e in self._history if e.id > last_event_id]
+                oldest = self._history[0].id if self._history else 1
+                newest = self._history[-1].id if self._history else 0
+                # 缺口已被挤出缓冲区，或 id 来自重启前的进程
+                if last_event_id < oldest - 1 or last_event_id > newest:
+                    reset_id = backlog[0].id - 1 if backlog else newest
+                    backlog.insert(0, Event(id=reset_id, type="reset", data={}))
+        return sub, backlog
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._discard(sub)
+
+    def _discard(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+
+def format_sse(event: Event) -> bytes:
+    """按 text/event-stream 格式编码一个事件"""
+    data = json.dumps(event.data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {event.id}\nevent: {event.type}\ndata: {data}\n\n".encode("utf-8")
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """解析 Last-Event-ID 请求头；非法值视为未提供"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def stream_events(broadcaster: EventBroadcaster, last_event_id: Optional[int] = None,
+                        heartbeat: float = SSE_HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+    """
+    SSE 响应体生成器
+    先补发断线期间的事件，再持续推送新事件；空闲时发送注释行作为心跳
+    """
+    sub, backlog = broadcaster.subscribe(last_event_id)
+    try:
+        yield b"retry: 3000\n\n"
+        for event in backlog:
+            yield format_sse(event)
+        while True:
+            try:
+                event = await sub.get(timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if event is None:
+                return
+            yield format_sse(event)
+    finally:
+        broadcaster.unsubscribe(sub)
+
+
+class StockChangeCoalescer:
+    """
+    库存变化合并器
+    时间窗口（默认 100ms）内同一菜品的多次变化合并为一项，窗口结束时发布一个 stock 事件：
+      {"dishes": [{"dish_id", "delta", "stock"?, "status"?}, ...]}
+    delta 为窗口内累计增减；stock / status 仅在发布方已知变化后的绝对值时出现，
+    且 stock 已包含其后记录的 delta。客户端有 stock 时直接采用，否则按 delta 累加
+    """
+
+    def __init__(self, broadcaster: EventBroadcaster, window: float = 0.1):
+        self.broadcaster = broadcaster
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: Dict[int, dict] = {}
+        self._timer: Optional[threading.Timer] = None
+
+    def record(self, dish_id: int, delta: int = 0, stock: Optional[int] = None,
+               status: Optional[str] = None) -> None:
+        """记录一次库存 / 上下架变化（须在事务提交之后调用）"""
+        with self._lock:
+            entry = self._pending.setdefault(dish_id, {"dish_id": dish_id, "delta": 0})
+            entry["delta"] += delta
+            if stock is not None:
+                entry["stock"] = stock
+            elif "stock" in entry:
+                entry["stock"] += delta
+            if status is not None:
+                entry["status"] = status
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def record_many(self, deltas: Iterable[tuple]) -> None:
+        """批量记录 [(dish_id, delta), ...]"""
+        for dish_id, delta in deltas:
+            self.record(dish_id, delta)
+
+    def flush(self) -> Optional[Event]:
+        """立即发布当前窗口内的变化（定时器到期时自动调用）"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return None
+        return self.broadcaster.publish("stock", {"dishes": list(pending.values())})
+
+
+# 订单事件：order_created / order_completed / order_cancelled
+order_events = EventBroadcaster()
+
+# 库存事件：stock（按窗口合并）
+stock_events = EventBroadcaster()
+stock_changes = StockChangeCoalescer(stock_events)
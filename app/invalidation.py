@@ -0,0 +1,223 @@
+"""
+跨进程缓存失效总线
+
+进程内缓存（选项规则、菜品搜索索引、登录用户）在 `uvicorn --workers N` 或多主机部署时，
+只有处理写请求的那个进程会失效。写入方因此不直接调用缓存，而是发布失效消息：
+  - bus.publish(topic, keys) 先同步通知本进程的订阅者，再交给传输通道广播给其他进程
+  - 缓存模块导入时 bus.subscribe(topic, handler)；handler(keys) 中 keys 为 None 表示该主题全部失效
+传输通道可插拔（bus.start(transport)），由 settings.INVALIDATION_BACKEND 选择：
+  - local：不广播，只在本进程生效（单进程部署、测试）
+  - database（默认）：消息写入 cache_invalidations 表，后台线程每 interval 秒按自增 id 拉取
+    其他进程发布的新消息；失效延迟不超过一个轮询间隔，无需额外服务
+    MySQL / PostgreSQL 上 id 的提交顺序不一定与分配顺序一致：已读到的最大 id 之下尚未出现的 id
+    记为空洞，之后的轮询连同空洞一起查询，晚提交的消息仍会送达；空洞超过 gap_timeout 秒
+    （事务回滚消耗的 id 永远不会出现）后放弃
+    发布方顺带清理超过 retention 秒的旧消息；进程轮询中断超过 retention 时可能漏收，此时全部失效
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.engine import Engine
+from app.config import settings
+from app.metrics import CACHE_INVALIDATIONS
+from app.models.invalidation import cache_invalidations
+
+logger = logging.getLogger(__name__)
+
+# 主题（app/cache 的命名空间同名订阅自己的主题）
+OPTION_RULES = "option_rules"
+MENU_SEARCH = "menu_search"
+MENU_SEARCH_CATEGORIES = "menu_search.categories"
+MENU_CATEGORIES = "menu.categories"
+USERS = "user"
+
+BACKENDS = ("local", "database")
+
+# 发布方每发布 PRUNE_EVERY 条消息清理一次过期消息
+PRUNE_EVERY = 100
+
+# id 空洞等待晚提交消息的秒数，以及同时跟踪的最大空洞数（id 跳跃过大时超出部分不再跟踪）
+GAP_TIMEOUT = 60.0
+MAX_GAPS = 1000
+
+Handler = Callable[[Optional[List]], None]
+Message = Tuple[str, Optional[List]]
+
+
+class DatabaseTransport:
+    """基于 cache_invalidations 表的广播通道"""
+
+    def __init__(self, engine: Engine, interval: float = 1.0, retention: float = 3600.0,
+                 origin: Optional[str] = None, gap_timeout: float = GAP_TIMEOUT):
+        self.engine = engine
+        self.interval = interval
+        self.retention = retention
+        self.gap_timeout = gap_timeout
+        self.origin = origin or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._last_id = 0
+        self._last_poll = 0.0
+        self._sent = 0
+        self._gaps: Dict[int, float] = {}      # 尚未出现的 id -> 发现时间（monotonic）
+
+    def open(self) -> None:
+        """从当前最大 id 开始接收（启动前的消息与本进程无关：缓存此时为空）"""
+        with self.engine.connect() as conn:
+            self._last_id = conn.execute(select(func.max(cache_invalidations.c.id))).scalar() or 0
+        self._last_poll = time.monotonic()
+        self._gaps.clear()
+
+    def send(self, topic: str, keys: Optional[List]) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(cache_invalidations.insert().values(
+                topic=topic,
+                cache_keys=None if keys is None else json.dumps(keys),
+                origin=self.origin,
+                created_at=datetime.utcnow(),
+            ))
+            self._sent += 1
+            if self._sent % PRUNE_EVERY == 0:
+                cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+                conn.execute(delete(cache_invalidations).where(cache_invalidations.c.created_at < cutoff))
+
+    def poll(self) -> Tuple[List[Message], bool]:
+        """
+        拉取上次之后其他进程发布的消息（含此前空洞中晚提交的消息）
+        返回：(消息列表, 是否可能漏收)
+        """
+        now = time.monotonic()
+        missed = now - self._last_poll > self.retention
+        condition = cache_invalidations.c.id > self._last_id
+        if self._gaps:
+            condition = or_(condition, cache_invalidations.c.id.in_(list(self._gaps)))
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(cache_invalidations.c.id, cache_invalidations.c.topic,
+                       cache_invalidations.c.cache_keys, cache_invalidations.c.origin)
+                .where(condition)
+                .order_by(cache_invalidations.c.id)
+            ).all()
+        self._last_poll = now
+        messages = []
+        for row_id, topic, keys, origin in rows:
+            if row_id > self._last_id:
+                for gap in range(self._last_id + 1, min(row_id, self._last_id + 1 + MAX_GAPS - len(self._gaps))):
+                    self._gaps[gap] = now
+                self._last_id = row_id
+            else:
+                self._gaps.pop(row_id, None)
+            if origin != self.origin:
+                messages.append((topic, None if keys is None else json.loads(keys)))
+        for gap, found_at in list(self._gaps.items()):
+            if now - found_at > self.gap_timeout:
+                del self._gaps[gap]
+        return messages, missed
+
+
+class InvalidationBus:
+    """失效总线：本进程订阅者 + 可选的广播通道"""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._transport: Optional[DatabaseTransport] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, keys: Optional[Iterable] = None) -> None:
+        """
+        发布失效消息（在写事务提交之后调用）
+        契约：本进程订阅者同步失效；广播失败只记录日志，不影响已提交的写入
+        """
+        if keys is not None:
+            keys = list(dict.fromkeys(keys))
+            if not keys:
+                return
+        CACHE_INVALIDATIONS.inc(topic=topic, source="local")
+        self._deliver(topic, keys)
+        transport = self._transport
+        if transport is not None:
+            try:
+                transport.send(topic, keys)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("缓存失效消息广播失败：topic=%s", topic)
+
+    def _deliver(self, topic: str, keys: Optional[List]) -> None:
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(keys)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("缓存失效处理失败：topic=%s", topic)
+
+    def reset(self) -> None:
+        """全部主题全部失效"""
+        for topic in list(self._handlers):
+            CACHE_INVALIDATIONS.inc(topic=topic, source="reset")
+            self._deliver(topic, None)
+
+    # ------- 广播通道 -------
+    def start(self, transport: DatabaseTransport, listen: bool = True) -> None:
+        """
+        启用广播通道
+        参数：listen=False 时只发布不接收（命令行脚本）
+        """
+        self.stop()
+        transport.open()
+        self._transport = transport
+        if listen:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._transport = None
+
+    def poll_once(self) -> int:
+        """拉取并处理一次其他进程的消息，返回处理条数"""
+        transport = self._transport
+        if transport is None:
+            return 0
+        messages, missed = transport.poll()
+        if missed:
+            self.reset()
+        for topic, keys in messages:
+            CACHE_INVALIDATIONS.inc(topic=topic, source="remote")
+            self._deliver(topic, keys)
+        return len(messages)
+
+    def _run(self) -> None:
+        transport = self._transport
+        while not self._stop.wait(transport.interval):
+            try:
+                self.poll_once()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("拉取缓存失效消息失败")
+
+
+bus = InvalidationBus()
+
+
+def start_from_settings(engine: Engine, listen: bool = True) -> bool:
+    """按 settings.INVALIDATION_BACKEND 启用广播通道；local 时返回 False"""
+    backend = settings.INVALIDATION_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的缓存失效通道：{backend}（可选 {', '.join(BACKENDS)}）")
+    if backend == "local":
+        return False
+    bus.start(
+        DatabaseTransport(engine, settings.INVALIDATION_POLL_INTERVAL, settings.INVALIDATION_RETENTION),
+        listen=listen,
+    )
+    return True
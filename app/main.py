@@ -1,67 +1,121 @@
 """FastAPI 应用入口"""
+import os
 from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-from app.db import init_db
-from app.api import auth, menu, order, admin
-from fastapi import Request
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from app.assets import STATIC_DIR, StaticAssets
+from app.compression import CompressionMiddleware
+from app.config import settings
+from app.db import engine
+from app.invalidation import bus as invalidation_bus, start_from_settings as start_invalidation
+from app.migrations import bootstrap
+from app.page_cache import PageCache
+from app.metrics import MetricsMiddleware, registry as metrics_registry
+from app.responses import FastJSONResponse
+from app.api import auth, menu, order, admin, reports
 
 # 创建 FastAPI 应用
 app = FastAPI(
     title="点单程序网",
     description="基于 FastAPI + SQLAlchemy 的点单系统（不涉及支付）",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
+# 响应压缩（在指标中间件内层，耗时包含压缩）
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        allow_brotli=settings.COMPRESSION_BROTLI,
+    )
+
+# 指标采集中间件（请求耗时、在途请求数）
+app.add_middleware(MetricsMiddleware)
+
 # 挂载路由
 app.include_router(auth.router)
 app.include_router(menu.router)
 app.include_router(order.router)
 app.include_router(admin.router)
+app.include_router(reports.router)
+
+# 路径按源码位置解析，与启动时的工作目录无关
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(APP_DIR)
 
 # 配置模板
-templates = Jinja2Templates(directory="app/pages")
-# 静态资源（用于菜品图片）
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+templates = Jinja2Templates(directory=os.path.join(APP_DIR, "pages"))
+# 静态资源（用于菜品图片）：哈希文件名长期缓存，优先发送预压缩变体
+app.mount("/static", StaticAssets(directory=STATIC_DIR), name="static")
+
+
+# 页面预渲染缓存（页面不含按请求变化的数据）
+pages = PageCache(
+    templates.env,
+    templates=["index.html", "checkout.html", "admin.html", "order_detail.html"],
+    files={"test": os.path.join(PROJECT_ROOT, "test_frontend.html")},
+    dev_mode=settings.DEV_MODE,
+)
 
 
 @app.on_event("startup")
 def on_startup():
-    """启动时初始化数据库"""
-    init_db()
+    """启动时按 DB_STARTUP_MODE 准备数据库，接入跨进程缓存失效通道，并预渲染页面"""
+    bootstrap(engine, settings.DB_STARTUP_MODE)
+    start_invalidation(engine)
+    metrics_registry.start_flushing()
+    pages.warm()
+    pages.start_watching()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    pages.stop_watching()
+    invalidation_bus.stop()
+    # 最后一次写指标快照，避免汇总的 /metrics 丢失本进程最后的增量
+    metrics_registry.stop_flushing()
 
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
-    """渲染主页（菜品浏览）"""
-    return templates.TemplateResponse("index.html", {"request": request})
+    """主页（菜品浏览）"""
+    return pages.response("index.html", request)
 
 
 @app.get("/checkout", response_class=HTMLResponse)
 async def checkout_page(request: Request):
-    """渲染下单确认页"""
-    return templates.TemplateResponse("checkout.html", {"request": request})
+    """下单确认页"""
+    return pages.response("checkout.html", request)
 
 
 @app.get("/admin", response_class=HTMLResponse)
 async def admin_page(request: Request):
-    """渲染后台管理页"""
-    return templates.TemplateResponse("admin.html", {"request": request})
+    """后台管理页"""
+    return pages.response("admin.html", request)
 
 @app.get("/order/{order_id}", response_class=HTMLResponse)
 async def order_detail_page(request: Request, order_id: int):
-    """渲染订单详情页（JS 调用 API 获取数据）"""
-    return templates.TemplateResponse("order_detail.html", {"request": request})
+    """订单详情页（JS 调用 API 获取数据）"""
+    return pages.response("order_detail.html", request)
 
 @app.get("/health")
 def health_check():
     """健康检查接口"""
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus 指标采集接口"""
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.get("/test", response_class=HTMLResponse)
-async def test_page():
+async def test_page(request: Request):
     """调试页面"""
-    with open("test_frontend.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+    return pages.response("test", request)
 
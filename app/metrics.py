@@ -0,0 +1,405 @@
+"""
+运行时与业务指标
+以 Prometheus 文本格式（0.0.4）暴露计数器、仪表与直方图
+
+设计要点：
+  - 进程内使用普通 dict + 锁累加，热路径只有一次加锁与加法
+  - 多 worker（uvicorn --workers N）时，每个进程定期把快照写入
+    settings.METRICS_MULTIPROC_DIR/metrics_<pid>.json，/metrics 汇总全部进程
+    （请求结束时节流写入，后台线程每 FLUSH_INTERVAL 补写空闲 worker，关闭时再写一次）
+  - 已退出进程的计数器/直方图保留（单调递增），仪表（如在途请求数）丢弃
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 多进程快照写入的最小间隔（秒）
+FLUSH_INTERVAL = 1.0
+
+
+def _format_value(value: float) -> str:
+    """数值格式化：整数不带小数点"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    """拼接标签：{a="1",b="2"}"""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """指标基类：按标签值元组存储样本"""
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 标签不匹配：需要 {self.labelnames}，实际 {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], object]:
+        """返回当前样本副本"""
+        with self._lock:
+            return {k: (list(v) if isinstance(v, list) else v) for k, v in self._values.items()}
+
+    def reset(self) -> None:
+        """清空样本（测试用）"""
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """增加计数"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        """读取当前进程内的计数"""
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """
+    仪表：可增可减
+    可通过 set_function 注册回调，在采集时实时取值（如连接池状态）
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def set_function(self, function: Callable[[], Dict[Tuple[str, ...], float]]) -> None:
+        """注册采集回调：返回 {标签值元组: 数值}"""
+        self._function = function
+
+    def snapshot(self) -> Dict[Tuple[str, ...], object]:
+        if self._function is None:
+            return super().snapshot()
+        try:
+            return dict(self._function())
+        except Exception:  # pylint: disable=broad-except
+            # 采集回调不得影响 /metrics 可用性
+            return {}
+
+
+class Histogram(_Metric):
+    """直方图：样本为 [各桶计数..., sum, count]"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        """记录一次观测值"""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+
+class MetricsRegistry:
+    """指标注册表：负责渲染与多进程汇总"""
+
+    def __init__(self, multiproc_dir: Optional[str] = None):
+        self.multiproc_dir = multiproc_dir
+        self._metrics: Dict[str, _Metric] = {}
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        """注册指标（同名重复注册返回已有实例）"""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def reset(self) -> None:
+        """清空所有样本（测试用）"""
+        for metric in self._metrics.values():
+            metric.reset()
+
+    # ------- 多进程 -------
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.multiproc_dir, f"metrics_{pid}.json")
+
+    def _write(self) -> None:
+        """写快照（调用方持有 _flush_lock）"""
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        data = {
+            name: [[list(key), value] for key, value in metric.snapshot().items()]
+            for name, metric in self._metrics.items()
+        }
+        path = self._snapshot_path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        self._last_flush = time.monotonic()
+
+    def flush(self) -> None:
+        """把当前进程快照原子写入共享目录（不节流）"""
+        if not self.multiproc_dir:
+            return
+        with self._flush_lock:
+            self._write()
+
+    def maybe_flush(self) -> None:
+        """节流写快照：距上次写入超过 FLUSH_INTERVAL 才落盘"""
+        if not self.multiproc_dir or time.monotonic() - self._last_flush < FLUSH_INTERVAL:
+            return
+        if self._flush_lock.acquire(blocking=False):
+            try:
+                self._write()
+            finally:
+                self._flush_lock.release()
+
+    def start_flushing(self, interval: float = FLUSH_INTERVAL) -> None:
+        """
+        启动后台线程定期写快照
+        契约：worker 空闲（没有请求触发 maybe_flush）时最后的增量也会在 interval 内落盘；单进程模式不启动
+        """
+        self.stop_flushing(final=False)
+        if not self.multiproc_dir:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def stop_flushing(self, final: bool = True) -> None:
+        """停止后台线程；final=True 时再写一次快照（进程关闭时调用）"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+        if final:
+            self.flush()
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("写入指标快照失败")
+
+    def _collect(self) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        """汇总样本：单进程直接取快照，多进程合并所有快照文件"""
+        if not self.multiproc_dir:
+            return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+        self.flush()
+        merged: Dict[str, Dict[Tuple[str, ...], object]] = {name: {} for name in self._metrics}
+        for filename in os.listdir(self.multiproc_dir):
+            if not (filename.startswith("metrics_") and filename.endswith(".json")):
+                continue
+            pid = int(filename[len("metrics_"):-len(".json")])
+            alive = _pid_alive(pid)
+            try:
+                with open(os.path.join(self.multiproc_dir, filename), encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, samples in data.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.type == "gauge" and not alive):
+                    continue
+                target = merged[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    if isinstance(value, list):
+                        current = target.get(key) or [0] * len(value)
+                        target[key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        target[key] = target.get(key, 0) + value
+        return merged
+
+    # ------- 渲染 -------
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        collected = self._collect()
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for key, value in sorted(collected.get(name, {}).items()):
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, value):
+                        cumulative += count
+                        labels = _format_labels(metric.labelnames + ("le",), key + (_format_value(bound),))
+                        lines.append(f"{name}_bucket{labels} {_format_value(cumulative)}")
+                    labels = _format_labels(metric.labelnames + ("le",), key + ("+Inf",))
+                    lines.append(f"{name}_bucket{labels} {_format_value(value[-1])}")
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f"{name}_sum{labels} {_format_value(value[-2])}")
+                    lines.append(f"{name}_count{labels} {_format_value(value[-1])}")
+                else:
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    """判断进程是否仍存活"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# 全局注册表
+registry = MetricsRegistry(settings.METRICS_MULTIPROC_DIR)
+
+# ------- HTTP 运行时指标 -------
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（按路由模板）", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "正在处理的 HTTP 请求数", ("method",)
+)
+
+# ------- 数据库连接池 -------
+DB_POOL_CONNECTIONS = registry.gauge(
+    "db_pool_connections", "数据库连接池状态", ("state",)
+)
+
+# ------- 业务指标 -------
+ORDERS_CREATED = registry.counter(
+    "orders_created_total", "成功创建的订单数"
+)
+ORDERS_FAILED = registry.counter(
+    "orders_failed_total", "下单失败次数（按原因）", ("reason",)
+)
+STOCK_DECREMENT_CONFLICTS = registry.counter(
+    "stock_decrement_conflicts_total", "条件扣减库存未命中（rowcount == 0）次数"
+)
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total", "缓存访问次数（命中率 = hit / (hit + miss)）", ("cache", "result")
+)
+CACHE_INVALIDATIONS = registry.counter(
+    "cache_invalidations_total", "缓存失效消息数（local 本进程发布 / remote 其他进程发布 / reset 漏收后全部失效）",
+    ("topic", "source")
+)
+
+
+def _pool_stats() -> Dict[Tuple[str, ...], float]:
+    """读取 SQLAlchemy 连接池状态（不同池实现支持的统计不同）"""
+    from app.db import engine
+    pool = engine.pool
+    stats = {}
+    for state, attr in (("size", "size"), ("checked_out", "checkedout"),
+                        ("checked_in", "checkedin"), ("overflow", "overflow")):
+        method = getattr(pool, attr, None)
+        if callable(method):
+            stats[(state,)] = method()
+    return stats
+
+
+DB_POOL_CONNECTIONS.set_function(_pool_stats)
+
+
+class MetricsMiddleware:
+    """
+    ASGI 中间件：记录每个路由的请求耗时与在途请求数
+    使用纯 ASGI 实现，避免 BaseHTTPMiddleware 对流式响应的缓冲
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec(method=method)
+            # 路由匹配后 FastAPI 会把 APIRoute 写入 scope，使用路径模板避免标签爆炸
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(
+                elapsed, method=method, route=route_path, status=status_holder["status"]
+            )
+            registry.maybe_flush()
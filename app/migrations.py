@@ -0,0 +1,170 @@
+"""
+数据库结构迁移与版本戳
+
+部署时运行一次 `python scripts/migrate.py`：
+  1. create_all 创建缺失的表与索引
+  2. 依次执行版本号大于当前戳的迁移步骤（补齐旧库缺少的列等，均可重复执行）
+  3. 在 schema_version 表写入 SCHEMA_VERSION
+
+服务进程启动时按 settings.DB_STARTUP_MODE 处理：
+  - auto：执行完整迁移（开发环境默认，行为与以前的 init_db 一致）
+  - verify：只读一次版本戳，低于 SCHEMA_VERSION 时拒绝启动（多 worker 生产部署）
+  - skip：不检查
+"""
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, bindparam, func, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+# 当前代码要求的结构版本；新增迁移步骤时同步递增
+SCHEMA_VERSION = 4
+
+STARTUP_MODES = ("auto", "verify", "skip")
+
+# 版本戳表不属于业务模型，单独的 MetaData，verify 时无需导入任何模型
+_version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+class SchemaVersionError(RuntimeError):
+    """数据库结构版本低于代码要求"""
+
+
+def _add_column_if_missing(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """旧库缺少列时补齐（ALTER TABLE ... ADD COLUMN）"""
+    columns = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _v1_version_columns(conn: Connection) -> None:
+    """分类与菜品的乐观锁版本号"""
+    for table in ("categories", "dishes"):
+        _add_column_if_missing(conn, table, "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+def _v2_order_summaries(conn: Connection) -> None:
+    """订单冗余汇总列（total_cents / item_count）+ 用户订单历史覆盖索引，并按明细回填"""
+    from app.models.archive import ArchivedOrder
+    from app.models.order import Order
+    from app.services.export_service import OrderExportService
+    from app.services.pricing import OrderPricer
+
+    models = (Order, ArchivedOrder)
+    for model in models:
+        table = model.__table__
+        _add_column_if_missing(conn, table.name, "total_cents", "INTEGER NOT NULL DEFAULT 0")
+        _add_column_if_missing(conn, table.name, "item_count", "INTEGER NOT NULL DEFAULT 0")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+    # 明细按 order_id 升序分批读出，跨批的同一订单继续累加
+    pricer = OrderPricer()
+    counts = {}
+    with Session(bind=conn) as session:
+        for batch in OrderExportService(session).iter_line_batches(include_archive=True):
+            for line in batch:
+                pricer.add_line(line["order_id"], line["unit_price"], line["qty"], line["option_delta"])
+                counts[line["order_id"]] = counts.get(line["order_id"], 0) + line["qty"]
+    rows = [
+        {"oid": order_id, "total": cents, "count": counts[order_id]}
+        for order_id, cents in pricer.order_totals_cents().items()
+    ]
+    for model in models:
+        table = model.__table__
+        stmt = (
+            update(table)
+            .where(table.c.order_id == bindparam("oid"))
+            .values(total_cents=bindparam("total"), item_count=bindparam("count"))
+        )
+        for start in range(0, len(rows), 1000):
+            conn.execute(stmt, rows[start:start + 1000])
+
+
+def _v3_cache_invalidations(conn: Connection) -> None:
+    """跨进程缓存失效消息表（app/invalidation.py）"""
+    from app.models.invalidation import cache_invalidations
+
+    cache_invalidations.create(conn, checkfirst=True)
+
+
+def _v4_inventory_digest(conn: Connection) -> None:
+    """库存摘要桶表（app/services/inventory_digest.py），按现有库存全量计算"""
+    from app.models.inventory import inventory_digest_buckets
+    from app.services.inventory_digest import InventoryDigestService
+
+    inventory_digest_buckets.create(conn, checkfirst=True)
+    with Session(bind=conn) as session:
+        InventoryDigestService(session).rebuild(commit=False)
+        session.flush()
+
+
+# (版本号, 迁移步骤)，按版本号升序
+MIGRATIONS: List[Tuple[int, Callable[[Connection], None]]] = [
+    (1, _v1_version_columns),
+    (2, _v2_order_summaries),
+    (3, _v3_cache_invalidations),
+    (4, _v4_inventory_digest),
+]
+
+
+def current_version(conn: Connection) -> Optional[int]:
+    """读取版本戳；未迁移过（无版本表）时返回 None"""
+    try:
+        return conn.execute(select(func.max(schema_version.c.version))).scalar()
+    except (OperationalError, ProgrammingError):
+        conn.rollback()
+        return None
+
+
+def migrate(engine: Engine) -> int:
+    """
+    完整迁移（幂等）
+    返回：迁移后的结构版本
+    """
+    from app.db import Base
+    import app.models  # noqa: F401  pylint: disable=import-outside-toplevel,unused-import
+
+    Base.metadata.create_all(bind=engine)
+    _version_metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        version = current_version(conn) or 0
+        for target, step in MIGRATIONS:
+            if target > version:
+                step(conn)
+                conn.execute(schema_version.insert().values(version=target, applied_at=datetime.utcnow()))
+                version = target
+    return version
+
+
+def verify(engine: Engine) -> int:
+    """
+    快速启动检查：只读一次版本戳
+    异常：版本缺失或低于 SCHEMA_VERSION 时抛出 SchemaVersionError
+    """
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version is None or version < SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"数据库结构版本为 {version or 0}，代码要求 {SCHEMA_VERSION}，"
+            f"请先运行 python scripts/migrate.py"
+        )
+    return version
+
+
+def bootstrap(engine: Engine, mode: str) -> Optional[int]:
+    """按启动模式准备数据库"""
+    if mode not in STARTUP_MODES:
+        raise ValueError(f"未知的启动模式：{mode}（可选 {', '.join(STARTUP_MODES)}）")
+    if mode == "auto":
+        return migrate(engine)
+    if mode == "verify":
+        return verify(engine)
+    return None
@@ -3,6 +3,10 @@ from app.models.enums import DishStatus, OrderStatus, OptionType
 from app.models.user import User
 from app.models.dish import Category, Dish, OptionGroup, OptionItem
 from app.models.order import Order, OrderItem, order_item_options
+from app.models.report import DishDailySales, CategoryHourlySales, StatusDailyStats
+from app.models.archive import ArchivedOrder, ArchivedOrderItem, order_item_options_archive
+from app.models.invalidation import cache_invalidations
+from app.models.inventory import inventory_digest_buckets
 
 __all__ = [
     "DishStatus",
@@ -16,5 +20,13 @@ __all__ = [
     "Order",
     "OrderItem",
     "order_item_options",
+    "DishDailySales",
+    "CategoryHourlySales",
+    "StatusDailyStats",
+    "ArchivedOrder",
+    "ArchivedOrderItem",
+    "order_item_options_archive",
+    "cache_invalidations",
+    "inventory_digest_buckets",
 ]
 
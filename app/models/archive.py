@@ -0,0 +1,62 @@
+"""订单归档模型"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Enum as SQLEnum, ForeignKey, Index, Table
+from sqlalchemy.orm import relationship
+from app.db import Base
+from app.models.enums import OrderStatus
+from app.models.order import Order, OrderItem
+
+
+# 归档中间表：order_items_archive <-> option_items
+order_item_options_archive = Table(
+    "order_item_options_archive",
+    Base.metadata,
+    Column("order_item_id", Integer, ForeignKey("order_items_archive.id"), primary_key=True),
+    Column("option_item_id", Integer, ForeignKey("option_items.item_id"), primary_key=True),
+)
+
+
+class ArchivedOrder(Base):
+    """
+    已归档订单（Completed / Cancelled 的历史订单）
+    列与 orders 一致（保留原 order_id），另记录归档时间
+    """
+    __tablename__ = "orders_archive"
+
+    order_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    status = Column(SQLEnum(OrderStatus), nullable=False)
+    remark = Column(String(500), default="")
+    created_at = Column(DateTime, nullable=False, index=True)
+    total_cents = Column(Integer, default=0, server_default="0", nullable=False)
+    item_count = Column(Integer, default=0, server_default="0", nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    items = relationship("ArchivedOrderItem", back_populates="order", cascade="all, delete-orphan")
+
+    # 计价契约与热表订单一致
+    total_price = Order.total_price
+
+
+Index(
+    "ix_orders_archive_user_history",
+    ArchivedOrder.user_id, ArchivedOrder.created_at.desc(), ArchivedOrder.order_id.desc(),
+    ArchivedOrder.status, ArchivedOrder.total_cents, ArchivedOrder.item_count,
+)
+
+
+class ArchivedOrderItem(Base):
+    """已归档订单明细（保留原 id）"""
+    __tablename__ = "order_items_archive"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders_archive.order_id"), nullable=False, index=True)
+    dish_id = Column(Integer, ForeignKey("dishes.dish_id"), nullable=False)
+    qty = Column(Integer, nullable=False)
+    unit_price = Column(Numeric(10, 2), nullable=False)
+
+    order = relationship("ArchivedOrder", back_populates="items")
+    dish = relationship("Dish")
+    selected_options = relationship("OptionItem", secondary=order_item_options_archive)
+
+    subtotal = OrderItem.subtotal
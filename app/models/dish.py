@@ -16,6 +16,7 @@ class Category(Base):
     category_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     name = Column(String(50), nullable=False)
     sort_order = Column(Integer, default=0)  # 排序权重
+    version = Column(Integer, default=1, server_default="1", nullable=False)  # 乐观锁版本号
     
     # 关系：一个分类包含多个菜品
     dishes = relationship("Dish", back_populates="category")
@@ -39,6 +40,7 @@ class Dish(Base):
     image_url = Column(String(500), default="")
     stock = Column(Integer, default=0)  # 库存数量
     status = Column(SQLEnum(DishStatus), default=DishStatus.ON_SHELF, nullable=False)
+    version = Column(Integer, default=1, server_default="1", nullable=False)  # 乐观锁版本号（管理端编辑）
     
     # 关系
     category = relationship("Category", back_populates="dishes")
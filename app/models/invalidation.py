@@ -0,0 +1,17 @@
+"""缓存失效消息表（跨进程失效总线的数据库通道，见 app/invalidation.py）"""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String, Table, Text
+from app.db import Base
+
+
+# 只追加；id 单调递增（sqlite_autoincrement：删除旧消息后不复用 id），各进程按 id 增量拉取
+cache_invalidations = Table(
+    "cache_invalidations",
+    Base.metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("topic", String(50), nullable=False),
+    Column("cache_keys", Text, nullable=True),        # JSON 数组；NULL 表示该主题全部失效
+    Column("origin", String(100), nullable=False),    # 发布进程标识，拉取时跳过自己发布的消息
+    Column("created_at", DateTime, nullable=False, default=datetime.utcnow, index=True),
+    sqlite_autoincrement=True,
+)
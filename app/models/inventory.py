@@ -0,0 +1,13 @@
+"""库存摘要桶（增量校验和，见 app/services/inventory_digest.py）"""
+from sqlalchemy import BigInteger, Column, Integer, Table
+from app.db import Base
+
+
+# bucket = dish_id // BUCKET_WIDTH；digest 为桶内各菜品摘要项之和 mod 2^61-1（累加时短暂位于 [0, 2P)）
+# 没有行的桶摘要视为 0
+inventory_digest_buckets = Table(
+    "inventory_digest_buckets",
+    Base.metadata,
+    Column("bucket", Integer, primary_key=True, autoincrement=False),
+    Column("digest", BigInteger, nullable=False, default=0),
+)
@@ -1,7 +1,7 @@
 """订单模型"""
 from decimal import Decimal
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Enum as SQLEnum, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Enum as SQLEnum, ForeignKey, Index, Table
 from sqlalchemy.orm import relationship
 from app.db import Base
 from app.models.enums import OrderStatus
@@ -28,6 +28,9 @@ class Order(Base):
     status = Column(SQLEnum(OrderStatus), default=OrderStatus.CREATED, nullable=False)
     remark = Column(String(500), default="")  # 备注
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # 冗余汇总（下单时写入）：订单列表直接读取，无需加载明细
+    total_cents = Column(Integer, default=0, server_default="0", nullable=False)  # 总价（分）
+    item_count = Column(Integer, default=0, server_default="0", nullable=False)   # 菜品总份数
     
     # 关系
     user = relationship("User", back_populates="orders")
@@ -68,6 +71,14 @@ class Order(Base):
         self.status = OrderStatus.COMPLETED
 
 
+# 用户订单历史的覆盖索引：按 (created_at, order_id) 倒序做 keyset 分页，摘要列全部在索引内
+Index(
+    "ix_orders_user_history",
+    Order.user_id, Order.created_at.desc(), Order.order_id.desc(),
+    Order.status, Order.total_cents, Order.item_count,
+)
+
+
 class OrderItem(Base):
     """
     订单明细项
@@ -0,0 +1,43 @@
+"""销售汇总（rollup）模型"""
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime
+from app.db import Base
+
+
+class DishDailySales(Base):
+    """
+    菜品日销量
+    统计口径：未取消订单（下单时累加，取消时扣回），按下单时间（UTC）归日
+    """
+    __tablename__ = "sales_dish_daily"
+
+    day = Column(Date, primary_key=True)
+    dish_id = Column(Integer, primary_key=True)     # 不设外键：菜品删除后历史报表仍保留
+    qty = Column(Integer, default=0, nullable=False)
+    order_count = Column(Integer, default=0, nullable=False)
+    revenue_cents = Column(BigInteger, default=0, nullable=False)  # 金额以分为单位，保证累加精确
+
+
+class CategoryHourlySales(Base):
+    """
+    分类小时销量
+    统计口径同 DishDailySales，hour 为截断到整点的下单时间
+    """
+    __tablename__ = "sales_category_hourly"
+
+    hour = Column(DateTime, primary_key=True)
+    category_id = Column(Integer, primary_key=True)
+    qty = Column(Integer, default=0, nullable=False)
+    revenue_cents = Column(BigInteger, default=0, nullable=False)
+
+
+class StatusDailyStats(Base):
+    """
+    订单状态日统计
+    订单状态变化时在原状态 -1、新状态 +1，因此反映各状态的当前订单数与金额
+    """
+    __tablename__ = "sales_status_daily"
+
+    day = Column(Date, primary_key=True)
+    status = Column(String(20), primary_key=True)
+    order_count = Column(Integer, default=0, nullable=False)
+    revenue_cents = Column(BigInteger, default=0, nullable=False)
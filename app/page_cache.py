@@ -0,0 +1,174 @@
+"""
+HTML 页面缓存
+
+页面不含按请求变化的数据，因此启动时一次性编译并渲染为字节，常驻内存：
+  - 同时预先生成 gzip（以及安装 brotli 时的 br）变体，请求时按 Accept-Encoding 直接发送，
+    压缩中间件见到 Content-Encoding 后不再重复压缩
+  - ETag 为内容哈希，If-None-Match 命中时返回 304
+  - 仅在开发模式（settings.DEV_MODE）下感知文件变化：优先用 watchfiles 监听目录，
+    未安装时退化为每次请求检查文件修改时间
+"""
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+from jinja2 import Environment, TemplateError
+from starlette.requests import Request
+from starlette.responses import Response
+from app.compression import accepted_encodings, brotli
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_CONTROL = "no-cache"
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    """一个页面的渲染结果"""
+    body: bytes
+    etag: str
+    mtime: float
+    variants: Dict[str, bytes]   # {"br": ..., "gzip": ...}
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """弱比较：忽略 W/ 前缀与编码后缀"""
+    if header.strip() == "*":
+        return True
+    base = etag.strip('"')
+    for candidate in header.split(","):
+        value = candidate.strip()
+        if value.startswith("W/"):
+            value = value[2:]
+        value = value.strip('"')
+        if value == base or value.startswith(base + "-"):
+            return True
+    return False
+
+
+class PageCache:
+    """预渲染页面缓存"""
+
+    def __init__(self, env: Environment, templates: Iterable[str] = (),
+                 files: Optional[Dict[str, str]] = None, dev_mode: bool = False):
+        """
+        参数：
+          - templates: Jinja2 模板名（在 env 的模板目录中）
+          - files: {页面名: 文件路径}，原样发送的静态 HTML
+          - dev_mode: 是否在文件变化后重新渲染
+        """
+        self.env = env
+        self.dev_mode = dev_mode
+        self._sources: Dict[str, tuple] = {name: ("template", name) for name in templates}
+        for name, path in (files or {}).items():
+            self._sources[name] = ("file", os.path.abspath(path))
+        self._pages: Dict[str, CachedPage] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    # ------- 渲染 -------
+    def _path(self, name: str) -> str:
+        kind, source = self._sources[name]
+        if kind == "file":
+            return source
+        return self.env.get_template(source).filename
+
+    def _render(self, name: str) -> CachedPage:
+        kind, source = self._sources[name]
+        path = self._path(name)
+        mtime = os.stat(path).st_mtime
+        if kind == "template":
+            text = self.env.get_template(source).render()
+        else:
+            with open(source, "r", encoding="utf-8") as f:
+                text = f.read()
+        body = text.encode("utf-8")
+        variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(body, quality=11)
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        return CachedPage(body=body, etag=etag, mtime=mtime, variants=variants)
+
+    def warm(self) -> None:
+        """
+        启动时渲染全部页面
+        契约：单个页面渲染失败（文件缺失、模板错误）只记录日志并跳过，该页面在首次请求时再渲染
+        """
+        for name in self._sources:
+            try:
+                self.get(name)
+            except (OSError, TemplateError):
+                logger.exception("页面预渲染失败，已跳过：%s", name)
+
+    def get(self, name: str) -> CachedPage:
+        """取页面；开发模式且未启用监听时按修改时间判断是否重新渲染"""
+        page = self._pages.get(name)
+        if page is not None and self.dev_mode and self._watcher is None:
+            try:
+                if os.stat(self._path(name)).st_mtime != page.mtime:
+                    page = None
+            except FileNotFoundError:
+                page = None
+        if page is None:
+            with self._lock:
+                page = self._render(name)
+                self._pages[name] = page
+        return page
+
+    def invalidate(self, paths: Optional[Iterable[str]] = None) -> None:
+        """丢弃缓存；paths 为空时全部丢弃，否则只丢弃对应文件的页面"""
+        with self._lock:
+            if paths is None:
+                self._pages.clear()
+                return
+            changed = {os.path.abspath(p) for p in paths}
+            for name in list(self._pages):
+                if os.path.abspath(self._path(name)) in changed:
+                    del self._pages[name]
+
+    # ------- 响应 -------
+    def response(self, name: str, request: Request) -> Response:
+        """按 If-None-Match / Accept-Encoding 返回 304、预压缩变体或原始字节"""
+        page = self.get(name)
+        headers = {"Cache-Control": PAGE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if _etag_matches(request.headers.get("if-none-match", ""), page.etag):
+            return Response(status_code=304, headers={**headers, "ETag": page.etag})
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in page.variants:
+                headers["Content-Encoding"] = encoding
+                headers["ETag"] = f'{page.etag[:-1]}-{encoding}"'
+                return Response(page.variants[encoding], media_type="text/html", headers=headers)
+        headers["ETag"] = page.etag
+        return Response(page.body, media_type="text/html", headers=headers)
+
+    # ------- 开发模式监听 -------
+    def start_watching(self) -> bool:
+        """启动 watchfiles 监听线程；未安装 watchfiles 时返回 False（退化为修改时间检查）"""
+        if not self.dev_mode or self._watcher is not None:
+            return False
+        try:
+            import watchfiles  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            return False
+        dirs = sorted({os.path.dirname(self._path(name)) for name in self._sources})
+
+        def run():
+            for changes in watchfiles.watch(*dirs, stop_event=self._stop, yield_on_timeout=False):
+                self.invalidate(path for _, path in changes)
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=run, name="page-cache-watcher", daemon=True)
+        self._watcher.start()
+        return True
+
+    def stop_watching(self) -> None:
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join(timeout=5)
+        self._watcher = None
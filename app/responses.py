@@ -0,0 +1,50 @@
+"""
+JSON 响应序列化
+
+FastJSONResponse 作为应用默认响应类：用 orjson 直接把内容编码为字节，
+Decimal 按字符串输出（与 FastAPI 默认的 "12.50" 格式一致），datetime 输出 ISO 8601，
+Pydantic 模型通过 model_dump() 展开。未安装 orjson 时退化为标准库 json，输出相同。
+
+路由直接返回 FastJSONResponse(已构造好的模型) 时，FastAPI 不再按 response_model
+重新校验与 jsonable_encoder 转换；response_model 仍保留用于 OpenAPI 文档。
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 仅在未安装 orjson 的环境中执行
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """orjson / json 无法原生编码的类型"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if orjson is None and isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型：{type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """编码为 UTF-8 JSON 字节"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """基于 orjson 的 JSON 响应"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,7 +1,8 @@
 """菜品相关 DTO"""
 from decimal import Decimal
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
+from app.assets import asset_url
 
 
 class CategoryResponse(BaseModel):
@@ -9,6 +10,7 @@ class CategoryResponse(BaseModel):
     category_id: int
     name: str
     sort_order: int
+    version: int = 1
     
     class Config:
         """Pydantic 配置"""
@@ -23,6 +25,16 @@ class DishResponse(BaseModel):
     image_url: str
     stock: int
     status: str
+    version: int = 1
+
+    @computed_field
+    @property
+    def image_src(self) -> str:
+        """
+        页面展示用的图片地址：/static 下的图片换成带内容哈希的地址（已构建资源时）
+        只读；image_url 保持逻辑路径，编辑表单回写时不会把哈希路径存进数据库
+        """
+        return asset_url(self.image_url)
     
     class Config:
         """Pydantic 配置"""
@@ -0,0 +1,59 @@
+"""菜单批量导入 DTO"""
+from decimal import Decimal
+from typing import Dict, List
+from pydantic import BaseModel, Field
+
+
+class CategoryImport(BaseModel):
+    """分类行：自然键 name"""
+    name: str = Field(..., min_length=1, max_length=50)
+    sort_order: int = 0
+
+
+class DishImport(BaseModel):
+    """菜品行：自然键 name，所属分类按名称引用"""
+    category: str = Field(..., min_length=1, max_length=50)
+    name: str = Field(..., min_length=1, max_length=100)
+    price: Decimal = Field(..., gt=0)
+    stock: int = Field(default=0, ge=0)
+    status: str = Field(default="OnShelf", pattern="^(OnShelf|OffShelf)$")
+    image_url: str = ""
+
+
+class OptionGroupImport(BaseModel):
+    """口味组行：自然键 (dish, name)"""
+    dish: str = Field(..., min_length=1, max_length=100)
+    name: str = Field(..., min_length=1, max_length=50)
+    type: str = Field(default="Single", pattern="^(Single|Multiple)$")
+    required: bool = False
+    max_select: int = Field(default=1, ge=1)
+
+
+class OptionItemImport(BaseModel):
+    """口味选项行：自然键 (dish, group, name)"""
+    dish: str = Field(..., min_length=1, max_length=100)
+    group: str = Field(..., min_length=1, max_length=50)
+    name: str = Field(..., min_length=1, max_length=50)
+    price_delta: Decimal = Decimal(0)
+    available: bool = True
+
+
+class ImportRowError(BaseModel):
+    """导入失败的行"""
+    line: int
+    message: str
+
+
+class ImportCounts(BaseModel):
+    """单类记录的新增/更新数"""
+    created: int = 0
+    updated: int = 0
+
+
+class ImportReport(BaseModel):
+    """导入结果"""
+    rows: int = 0
+    chunks: int = 0
+    counts: Dict[str, ImportCounts] = Field(default_factory=dict)
+    error_count: int = 0
+    errors: List[ImportRowError] = []   # 仅保留前若干条
@@ -0,0 +1,53 @@
+"""库存相关 DTO"""
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+
+class StockAdjustFailure(BaseModel):
+    """单个菜品的库存调整失败明细"""
+    dish_id: int
+    delta: int
+    reason: str                    # missing_dish | insufficient_stock | conflict
+    message: str
+    stock: Optional[int] = None    # 失败时读取到的库存（菜品不存在时为空）
+
+
+class StockBatchResult(BaseModel):
+    """批量调整库存结果"""
+    applied: List[int] = []                   # 已成功调整的 dish_id
+    failures: List[StockAdjustFailure] = []
+
+    @property
+    def ok(self) -> bool:
+        """是否全部成功"""
+        return not self.failures
+
+
+class InventoryDigestResponse(BaseModel):
+    """库存摘要 Merkle 树的一层（level=0 为根）"""
+    root: str
+    bucket_width: int
+    leaves: int                    # 叶子（桶）数，2 的幂
+    depth: int                     # 叶子层的层号
+    level: int
+    nodes: List[str]               # 该层全部节点的十六进制哈希
+
+
+class InventoryBucketResponse(BaseModel):
+    """一个摘要桶及其中菜品的库存"""
+    bucket: int
+    start: int                     # 覆盖的 dish_id 区间 [start, end)
+    end: int
+    digest: int
+    stock: Dict[int, int]          # {dish_id: stock}
+
+
+class InventoryDigestDiff(BaseModel):
+    """对端的桶摘要 {bucket: digest}（由 digest_stock 对副本库存计算；桶号范围由服务校验）"""
+    buckets: Dict[int, int]
+
+
+class InventoryDigestCheck(BaseModel):
+    """比较结果"""
+    ok: bool
+    buckets: List[int] = []        # 不一致的桶号
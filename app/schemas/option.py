@@ -1,7 +1,8 @@
 """口味选项 DTO"""
 from decimal import Decimal
-from typing import List
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from app.models.enums import OptionType
 
 
 class OptionItemResponse(BaseModel):
@@ -29,3 +30,47 @@ class OptionGroupResponse(BaseModel):
         """Pydantic 配置"""
         from_attributes = True
 
+
+
+class OptionItemCreate(BaseModel):
+    """新增选项"""
+    name: str = Field(..., min_length=1, max_length=50)
+    price_delta: Decimal = Decimal(0)
+    available: bool = True
+
+
+class OptionItemUpdate(BaseModel):
+    """编辑选项（为空的字段不修改）"""
+    name: Optional[str] = Field(None, min_length=1, max_length=50)
+    price_delta: Optional[Decimal] = None
+    available: Optional[bool] = None
+
+
+class OptionGroupCreate(BaseModel):
+    """新增选项组（可同时带选项）"""
+    name: str = Field(..., min_length=1, max_length=50)
+    type: OptionType = OptionType.SINGLE
+    required: bool = False
+    max_select: int = Field(1, ge=1)
+    items: List[OptionItemCreate] = Field(default_factory=list)
+
+
+class OptionGroupUpdate(BaseModel):
+    """编辑选项组（为空的字段不修改）"""
+    name: Optional[str] = Field(None, min_length=1, max_length=50)
+    type: Optional[OptionType] = None
+    required: Optional[bool] = None
+    max_select: Optional[int] = Field(None, ge=1)
+
+
+class OptionAvailabilityUpdate(BaseModel):
+    """按选项名批量上下架（如所有菜品的"加辣"）"""
+    name: str = Field(..., min_length=1, max_length=50)
+    available: bool
+    dish_ids: Optional[List[int]] = None   # 为空时作用于所有菜品
+
+
+class OptionCloneRequest(BaseModel):
+    """把一道菜的选项组复制到其他菜品（同名组/选项已存在时跳过）"""
+    source_dish_id: int
+    target_dish_ids: List[int] = Field(..., min_length=1, max_length=500)
@@ -51,3 +51,34 @@ class OrderDetailResponse(OrderResponse):
     """订单详情响应（包含订单项）"""
     items: List[OrderItemResponse] = []
 
+
+
+class OrderSummary(BaseModel):
+    """订单摘要（用户订单历史）"""
+    order_id: int
+    status: str
+    total_price: Decimal
+    item_count: int
+    created_at: datetime
+
+
+class OrderHistoryPage(BaseModel):
+    """订单历史分页：next_cursor 为空表示没有更多"""
+    items: List[OrderSummary]
+    next_cursor: Optional[str] = None
+
+
+class OrderBulkRequest(BaseModel):
+    """批量完成/取消订单请求"""
+    order_ids: List[int] = Field(..., min_length=1, max_length=500)
+
+
+class OrderBulkCancelRequest(OrderBulkRequest):
+    """批量取消订单请求"""
+    restock: Optional[bool] = None   # 是否退库存，为空时取配置 RESTOCK_ON_CANCEL
+
+
+class OrderBulkResult(BaseModel):
+    """批量状态流转结果"""
+    updated: List[int] = []    # 成功流转的 order_id
+    skipped: List[int] = []    # 不存在或当前状态不允许的 order_id
@@ -0,0 +1,48 @@
+"""报表 DTO"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Optional
+from pydantic import BaseModel
+
+
+class DishDailyRow(BaseModel):
+    """菜品日销量"""
+    day: date
+    dish_id: int
+    dish_name: Optional[str]
+    qty: int
+    order_count: int
+    revenue: Decimal
+
+
+class DishRankingRow(BaseModel):
+    """菜品销售排行"""
+    dish_id: int
+    dish_name: Optional[str]
+    qty: int
+    order_count: int
+    revenue: Decimal
+
+
+class CategoryHourlyRow(BaseModel):
+    """分类小时销量"""
+    hour: datetime
+    category_id: int
+    category_name: Optional[str]
+    qty: int
+    revenue: Decimal
+
+
+class StatusDailyRow(BaseModel):
+    """订单状态日统计"""
+    day: date
+    status: str
+    order_count: int
+    revenue: Decimal
+
+
+class SalesSummary(BaseModel):
+    """区间汇总"""
+    order_count: int
+    revenue: Decimal
+    by_status: Dict[str, int]
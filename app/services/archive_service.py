@@ -0,0 +1,103 @@
+"""
+订单归档服务
+把下单时间早于截止时间的 Completed / Cancelled 订单批量移入归档表
+（orders_archive / order_items_archive / order_item_options_archive），热表只保留近期订单
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.archive import ArchivedOrder, ArchivedOrderItem, order_item_options_archive
+from app.models.enums import OrderStatus
+from app.models.order import Order, OrderItem, order_item_options
+
+# 每批（每个事务）归档的订单数
+ARCHIVE_BATCH_SIZE = 500
+
+ARCHIVABLE_STATUSES = (OrderStatus.COMPLETED, OrderStatus.CANCELLED)
+
+
+class ArchiveService:
+    """订单归档"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def archive_orders(self, older_than_days: Optional[int] = None, before: Optional[datetime] = None,
+                       batch_size: int = ARCHIVE_BATCH_SIZE, max_batches: Optional[int] = None) -> int:
+        """
+        归档历史订单
+        参数：before 为截止时间（不含）；未指定时取 now - older_than_days（默认 settings.ARCHIVE_AFTER_DAYS）
+        契约：每批一个事务，INSERT ... SELECT 复制后删除热表行；中途失败只回滚当前批
+        返回：归档的订单数
+        """
+        if before is None:
+            days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+            before = datetime.utcnow() - timedelta(days=days)
+
+        archived = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            order_ids = self._next_batch(before, batch_size)
+            if not order_ids:
+                break
+            self._move(order_ids)
+            archived += len(order_ids)
+            batches += 1
+        return archived
+
+    def _next_batch(self, before: datetime, batch_size: int) -> List[int]:
+        # SQLite 的整数主键不带 AUTOINCREMENT 时会复用"当前最大 id + 1"，
+        # 因此持有最大 order_id / order_items.id 的订单始终留在热表，避免新订单与归档 id 冲突
+        newest_order = select(func.max(Order.order_id)).scalar_subquery()
+        newest_item_order = (
+            select(OrderItem.order_id)
+            .where(OrderItem.id == select(func.max(OrderItem.id)).scalar_subquery())
+            .scalar_subquery()
+        )
+        return list(self.db.scalars(
+            select(Order.order_id)
+            .where(
+                Order.status.in_(ARCHIVABLE_STATUSES),
+                Order.created_at < before,
+                Order.order_id != newest_order,
+                Order.order_id != func.coalesce(newest_item_order, 0),
+            )
+            .order_by(Order.order_id)
+            .limit(batch_size)
+        ).all())
+
+    def _move(self, order_ids: List[int]) -> None:
+        archived_at = datetime.utcnow()
+        item_ids = select(OrderItem.id).where(OrderItem.order_id.in_(order_ids))
+        try:
+            self.db.execute(insert(ArchivedOrder).from_select(
+                ["order_id", "user_id", "status", "remark", "created_at", "total_cents", "item_count",
+                 "archived_at"],
+                select(Order.order_id, Order.user_id, Order.status, Order.remark, Order.created_at,
+                       Order.total_cents, Order.item_count,
+                       literal(archived_at, ArchivedOrder.archived_at.type))
+                .where(Order.order_id.in_(order_ids)),
+            ))
+            self.db.execute(insert(ArchivedOrderItem).from_select(
+                ["id", "order_id", "dish_id", "qty", "unit_price"],
+                select(OrderItem.id, OrderItem.order_id, OrderItem.dish_id, OrderItem.qty, OrderItem.unit_price)
+                .where(OrderItem.order_id.in_(order_ids)),
+            ))
+            self.db.execute(insert(order_item_options_archive).from_select(
+                ["order_item_id", "option_item_id"],
+                select(order_item_options.c.order_item_id, order_item_options.c.option_item_id)
+                .where(order_item_options.c.order_item_id.in_(item_ids)),
+            ))
+            self.db.execute(delete(order_item_options).where(order_item_options.c.order_item_id.in_(item_ids)))
+            self.db.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+            self.db.execute(delete(Order).where(Order.order_id.in_(order_ids)))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+    def get_archived_order(self, order_id: int) -> Optional[ArchivedOrder]:
+        """按 order_id 读取归档订单（含明细）"""
+        return self.db.query(ArchivedOrder).filter(ArchivedOrder.order_id == order_id).first()
@@ -0,0 +1,271 @@
+"""
+订单流式导出服务（对账用）
+通过服务端游标（stream_results + yield_per）逐批读取订单明细，
+边读边写 NDJSON / CSV / Parquet，内存占用与导出规模无关
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import Session
+from app.db import group_concat
+from app.models.archive import ArchivedOrder, ArchivedOrderItem, order_item_options_archive
+from app.models.dish import Dish, OptionItem
+from app.models.enums import OrderStatus
+from app.models.order import Order, OrderItem, order_item_options
+from app.services.pricing import OrderPricer, from_cents
+
+# 服务端游标每批读取的明细行数
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# 聚合选项名的分隔符（ASCII 单元分隔符，不会出现在选项名中；逗号会）
+OPTION_NAME_SEPARATOR = "\x1f"
+
+# CSV / Parquet 的列（每行一条订单明细；CSV 中 option_names 为 JSON 数组）
+LINE_COLUMNS = [
+    "order_id", "user_id", "status", "remark", "created_at",
+    "item_id", "dish_id", "dish_name", "qty", "unit_price",
+    "option_delta", "option_names", "subtotal",
+]
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型：{type(value).__name__}")
+
+
+class OrderExportService:
+    """订单导出"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _line_query(self, start: Optional[datetime], end: Optional[datetime], status: Optional[str],
+                    include_archive: bool = False):
+        """
+        订单明细查询：每个订单项一行，选项加价与名称用相关子查询聚合
+        include_archive 为 True 时以 UNION ALL 合并归档表
+        """
+        sources = [(Order, OrderItem, order_item_options)]
+        if include_archive:
+            sources.append((ArchivedOrder, ArchivedOrderItem, order_item_options_archive))
+        selects = [
+            self._source_select(order_model, item_model, options_table, start, end, status)
+            for order_model, item_model, options_table in sources
+        ]
+        if len(selects) == 1:
+            return selects[0].order_by("order_id", "item_id")
+        lines = union_all(*selects).subquery()
+        return select(lines).order_by(lines.c.order_id, lines.c.item_id)
+
+    @staticmethod
+    def _source_select(order_model, item_model, options_table, start, end, status):
+        option_join = options_table.join(OptionItem, OptionItem.item_id == options_table.c.option_item_id)
+        option_delta = (
+            select(func.coalesce(func.sum(OptionItem.price_delta), 0))
+            .select_from(option_join)
+            .where(options_table.c.order_item_id == item_model.id)
+            .scalar_subquery()
+        )
+        option_names = (
+            select(group_concat(OptionItem.name, OPTION_NAME_SEPARATOR))
+            .select_from(option_join)
+            .where(options_table.c.order_item_id == item_model.id)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(
+                order_model.order_id, order_model.user_id, order_model.status, order_model.remark,
+                order_model.created_at,
+                item_model.id.label("item_id"), item_model.dish_id, Dish.name.label("dish_name"),
+                item_model.qty, item_model.unit_price,
+                option_delta.label("option_delta"), option_names.label("option_names"),
+            )
+            .join(item_model, item_model.order_id == order_model.order_id)
+            .outerjoin(Dish, Dish.dish_id == item_model.dish_id)
+        )
+        if start is not None:
+            stmt = stmt.where(order_model.created_at >= start)
+        if end is not None:
+            stmt = stmt.where(order_model.created_at < end)
+        if status is not None:
+            stmt = stmt.where(order_model.status == OrderStatus(status))
+        return stmt
+
+    def iter_line_batches(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                          status: Optional[str] = None, include_archive: bool = False) -> Iterator[List[dict]]:
+        """
+        按批产出订单明细行
+        契约：每批最多 EXPORT_BATCH_SIZE 行，按 (order_id, item_id) 升序
+        """
+        result = self.db.execute(
+            self._line_query(start, end, status, include_archive)
+            .execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+        )
+        for partition in result.partitions():
+            batch = []
+            pricer = OrderPricer()
+            for row in partition:
+                line = dict(row._mapping)
+                line["status"] = line["status"].value
+                line["option_delta"] = Decimal(line["option_delta"] or 0)
+                names = line["option_names"]
+                line["option_names"] = names.split(OPTION_NAME_SEPARATOR) if names else []
+                pricer.add_line(line["order_id"], line["unit_price"], line["qty"], line["option_delta"])
+                batch.append(line)
+            # 整批明细一次向量化计算小计（整数分）
+            for line, cents in zip(batch, pricer.line_totals_cents()):
+                line["subtotal_cents"] = cents
+                line["subtotal"] = from_cents(cents)
+            yield batch
+
+    def iter_orders(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    status: Optional[str] = None, include_archive: bool = False) -> Iterator[dict]:
+        """按订单聚合明细（依赖 order_id 有序，同一订单的明细连续出现）"""
+        current: Optional[dict] = None
+        for batch in self.iter_line_batches(start, end, status, include_archive):
+            for line in batch:
+                if current is None or current["order_id"] != line["order_id"]:
+                    if current is not None:
+                        yield current
+                    current = {
+                        "order_id": line["order_id"],
+                        "user_id": line["user_id"],
+                        "status": line["status"],
+                        "remark": line["remark"],
+                        "created_at": line["created_at"],
+                        "total_price": Decimal(0),
+                        "items": [],
+                    }
+                current["total_price"] += line["subtotal"]
+                current["items"].append({
+                    "item_id": line["item_id"],
+                    "dish_id": line["dish_id"],
+                    "dish_name": line["dish_name"],
+                    "qty": line["qty"],
+                    "unit_price": line["unit_price"],
+                    "option_delta": line["option_delta"],
+                    "option_names": line["option_names"],
+                    "subtotal": line["subtotal"],
+                    "subtotal_cents": line["subtotal_cents"],
+                })
+        if current is not None:
+            yield current
+
+    # ------- 写出 -------
+    def iter_export(self, fmt: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    status: Optional[str] = None, include_archive: bool = False) -> Iterator[bytes]:
+        """
+        按格式产出字节块
+        异常：格式不支持、订单状态无效或缺少可选依赖时抛出 ValueError（在产出第一个字节前）
+        """
+        if status is not None:
+            try:
+                status = OrderStatus(status).value
+            except ValueError as e:
+                raise ValueError(f"无效的订单状态：{status}") from e
+        args = (start, end, status, include_archive)
+        if fmt == "ndjson":
+            return self._iter_ndjson(*args)
+        if fmt == "csv":
+            return self._iter_csv(*args)
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401  pylint: disable=import-outside-toplevel,unused-import
+            except ImportError as e:
+                raise ValueError("Parquet 导出需要安装 pyarrow") from e
+            return self._iter_parquet(*args)
+        raise ValueError(f"不支持的导出格式：{fmt}")
+
+    def _iter_ndjson(self, start, end, status, include_archive) -> Iterator[bytes]:
+        buffer: List[str] = []
+        for order in self.iter_orders(start, end, status, include_archive):
+            buffer.append(json.dumps(order, default=_json_default, ensure_ascii=False))
+            if len(buffer) >= EXPORT_BATCH_SIZE:
+                yield ("\n".join(buffer) + "\n").encode("utf-8")
+                buffer = []
+        if buffer:
+            yield ("\n".join(buffer) + "\n").encode("utf-8")
+
+    def _iter_csv(self, start, end, status, include_archive) -> Iterator[bytes]:
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(LINE_COLUMNS)
+        for batch in self.iter_line_batches(start, end, status, include_archive):
+            for line in batch:
+                writer.writerow([
+                    line["created_at"].isoformat() if col == "created_at"
+                    else json.dumps(line[col], ensure_ascii=False) if col == "option_names"
+                    else line[col]
+                    for col in LINE_COLUMNS
+                ])
+            yield out.getvalue().encode("utf-8")
+            out.seek(0)
+            out.truncate()
+        if out.tell():
+            yield out.getvalue().encode("utf-8")
+
+    def _iter_parquet(self, start, end, status, include_archive) -> Iterator[bytes]:
+        # pylint: disable=import-outside-toplevel
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("order_id", pa.int64()), ("user_id", pa.int64()), ("status", pa.string()),
+            ("remark", pa.string()), ("created_at", pa.timestamp("us")),
+            ("item_id", pa.int64()), ("dish_id", pa.int64()), ("dish_name", pa.string()),
+            ("qty", pa.int64()), ("unit_price", pa.decimal128(12, 2)),
+            ("option_delta", pa.decimal128(12, 2)), ("option_names", pa.list_(pa.string())),
+            ("subtotal", pa.decimal128(14, 2)),
+        ])
+        sink = _DrainableSink()
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            for batch in self.iter_line_batches(start, end, status, include_archive):
+                columns: Dict[str, list] = {col: [line[col] for line in batch] for col in LINE_COLUMNS}
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+        finally:
+            writer.close()
+        yield sink.drain()
+
+
+class _DrainableSink(io.RawIOBase):
+    """只写文件对象：累积写入的字节，按需取走（用于流式输出 Parquet 行组）"""
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
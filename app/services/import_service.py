@@ -0,0 +1,350 @@
+"""
+菜单批量导入服务
+支持 CSV / NDJSON，逐行解析、分块校验、按自然键 upsert、每块提交一次
+
+记录格式（CSV 列名 / NDJSON 键相同，kind 决定记录类型）：
+  - category:     name, sort_order
+  - dish:         category, name, price, stock, status, image_url
+  - option_group: dish, name, type, required, max_select
+  - option_item:  dish, group, name, price_delta, available
+自然键：分类名、菜品名、(菜品名, 口味组名)、(菜品名, 口味组名, 选项名)
+"""
+import csv
+import io
+import json
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import bindparam, insert, select, update as sa_update
+from sqlalchemy.orm import Session
+from app.models.dish import Category, Dish, OptionGroup, OptionItem
+from app.models.enums import DishStatus, OptionType
+from app.invalidation import MENU_CATEGORIES, MENU_SEARCH, OPTION_RULES, bus
+from app.services.inventory_digest import InventoryDigestService
+from app.schemas.imports import (
+    CategoryImport, DishImport, OptionGroupImport, OptionItemImport,
+    ImportCounts, ImportReport, ImportRowError,
+)
+
+# 每块记录数（一块一次提交）
+IMPORT_CHUNK_SIZE = 500
+
+# 报告中最多保留的错误明细条数
+MAX_REPORTED_ERRORS = 100
+
+# 自然键查询时 IN 列表的最大长度
+_LOOKUP_CHUNK = 300
+
+RECORD_MODELS = {
+    "category": CategoryImport,
+    "dish": DishImport,
+    "option_group": OptionGroupImport,
+    "option_item": OptionItemImport,
+}
+
+# 解析后的记录：(行号, kind, 校验后的模型)
+ParsedRecord = Tuple[int, str, BaseModel]
+
+
+def detect_format(filename: Optional[str]) -> str:
+    """按扩展名推断导入格式"""
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    raise ValueError(f"无法识别的文件格式：{filename}（支持 .csv / .ndjson / .jsonl）")
+
+
+def iter_csv_records(stream: IO[str]) -> Iterator[Tuple[int, dict]]:
+    """逐行读取 CSV，空单元格视为未填写（使用默认值）"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, {
+            k.strip(): v.strip()
+            for k, v in row.items()
+            if k and isinstance(v, str) and v.strip() != ""
+        }
+
+
+def iter_ndjson_records(stream: IO[str]) -> Iterator[Tuple[int, dict]]:
+    """逐行读取 NDJSON；无法解析的行以 _parse_error 标记交由导入方记录"""
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, {"_parse_error": f"JSON 解析失败：{e}"}
+            continue
+        if not isinstance(record, dict):
+            yield line_no, {"_parse_error": "每行必须是 JSON 对象"}
+            continue
+        yield line_no, record
+
+
+def read_records(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, dict]]:
+    """把二进制流包装为按行迭代的记录（不整体读入内存）"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        return iter_csv_records(text)
+    if fmt == "ndjson":
+        return iter_ndjson_records(text)
+    raise ValueError(f"不支持的导入格式：{fmt}")
+
+
+def _batched(items: List, size: int) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class MenuImportService:
+    """菜单批量导入"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._option_dishes: set = set()   # 本块内改动了选项的菜品，提交后失效其选项规则
+
+    def import_records(self, records: Iterable[Tuple[int, dict]],
+                       chunk_size: int = IMPORT_CHUNK_SIZE) -> ImportReport:
+        """
+        导入记录流
+        参数：records = [(行号, 原始字段 dict), ...]，可为惰性迭代器
+        契约：
+          - 每 chunk_size 条有效记录处理并提交一次，内存占用与文件大小无关
+          - 块内按 分类 → 菜品 → 口味组 → 选项 顺序处理，可引用同块或之前块的记录
+          - 校验失败/引用缺失的行记入报告并跳过，不影响其他行
+        """
+        report = ImportReport(counts={kind: ImportCounts() for kind in RECORD_MODELS})
+        chunk: List[ParsedRecord] = []
+        for line, raw in records:
+            report.rows += 1
+            parsed = self._parse(line, raw, report)
+            if parsed is not None:
+                chunk.append(parsed)
+            if len(chunk) >= chunk_size:
+                self._import_chunk(chunk, report)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk, report)
+        return report
+
+    # ------- 解析 -------
+    @staticmethod
+    def _error(report: ImportReport, line: int, message: str) -> None:
+        report.error_count += 1
+        if len(report.errors) < MAX_REPORTED_ERRORS:
+            report.errors.append(ImportRowError(line=line, message=message))
+
+    def _parse(self, line: int, raw: dict, report: ImportReport) -> Optional[ParsedRecord]:
+        if "_parse_error" in raw:
+            self._error(report, line, raw["_parse_error"])
+            return None
+        kind = raw.get("kind")
+        model = RECORD_MODELS.get(kind)
+        if model is None:
+            self._error(report, line, f"未知的记录类型：{kind}")
+            return None
+        try:
+            return line, kind, model.model_validate(raw)
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            self._error(report, line, detail)
+            return None
+
+    # ------- 分块 upsert -------
+    def _import_chunk(self, chunk: List[ParsedRecord], report: ImportReport) -> None:
+        by_kind: Dict[str, List[Tuple[int, BaseModel]]] = {kind: [] for kind in RECORD_MODELS}
+        for line, kind, record in chunk:
+            by_kind[kind].append((line, record))
+        try:
+            self._upsert_categories(by_kind["category"], report)
+            self._upsert_dishes(by_kind["dish"], report)
+            self._upsert_option_groups(by_kind["option_group"], report)
+            self._upsert_option_items(by_kind["option_item"], report)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            bus.publish(OPTION_RULES, self._option_dishes)
+            self._option_dishes.clear()
+            # 分类/菜品/选项名都可能改动，下一次搜索全量重建
+            bus.publish(MENU_CATEGORIES)
+            bus.publish(MENU_SEARCH)
+        report.chunks += 1
+
+    def _lookup(self, columns, key_column, keys: List, order_column) -> Dict:
+        """
+        按单列 IN 批量查询，返回 {key_column 值: 行}
+        同一键存在多行时保留 order_column 最小者
+        """
+        found: Dict = {}
+        for batch in _batched(list(set(keys)), _LOOKUP_CHUNK):
+            rows = self.db.execute(
+                select(*columns).where(key_column.in_(batch)).order_by(order_column)
+            ).all()
+            for row in rows:
+                found.setdefault(row._mapping[key_column.key], row)
+        return found
+
+    def _category_ids(self, names: List[str]) -> Dict[str, int]:
+        rows = self._lookup((Category.category_id, Category.name), Category.name, names, Category.category_id)
+        return {name: row.category_id for name, row in rows.items()}
+
+    def _dish_ids(self, names: List[str]) -> Dict[str, int]:
+        rows = self._lookup((Dish.dish_id, Dish.name), Dish.name, names, Dish.dish_id)
+        return {name: row.dish_id for name, row in rows.items()}
+
+    def _group_ids(self, keys: List[Tuple[int, str]]) -> Dict[Tuple[int, str], int]:
+        """(dish_id, 组名) → group_id"""
+        wanted = set(keys)
+        found: Dict[Tuple[int, str], int] = {}
+        for batch in _batched(sorted({dish_id for dish_id, _ in wanted}), _LOOKUP_CHUNK):
+            rows = self.db.execute(
+                select(OptionGroup.group_id, OptionGroup.dish_id, OptionGroup.name)
+                .where(OptionGroup.dish_id.in_(batch))
+                .order_by(OptionGroup.group_id)
+            ).all()
+            for row in rows:
+                if (row.dish_id, row.name) in wanted:
+                    found.setdefault((row.dish_id, row.name), row.group_id)
+        return found
+
+    def _item_ids(self, keys: List[Tuple[int, str]]) -> Dict[Tuple[int, str], int]:
+        """(group_id, 选项名) → item_id"""
+        wanted = set(keys)
+        found: Dict[Tuple[int, str], int] = {}
+        for batch in _batched(sorted({group_id for group_id, _ in wanted}), _LOOKUP_CHUNK):
+            rows = self.db.execute(
+                select(OptionItem.item_id, OptionItem.group_id, OptionItem.name)
+                .where(OptionItem.group_id.in_(batch))
+                .order_by(OptionItem.item_id)
+            ).all()
+            for row in rows:
+                if (row.group_id, row.name) in wanted:
+                    found.setdefault((row.group_id, row.name), row.item_id)
+        return found
+
+    def _write(self, table, pk_name: str, inserts: List[dict], updates: List[dict],
+               update_columns: List[str], bump_version: bool, counts: ImportCounts) -> None:
+        """executemany 批量插入与按主键批量更新"""
+        if inserts:
+            self.db.execute(insert(table), inserts)
+        if updates:
+            values = {col: bindparam(f"b_{col}") for col in update_columns}
+            if bump_version:
+                values["version"] = table.c.version + 1
+            self.db.execute(
+                sa_update(table).where(table.c[pk_name] == bindparam("b_pk")).values(**values),
+                [{"b_pk": row[pk_name], **{f"b_{col}": row[col] for col in update_columns}}
+                 for row in updates],
+            )
+        counts.created += len(inserts)
+        counts.updated += len(updates)
+
+    def _upsert_categories(self, rows: List[Tuple[int, CategoryImport]], report: ImportReport) -> None:
+        if not rows:
+            return
+        latest = {record.name: record for _, record in rows}
+        existing = self._category_ids(list(latest))
+        inserts, updates = [], []
+        for name, record in latest.items():
+            values = {"name": name, "sort_order": record.sort_order}
+            if name in existing:
+                updates.append({"category_id": existing[name], **values})
+            else:
+                inserts.append(values)
+        self._write(Category.__table__, "category_id", inserts, updates,
+                    ["sort_order"], True, report.counts["category"])
+
+    def _upsert_dishes(self, rows: List[Tuple[int, DishImport]], report: ImportReport) -> None:
+        if not rows:
+            return
+        latest = {record.name: (line, record) for line, record in rows}
+        category_ids = self._category_ids([record.category for _, record in latest.values()])
+        existing = self._dish_ids(list(latest))
+        inserts, updates = [], []
+        for name, (line, record) in latest.items():
+            if record.category not in category_ids:
+                self._error(report, line, f"分类不存在：{record.category}")
+                continue
+            values = {
+                "name": name,
+                "category_id": category_ids[record.category],
+                "price": record.price,
+                "stock": record.stock,
+                "status": DishStatus(record.status),
+                "image_url": record.image_url,
+            }
+            if name in existing:
+                updates.append({"dish_id": existing[name], **values})
+            else:
+                inserts.append(values)
+        self._write(Dish.__table__, "dish_id", inserts, updates,
+                    ["category_id", "price", "stock", "status", "image_url"], True, report.counts["dish"])
+        # 库存被整行覆盖，按表重算涉及的摘要桶
+        written = self._dish_ids([values["name"] for values in inserts])
+        written.update({values["name"]: values["dish_id"] for values in updates})
+        InventoryDigestService(self.db).refresh_dishes(written.values())
+
+    def _upsert_option_groups(self, rows: List[Tuple[int, OptionGroupImport]], report: ImportReport) -> None:
+        if not rows:
+            return
+        latest = {(record.dish, record.name): (line, record) for line, record in rows}
+        dish_ids = self._dish_ids([dish for dish, _ in latest])
+        resolved = {}
+        for (dish, name), (line, record) in latest.items():
+            if dish not in dish_ids:
+                self._error(report, line, f"菜品不存在：{dish}")
+                continue
+            resolved[(dish_ids[dish], name)] = record
+            self._option_dishes.add(dish_ids[dish])
+        existing = self._group_ids(list(resolved))
+        inserts, updates = [], []
+        for (dish_id, name), record in resolved.items():
+            values = {
+                "dish_id": dish_id,
+                "name": name,
+                "type": OptionType(record.type),
+                "required": record.required,
+                "max_select": record.max_select,
+            }
+            if (dish_id, name) in existing:
+                updates.append({"group_id": existing[(dish_id, name)], **values})
+            else:
+                inserts.append(values)
+        self._write(OptionGroup.__table__, "group_id", inserts, updates,
+                    ["type", "required", "max_select"], False, report.counts["option_group"])
+
+    def _upsert_option_items(self, rows: List[Tuple[int, OptionItemImport]], report: ImportReport) -> None:
+        if not rows:
+            return
+        latest = {(record.dish, record.group, record.name): (line, record) for line, record in rows}
+        dish_ids = self._dish_ids([dish for dish, _, _ in latest])
+        group_ids = self._group_ids([
+            (dish_ids[dish], group) for dish, group, _ in latest if dish in dish_ids
+        ])
+        resolved = {}
+        for (dish, group, name), (line, record) in latest.items():
+            group_id = group_ids.get((dish_ids.get(dish), group))
+            if group_id is None:
+                self._error(report, line, f"口味组不存在：{dish} / {group}")
+                continue
+            resolved[(group_id, name)] = record
+            self._option_dishes.add(dish_ids[dish])
+        existing = self._item_ids(list(resolved))
+        inserts, updates = [], []
+        for (group_id, name), record in resolved.items():
+            values = {
+                "group_id": group_id,
+                "name": name,
+                "price_delta": record.price_delta,
+                "available": record.available,
+            }
+            if (group_id, name) in existing:
+                updates.append({"item_id": existing[(group_id, name)], **values})
+            else:
+                inserts.append(values)
+        self._write(OptionItem.__table__, "item_id", inserts, updates,
+                    ["price_delta", "available"], False, report.counts["option_item"])
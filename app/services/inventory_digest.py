@@ -0,0 +1,265 @@
+"""
+库存摘要（增量校验和）
+
+用少量哈希比对两份库存（主库与副本、缓存层、导出文件）是否一致，并定位不一致的菜品：
+  - 每道菜的摘要项 term(id, stock) = (a(id) + stock·b(id)) mod P，P = 2^61 - 1，a、b 由 dish_id 经 blake2b 派生
+    摘要项对 stock 线性：库存 ±delta 时只需累加 ±delta·b(id)，不必读取旧库存，每道菜 O(1)
+  - 菜品按 dish_id 区间分桶（每桶 BUCKET_WIDTH 个 id），桶摘要 = 桶内摘要项之和 mod P，
+    保存在 inventory_digest_buckets 表，与库存写入在同一事务中用 upsert_increment 累加
+  - 以桶摘要为叶子构建 Merkle 树（sha256）：根哈希相同即库存一致；不同时逐层只下钻不同的子树，
+    比较 O(不一致桶数 × 树高) 个哈希即可定位到桶，再比较桶内至多 BUCKET_WIDTH 道菜
+写库存的路径（下单、取消退库存、调整库存、菜品增删改、导入）都调用本服务；
+绕过服务直接改表（手工 SQL、旧数据）后用 rebuild() 或 scripts/verify_inventory.py --repair 重算
+"""
+import functools
+import hashlib
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.orm import Session
+from app.db import upsert_increment
+from app.models.dish import Dish
+from app.models.inventory import inventory_digest_buckets as buckets_table
+
+# 梅森素数 2^61 - 1：摘要项 < 2^61，两项之和不超过 BIGINT
+MODULUS = (1 << 61) - 1
+
+# 每个桶覆盖的 dish_id 个数（修改后需 rebuild）
+BUCKET_WIDTH = 64
+
+# 单条 SQL 中 IN / OR 的最大桶数
+BUCKET_CHUNK_SIZE = 300
+
+# 对外接口允许的 Merkle 树叶子数上限（建树为 O(叶子数)，2^16 个叶子约 0.2 s）
+MAX_LEAVES = 1 << 16
+
+# 与对端比较时，桶号可超出本端最大 dish_id 所在桶的余量（对端可能有本端尚未同步的新菜品）
+DIFF_BUCKET_MARGIN = 1024
+
+
+@functools.lru_cache(maxsize=65536)
+def _coefficients(dish_id: int) -> Tuple[int, int]:
+    """(a, b)，b 非零"""
+    raw = hashlib.blake2b(str(dish_id).encode("ascii"), digest_size=16, person=b"inventory").digest()
+    a = int.from_bytes(raw[:8], "big") % MODULUS
+    b = int.from_bytes(raw[8:], "big") % (MODULUS - 1) + 1
+    return a, b
+
+
+def dish_term(dish_id: int, stock: Optional[int]) -> int:
+    """一道菜的摘要项"""
+    a, b = _coefficients(dish_id)
+    return (a + (stock or 0) * b) % MODULUS
+
+
+def bucket_of(dish_id: int) -> int:
+    return dish_id // BUCKET_WIDTH
+
+
+def bucket_range(bucket: int) -> Tuple[int, int]:
+    """桶覆盖的 dish_id 区间 [起, 止)"""
+    return bucket * BUCKET_WIDTH, (bucket + 1) * BUCKET_WIDTH
+
+
+def digest_stock(stock_levels: Mapping[int, Optional[int]]) -> Dict[int, int]:
+    """
+    按 {dish_id: stock} 计算桶摘要（导出文件、缓存层等不在数据库中的库存副本）
+    返回：{bucket: digest}，不含摘要为 0 的桶
+    """
+    sums: Dict[int, int] = {}
+    for dish_id, stock in stock_levels.items():
+        bucket = bucket_of(dish_id)
+        sums[bucket] = (sums.get(bucket, 0) + dish_term(dish_id, stock)) % MODULUS
+    return {bucket: digest for bucket, digest in sums.items() if digest}
+
+
+def _leaf(bucket: int, digest: int) -> bytes:
+    return hashlib.sha256(b"L" + bucket.to_bytes(8, "big") + digest.to_bytes(8, "big")).digest()
+
+
+def _node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"N" + left + right).digest()
+
+
+class MerkleTree:
+    """桶摘要上的完全二叉 Merkle 树；levels[0] 为根，levels[-1] 为叶子（桶号即下标）"""
+
+    def __init__(self, buckets: Mapping[int, int], leaves: Optional[int] = None):
+        """
+        参数：leaves 为叶子数下限（与对端比较时取双方的较大者，使树形一致）；实际叶子数为 2 的幂
+        """
+        size = max(max(buckets, default=-1) + 1, leaves or 1, 1)
+        width = 1
+        while width < size:
+            width *= 2
+        level = [_leaf(i, buckets.get(i, 0) % MODULUS) for i in range(width)]
+        self.levels: List[List[bytes]] = [level]
+        while len(level) > 1:
+            level = [_node(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+            self.levels.append(level)
+        self.levels.reverse()
+
+    @property
+    def root(self) -> str:
+        return self.levels[0][0].hex()
+
+    @property
+    def depth(self) -> int:
+        return len(self.levels) - 1
+
+    @property
+    def leaves(self) -> int:
+        return len(self.levels[-1])
+
+    def level(self, depth: int) -> List[str]:
+        """第 depth 层（0 为根）全部节点的十六进制哈希"""
+        return [node.hex() for node in self.levels[depth]]
+
+    def diff(self, other: "MerkleTree") -> List[int]:
+        """
+        与另一棵同形状的树比较，返回摘要不同的桶号（升序）
+        只下钻哈希不同的子树
+        异常：叶子数不同时抛出 ValueError
+        """
+        if self.leaves != other.leaves:
+            raise ValueError(f"Merkle 树形状不同：{self.leaves} / {other.leaves} 个叶子")
+        positions = [0] if self.levels[0][0] != other.levels[0][0] else []
+        for depth in range(1, len(self.levels)):
+            mine, theirs = self.levels[depth], other.levels[depth]
+            positions = [
+                child for position in positions for child in (2 * position, 2 * position + 1)
+                if mine[child] != theirs[child]
+            ]
+        return positions
+
+
+def _chunks(items: List[int], size: int) -> Iterable[List[int]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class InventoryDigestService:
+    """库存摘要维护与校验（写入方法不提交，由调用方事务提交）"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ------- 增量维护（在写库存的事务中调用） -------
+    def record_deltas(self, deltas: Mapping[int, int]) -> None:
+        """
+        库存按 delta 加减后调用；每道菜 O(1)，不读取库存
+        前置条件：deltas 中的菜品都存在且已按 delta 更新（已删除的菜品不能出现）
+        """
+        sums: Dict[int, int] = {}
+        for dish_id, delta in deltas.items():
+            if delta:
+                bucket = bucket_of(dish_id)
+                sums[bucket] = (sums.get(bucket, 0) + delta * _coefficients(dish_id)[1]) % MODULUS
+        self._accumulate(sums)
+
+    def add_dishes(self, stock_levels: Mapping[int, Optional[int]]) -> None:
+        """新增菜品后调用，参数为 {dish_id: 初始库存}"""
+        self._accumulate(digest_stock(stock_levels))
+
+    def remove_dishes(self, stock_levels: Mapping[int, Optional[int]]) -> None:
+        """删除菜品时调用，参数为 {dish_id: 删除前的库存}"""
+        self._accumulate({bucket: MODULUS - digest for bucket, digest in digest_stock(stock_levels).items()})
+
+    def refresh_dishes(self, dish_ids: Iterable[int]) -> None:
+        """
+        库存被直接赋值（旧值未知）时，按表重算这些菜品所在的桶
+        代价为每个桶一次至多 BUCKET_WIDTH 行的主键区间扫描
+        契约：先以锁定读（SELECT ... FOR UPDATE）锁住桶内菜品再重算；普通快照读在 InnoDB
+             （REPEATABLE READ）下看不到并发下单已扣减的库存，而其摘要增量已写入桶行，
+             删除重写后桶摘要会漏掉这笔增量
+        """
+        buckets = sorted({bucket_of(dish_id) for dish_id in dish_ids})
+        if not buckets:
+            return
+        scanned = self.scan(buckets, lock=True)
+        for chunk in _chunks(buckets, BUCKET_CHUNK_SIZE):
+            self.db.execute(delete(buckets_table).where(buckets_table.c.bucket.in_(chunk)))
+        rows = [{"bucket": bucket, "digest": digest} for bucket, digest in scanned.items()]
+        if rows:
+            self.db.execute(buckets_table.insert(), rows)
+
+    def _accumulate(self, sums: Dict[int, int]) -> None:
+        """桶摘要累加（sums 的值已在 [0, P)），累加后超过 P 的桶减去 P"""
+        rows = [{"bucket": bucket, "digest": digest} for bucket, digest in sums.items() if digest]
+        if not rows:
+            return
+        upsert_increment(self.db, buckets_table, rows, ["bucket"], ["digest"])
+        for chunk in _chunks([row["bucket"] for row in rows], BUCKET_CHUNK_SIZE):
+            self.db.execute(
+                update(buckets_table)
+                .where(buckets_table.c.bucket.in_(chunk), buckets_table.c.digest >= MODULUS)
+                .values(digest=buckets_table.c.digest - MODULUS)
+            )
+
+    # ------- 读取与校验 -------
+    def buckets(self) -> Dict[int, int]:
+        """已保存的桶摘要 {bucket: digest}（不含 0）"""
+        rows = self.db.execute(select(buckets_table.c.bucket, buckets_table.c.digest)).all()
+        return {bucket: digest % MODULUS for bucket, digest in rows if digest % MODULUS}
+
+    def scan(self, buckets: Optional[List[int]] = None, lock: bool = False) -> Dict[int, int]:
+        """
+        按 dishes 表重新计算桶摘要
+        参数：buckets 为空时扫描全表，否则只扫描这些桶的 dish_id 区间；
+             lock=True 时用锁定读，等待并读取并发事务已提交的库存（MySQL；SQLite 写事务本身串行）
+        """
+        if buckets is None:
+            return digest_stock(dict(self.db.execute(select(Dish.dish_id, Dish.stock)).all()))
+        stock_levels: Dict[int, Optional[int]] = {}
+        for chunk in _chunks(sorted(set(buckets)), BUCKET_CHUNK_SIZE):
+            ranges = []
+            for bucket in chunk:
+                start, end = bucket_range(bucket)
+                ranges.append(and_(Dish.dish_id >= start, Dish.dish_id < end))
+            query = select(Dish.dish_id, Dish.stock).where(or_(*ranges))
+            if lock:
+                query = query.with_for_update()
+            stock_levels.update(self.db.execute(query).all())
+        return digest_stock(stock_levels)
+
+    def bucket_stock(self, bucket: int) -> Dict[int, int]:
+        """桶内全部菜品的 {dish_id: stock}（定位不一致的菜品）"""
+        start, end = bucket_range(bucket)
+        rows = self.db.execute(
+            select(Dish.dish_id, Dish.stock).where(Dish.dish_id >= start, Dish.dish_id < end).order_by(Dish.dish_id)
+        ).all()
+        return {dish_id: stock or 0 for dish_id, stock in rows}
+
+    def tree(self, leaves: Optional[int] = None) -> MerkleTree:
+        return MerkleTree(self.buckets(), leaves)
+
+    def diff(self, other: Mapping[int, int]) -> List[int]:
+        """
+        与对端的桶摘要比较，返回不同的桶号（升序）
+        异常：对端桶号为负或超过 bucket_of(最大 dish_id) + DIFF_BUCKET_MARGIN 时抛出 ValueError
+             （树的大小由最大桶号决定，不限制会按对端传入的桶号分配任意多的叶子）
+        """
+        if other:
+            limit = bucket_of(self.db.execute(select(func.max(Dish.dish_id))).scalar() or 0) + DIFF_BUCKET_MARGIN
+            invalid = [bucket for bucket in other if bucket < 0 or bucket > limit]
+            if invalid:
+                raise ValueError(f"桶号超出范围（应在 0 ~ {limit}）：{sorted(invalid)[:10]}")
+        mine = self.buckets()
+        size = max(max(mine, default=-1), max(other, default=-1)) + 1
+        return MerkleTree(mine, size).diff(MerkleTree(other, size))
+
+    def verify(self) -> List[int]:
+        """已保存的摘要与 dishes 表是否一致，返回不一致的桶号（升序，空列表表示一致）"""
+        return self.diff(self.scan())
+
+    def rebuild(self, commit: bool = True) -> int:
+        """
+        按 dishes 表全量重算
+        返回：非空桶数
+        """
+        scanned = self.scan()
+        self.db.execute(delete(buckets_table))
+        if scanned:
+            self.db.execute(buckets_table.insert(), [{"bucket": b, "digest": d} for b, d in scanned.items()])
+        if commit:
+            self.db.commit()
+        return len(scanned)
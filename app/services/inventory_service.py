@@ -1,6 +1,34 @@
 """库存服务"""
+from typing import Dict, Iterator, List
+from sqlalchemy import case, select, update as sa_update
 from sqlalchemy.orm import Session
+from app.events import stock_changes
 from app.models.dish import Dish
+from app.services.inventory_digest import InventoryDigestService
+from app.schemas.inventory import StockAdjustFailure, StockBatchResult
+
+# 单条 SQL 中 IN 查询的最大菜品数（每道菜 1 个参数；SQLite 旧版本参数上限 999）
+BATCH_CHUNK_SIZE = 300
+
+# 批量加减库存单条 UPDATE 的最大菜品数：CASE 在 WHERE 与 SET 中各展开一次（每道菜 2×2 个参数）
+# 再加 IN 列表，每道菜 5 个参数，150 道菜约 751 个，低于 999
+UPDATE_CHUNK_SIZE = 150
+
+# 校验与更新之间库存被并发修改时的最大重试次数
+BATCH_MAX_ATTEMPTS = 3
+
+
+class StockBatchError(ValueError):
+    """批量调整库存失败（整体回滚），result 中包含逐菜品失败明细"""
+
+    def __init__(self, result: StockBatchResult):
+        self.result = result
+        super().__init__("；".join(f.message for f in result.failures))
+
+
+def _chunks(items: List[int], size: int) -> Iterator[List[int]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
 
 class InventoryService:
@@ -8,6 +36,7 @@ class InventoryService:
     
     def __init__(self, db: Session):
         self.db = db
+        self.digest = InventoryDigestService(db)
     
     def check_stock(self, dish_id: int, qty: int) -> bool:
         """
@@ -42,6 +71,7 @@ class InventoryService:
         dish.update_stock(-qty)
         # 确保其他会话可见，且 refresh 能读取到
         self.db.flush()
+        self.digest.record_deltas({dish_id: -qty})
     
     def adjust_stock(self, dish_id: int, delta: int) -> None:
         """
@@ -56,24 +86,111 @@ class InventoryService:
             raise ValueError(f"菜品不存在：dish_id={dish_id}")
         
         dish.update_stock(delta)
+        stock = dish.stock
+        self.db.flush()
+        self.digest.record_deltas({dish_id: delta})
         self.db.commit()
+        stock_changes.record(dish_id, delta, stock=stock)
     
-    def adjust_stock_batch(self, updates: list[tuple[int, int]]) -> None:
+    def adjust_stock_batch(self, updates: list[tuple[int, int]], atomic: bool = True) -> StockBatchResult:
         """
-        批量调整库存
-        参数：updates = [(dish_id, delta), ...]
-        事务性：任一失败则整体回滚
+        批量调整库存（集合操作）
+        参数：
+          - updates = [(dish_id, delta), ...]，同一菜品多次出现时合并
+          - atomic: True 时任一失败则整体回滚；False 时跳过失败项、提交其余
+        步骤：
+          1. SELECT ... WHERE dish_id IN (...) 一次校验存在性并预判库存
+          2. UPDATE dishes SET stock = stock + CASE dish_id ... END
+             WHERE dish_id IN (...) AND stock + CASE ... >= 0
+        并发：若步骤 1、2 之间库存被修改导致命中行数不足，回滚后重试
+        返回：StockBatchResult（applied / failures）
+        异常：atomic=True 且存在失败时抛出 StockBatchError（ValueError 子类）
         """
+        deltas: Dict[int, int] = {}
+        for dish_id, delta in updates:
+            deltas[dish_id] = deltas.get(dish_id, 0) + delta
+
         try:
-            for dish_id, delta in updates:
-                dish = self.db.query(Dish).filter(Dish.dish_id == dish_id).first()
-                if not dish:
-                    raise ValueError(f"菜品不存在：dish_id={dish_id}")
-                dish.update_stock(delta)
-            self.db.commit()
+            for _ in range(BATCH_MAX_ATTEMPTS):
+                result = self._validate_batch(deltas)
+                if result.failures and atomic:
+                    raise StockBatchError(result)
+
+                valid = {d: deltas[d] for d in result.applied}
+                if self._apply_deltas(valid) == len(valid):
+                    self.digest.record_deltas(valid)
+                    self.db.commit()
+                    stock_changes.record_many(valid.items())
+                    return result
+                # 校验后库存被并发扣减，回滚重新校验
+                self.db.rollback()
+
+            result = StockBatchResult(failures=[
+                StockAdjustFailure(dish_id=d, delta=delta, reason="conflict",
+                                   message=f"库存并发冲突：dish_id={d}，请重试")
+                for d, delta in deltas.items()
+            ])
+            raise StockBatchError(result)
         except Exception:
             self.db.rollback()
             raise
+
+    def _validate_batch(self, deltas: Dict[int, int]) -> StockBatchResult:
+        """一次 IN 查询读取库存，区分可调整与失败的菜品"""
+        current: Dict[int, int] = {}
+        for chunk in _chunks(list(deltas), BATCH_CHUNK_SIZE):
+            rows = self.db.execute(
+                select(Dish.dish_id, Dish.stock).where(Dish.dish_id.in_(chunk))
+            ).all()
+            current.update({dish_id: stock or 0 for dish_id, stock in rows})
+
+        result = StockBatchResult()
+        for dish_id, delta in deltas.items():
+            if dish_id not in current:
+                result.failures.append(StockAdjustFailure(
+                    dish_id=dish_id, delta=delta, reason="missing_dish",
+                    message=f"菜品不存在：dish_id={dish_id}"
+                ))
+            elif current[dish_id] + delta < 0:
+                result.failures.append(StockAdjustFailure(
+                    dish_id=dish_id, delta=delta, reason="insufficient_stock", stock=current[dish_id],
+                    message=f"库存不足：dish_id={dish_id} 当前 {current[dish_id]}，尝试调整 {delta}"
+                ))
+            else:
+                result.applied.append(dish_id)
+        return result
+
+    def _apply_deltas(self, deltas: Dict[int, int]) -> int:
+        """
+        按 CASE 表达式批量加减库存，带 stock + delta >= 0 守卫
+        返回：实际更新的行数
+        """
+        updated = 0
+        for chunk in _chunks(list(deltas), UPDATE_CHUNK_SIZE):
+            delta_expr = case({d: deltas[d] for d in chunk}, value=Dish.dish_id)
+            result = self.db.execute(
+                sa_update(Dish)
+                .where(Dish.dish_id.in_(chunk), Dish.stock + delta_expr >= 0)
+                .values(stock=Dish.stock + delta_expr)
+                .execution_options(synchronize_session=False)
+            )
+            updated += result.rowcount
+        return updated
+    
+    def restock(self, deltas: Dict[int, int]) -> int:
+        """
+        在调用方事务中按菜品加回库存（不提交，如取消订单退库存）
+        参数：deltas = {dish_id: 加回数量}，数量均为正
+        返回：实际更新的行数（已删除的菜品跳过）
+        """
+        updated = self._apply_deltas(deltas)
+        if updated < len(deltas):
+            existing = set()
+            for chunk in _chunks(list(deltas), BATCH_CHUNK_SIZE):
+                existing.update(self.db.execute(select(Dish.dish_id).where(Dish.dish_id.in_(chunk))).scalars())
+            deltas = {d: delta for d, delta in deltas.items() if d in existing}
+        self.digest.record_deltas(deltas)
+        return updated
     
     def get_stock(self, dish_id: int) -> int:
         """
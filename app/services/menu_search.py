@@ -0,0 +1,244 @@
+"""
+菜品搜索（进程内倒排索引）
+
+Dish.name 的 B-tree 索引无法支持 LIKE '%鱼%'，因此把菜名、分类名、口味选项名编入内存倒排索引：
+  - 文本规范化（NFKC、小写、去空白）后切分为单字与相邻二字（n-gram），中文无需分词
+  - 安装 pypinyin 时，菜名额外生成全拼（gongbaojiding）与首字母（gbjd）两个字段，同样编入索引
+  - 查询：每个关键词取其二字（单字关键词取单字）的倒排表求交集得到候选，再以子串校验去掉误命中，
+    按命中字段（菜名 > 拼音 > 分类 > 选项）与前缀/全匹配打分
+  - 菜单写入后发布 MENU_SEARCH / MENU_SEARCH_CATEGORIES 失效消息（见 app/invalidation.py），
+    索引标记脏菜品，下一次搜索时只重建这些菜品的条目
+索引只保存 dish_id 与文本，价格、库存等实时字段由调用方按 id 回表读取
+"""
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+from app.invalidation import MENU_SEARCH, MENU_SEARCH_CATEGORIES, bus
+from app.models.dish import Category, Dish, OptionGroup, OptionItem
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # pragma: no cover - 仅在未安装 pypinyin 的环境中执行
+    lazy_pinyin = None
+
+# 字段基础分；前缀命中 +10，全匹配 +20
+NAME_SCORE = 100
+PINYIN_SCORE = 60
+CATEGORY_SCORE = 30
+OPTION_SCORE = 20
+
+# 文本 -> 每个字的拼音（小写、不带声调）
+PinyinFunc = Callable[[str], List[str]]
+
+
+def _default_pinyin() -> Optional[PinyinFunc]:
+    if lazy_pinyin is None:
+        return None
+    return lambda text: lazy_pinyin(text, style=Style.NORMAL, errors="ignore")
+
+
+def normalize(text: str) -> str:
+    """NFKC（全角转半角）、小写、去掉空白"""
+    return "".join(unicodedata.normalize("NFKC", text or "").lower().split())
+
+
+def ngrams(text: str) -> Set[str]:
+    """单字与相邻二字"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def _query_grams(term: str) -> Set[str]:
+    """关键词用于取倒排表的 gram：单字关键词取单字，否则取全部二字"""
+    if len(term) == 1:
+        return {term}
+    return {term[i:i + 2] for i in range(len(term) - 1)}
+
+
+@dataclass(frozen=True)
+class SearchDoc:
+    """一道菜的可搜索文本"""
+    dish_id: int
+    name: str
+    fields: Tuple[Tuple[str, int], ...]     # (规范化文本, 基础分)
+    grams: frozenset
+
+    def score(self, term: str) -> int:
+        """关键词在各字段中的最高得分；不是任何字段的子串时为 0"""
+        best = 0
+        for text, base in self.fields:
+            if term not in text:
+                continue
+            score = base + (20 if text == term else 10 if text.startswith(term) else 0)
+            best = max(best, score)
+        return best
+
+
+class MenuSearchIndex:
+    """菜品倒排索引（线程安全，按脏标记增量重建）"""
+
+    def __init__(self, pinyin: Optional[PinyinFunc] = None):
+        """参数：pinyin 为空时使用 pypinyin（未安装时不支持拼音匹配）"""
+        self._pinyin = pinyin or _default_pinyin()
+        self._docs: Dict[int, SearchDoc] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+        self._stale = True                      # 需要全量重建
+        self._dirty_dishes: Set[int] = set()
+        self._dirty_categories: Set[int] = set()
+
+    # ------- 失效 -------
+    def invalidate(self, dish_ids: Optional[Iterable[int]] = None) -> None:
+        """标记菜品需要重建；dish_ids 为空时下一次搜索全量重建"""
+        with self._lock:
+            if dish_ids is None:
+                self._stale = True
+            else:
+                self._dirty_dishes.update(dish_ids)
+
+    def invalidate_categories(self, category_ids: Optional[Iterable[int]] = None) -> None:
+        """分类改名/删除后，重建该分类下全部菜品；category_ids 为空时全量重建"""
+        if category_ids is None:
+            self.invalidate()
+            return
+        with self._lock:
+            self._dirty_categories.update(category_ids)
+
+    # ------- 建索引 -------
+    def _build_docs(self, db: Session, dish_ids: Optional[List[int]] = None,
+                    category_ids: Optional[List[int]] = None) -> Dict[int, SearchDoc]:
+        """读取菜品、分类与选项名（两次查询），生成文档；dish_ids 与 category_ids 均为空时读取全部"""
+        stmt = select(Dish.dish_id, Dish.name, Category.name).join(
+            Category, Category.category_id == Dish.category_id, isouter=True
+        )
+        if dish_ids is not None or category_ids is not None:
+            conditions = []
+            if dish_ids:
+                conditions.append(Dish.dish_id.in_(dish_ids))
+            if category_ids:
+                conditions.append(Dish.category_id.in_(category_ids))
+            if not conditions:
+                return {}
+            stmt = stmt.where(or_(*conditions))
+        dishes = db.execute(stmt).all()
+        if not dishes:
+            return {}
+
+        options: Dict[int, List[str]] = {}
+        option_stmt = select(OptionGroup.dish_id, OptionGroup.name, OptionItem.name).join(
+            OptionItem, OptionItem.group_id == OptionGroup.group_id, isouter=True
+        )
+        if dish_ids is not None or category_ids is not None:
+            option_stmt = option_stmt.where(OptionGroup.dish_id.in_([row[0] for row in dishes]))
+        for dish_id, group_name, item_name in db.execute(option_stmt):
+            names = options.setdefault(dish_id, [])
+            names.append(group_name)
+            if item_name:
+                names.append(item_name)
+
+        return {
+            dish_id: self._doc(dish_id, name, category or "", options.get(dish_id, ()))
+            for dish_id, name, category in dishes
+        }
+
+    def _doc(self, dish_id: int, name: str, category: str, options: Iterable[str]) -> SearchDoc:
+        fields = [(normalize(name), NAME_SCORE)]
+        if self._pinyin is not None:
+            syllables = [s.lower() for s in self._pinyin(name) if s]
+            if syllables:
+                fields.append(("".join(syllables), PINYIN_SCORE))
+                fields.append(("".join(s[0] for s in syllables), PINYIN_SCORE))
+        fields.append((normalize(category), CATEGORY_SCORE))
+        fields.extend((normalize(option), OPTION_SCORE) for option in dict.fromkeys(options))
+        fields = tuple((text, base) for text, base in fields if text)
+        grams = frozenset().union(*(ngrams(text) for text, _ in fields))
+        return SearchDoc(dish_id=dish_id, name=name, fields=fields, grams=grams)
+
+    def _remove(self, dish_id: int) -> None:
+        doc = self._docs.pop(dish_id, None)
+        if doc is None:
+            return
+        for gram in doc.grams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(dish_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def _add(self, doc: SearchDoc) -> None:
+        self._docs[doc.dish_id] = doc
+        for gram in doc.grams:
+            self._postings.setdefault(gram, set()).add(doc.dish_id)
+
+    def refresh(self, db: Session) -> None:
+        """处理积压的失效标记：全量重建，或只重建脏菜品（已删除的菜品移出索引）"""
+        with self._lock:
+            if self._stale:
+                docs = self._build_docs(db)
+                self._docs, self._postings = {}, {}
+                for doc in docs.values():
+                    self._add(doc)
+                self._stale = False
+                self._dirty_dishes.clear()
+                self._dirty_categories.clear()
+                return
+            if not self._dirty_dishes and not self._dirty_categories:
+                return
+            dish_ids, category_ids = list(self._dirty_dishes), list(self._dirty_categories)
+            docs = self._build_docs(db, dish_ids, category_ids)
+            for dish_id in set(dish_ids) | set(docs):
+                self._remove(dish_id)
+            for doc in docs.values():
+                self._add(doc)
+            self._dirty_dishes.clear()
+            self._dirty_categories.clear()
+
+    # ------- 查询 -------
+    def search(self, db: Session, query: str, limit: int = 20) -> List[int]:
+        """
+        搜索菜品
+        契约：
+          - 以空白分隔多个关键词，全部命中才返回（AND）
+          - 按得分降序，其次菜名较短者、dish_id 较小者在前
+        返回：dish_id 列表（至多 limit 个）
+        """
+        self.refresh(db)
+        terms = [normalize(term) for term in (query or "").split()]
+        terms = [term for term in terms if term]
+        if not terms:
+            return []
+        with self._lock:
+            candidates: Optional[Set[int]] = None
+            postings = sorted(
+                (self._postings.get(gram, set()) for term in terms for gram in _query_grams(term)),
+                key=len,
+            )
+            for posting in postings:
+                candidates = set(posting) if candidates is None else candidates & posting
+                if not candidates:
+                    return []
+            ranked = []
+            for dish_id in candidates:
+                doc = self._docs[dish_id]
+                total = 0
+                for term in terms:
+                    score = doc.score(term)
+                    if score == 0:
+                        break
+                    total += score
+                else:
+                    ranked.append((-total, len(doc.name), dish_id))
+        ranked.sort()
+        return [dish_id for _, _, dish_id in ranked[:limit]]
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+
+menu_search = MenuSearchIndex()
+bus.subscribe(MENU_SEARCH, menu_search.invalidate)
+bus.subscribe(MENU_SEARCH_CATEGORIES, menu_search.invalidate_categories)
@@ -1,21 +1,34 @@
 """菜品与分类服务"""
-from typing import List, Optional
+import functools
+from typing import Callable, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, update as sa_update
+from app.assets import logical_asset_url
+from app.events import stock_changes
+from app.cache import cached
+from app.config import settings
+from app.invalidation import MENU_CATEGORIES, MENU_SEARCH, MENU_SEARCH_CATEGORIES, OPTION_RULES, bus
+from app.services.inventory_digest import InventoryDigestService
+from app.services.menu_search import menu_search
 from app.models.dish import Category, Dish
 from app.schemas.dish import CategoryResponse, DishResponse
 
 
+class VersionConflictError(ValueError):
+    """乐观锁冲突：记录已被其他请求修改（version 不匹配）"""
+
+
 class MenuService:
     """菜品浏览服务"""
     
     def __init__(self, db: Session):
         self.db = db
     
+    @cached(MENU_CATEGORIES, ttl=settings.CACHE_DEFAULT_TTL, key=lambda: "all")
     def get_all_categories(self) -> List[CategoryResponse]:
         """
         获取所有分类
-        契约：按 sort_order 升序返回
+        契约：按 sort_order 升序返回；结果缓存，分类增删改后失效
         """
         categories = self.db.query(Category).order_by(Category.sort_order).all()
         return [CategoryResponse.model_validate(cat) for cat in categories]
@@ -52,6 +65,17 @@ class MenuService:
         契约：若不存在返回 None
         """
         return self.db.query(Dish).filter(Dish.dish_id == dish_id).first()
+
+    def search_dishes(self, query: str, limit: int = 20) -> List[DishResponse]:
+        """
+        按菜名 / 拼音 / 首字母 / 分类 / 口味选项搜索菜品
+        契约：索引只给出按相关度排序的 dish_id，价格与库存按主键回表读取（一次查询）
+        """
+        dish_ids = menu_search.search(self.db, query, limit)
+        if not dish_ids:
+            return []
+        dishes = {d.dish_id: d for d in self.db.query(Dish).filter(Dish.dish_id.in_(dish_ids))}
+        return [DishResponse.model_validate(dishes[i]) for i in dish_ids if i in dishes]
     
     def create_dish(self, category_id: int, name: str, price: float, 
                    image_url: str, stock: int, status: str) -> Dish:
@@ -61,44 +85,78 @@ class MenuService:
             category_id=category_id,
             name=name,
             price=price,
-            image_url=image_url,
+            image_url=logical_asset_url(image_url),
             stock=stock,
             status=DishStatus(status)
         )
         self.db.add(dish)
+        self.db.flush()
+        InventoryDigestService(self.db).add_dishes({dish.dish_id: dish.stock})
         self.db.commit()
         self.db.refresh(dish)
+        bus.publish(MENU_SEARCH, [dish.dish_id])
         return dish
     
     def update_dish_status(self, dish_id: int, status: str) -> Dish:
-        """上下架菜品"""
+        """上下架菜品（单条 UPDATE，同时递增版本号）"""
         from app.models.enums import DishStatus
-        dish = self.get_dish_detail(dish_id)
-        if not dish:
-            raise ValueError(f"菜品不存在：dish_id={dish_id}")
-        
-        dish.status = DishStatus(status)
-        self.db.commit()
-        self.db.refresh(dish)
+        dish = self._compare_and_swap(
+            Dish, Dish.dish_id, dish_id, None, {"status": DishStatus(status)}, "菜品"
+        )
+        stock_changes.record(dish.dish_id, stock=dish.stock, status=dish.status.value)
         return dish
 
+    def _compare_and_swap(self, model, pk_column, pk_value, expected_version: Optional[int],
+                          values: dict, label: str, before_commit: Optional[Callable[[], None]] = None):
+        """
+        乐观锁更新：UPDATE ... SET ..., version = version + 1 WHERE pk = ? [AND version = ?]
+        契约：
+          - 不做前置 SELECT，由 rowcount 判断是否命中
+          - expected_version 为 None 时不校验版本（兼容旧客户端），但仍递增版本号
+          - 未命中时才查询一次以区分"不存在"与"版本冲突"
+          - 命中后、提交前调用 before_commit（同一事务内的附带写入）
+        异常：记录不存在抛出 ValueError；版本冲突抛出 VersionConflictError
+        """
+        stmt = sa_update(model).where(pk_column == pk_value)
+        if expected_version is not None:
+            stmt = stmt.where(model.version == expected_version)
+        result = self.db.execute(
+            stmt.values(**values, version=model.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            self.db.rollback()
+            current = self.db.query(model.version).filter(pk_column == pk_value).scalar()
+            if current is None:
+                raise ValueError(f"{label}不存在：{pk_column.key}={pk_value}")
+            raise VersionConflictError(
+                f"{label}已被修改：当前版本 {current}，提交版本 {expected_version}，请刷新后重试"
+            )
+        if before_commit is not None:
+            before_commit()
+        self.db.commit()
+        # 提交后会话内对象已过期，这里读取到的是最新数据
+        return self.db.query(model).filter(pk_column == pk_value).first()
+
     # ------- Category CRUD & Dish update -------
     def create_category(self, name: str, sort_order: int = 0) -> Category:
         cat = Category(name=name, sort_order=sort_order)
         self.db.add(cat)
         self.db.commit()
         self.db.refresh(cat)
+        bus.publish(MENU_CATEGORIES)
         return cat
 
-    def update_category(self, category_id: int, name: str, sort_order: int = 0) -> Category:
-        cat = self.db.query(Category).filter(Category.category_id == category_id).first()
-        if not cat:
-            raise ValueError(f"分类不存在：category_id={category_id}")
-        cat.name = name
-        cat.sort_order = sort_order
-        self.db.commit()
-        self.db.refresh(cat)
-        return cat
+    def update_category(self, category_id: int, name: str, sort_order: int = 0,
+                        expected_version: Optional[int] = None) -> Category:
+        """更新分类（乐观锁，见 _compare_and_swap）"""
+        category = self._compare_and_swap(
+            Category, Category.category_id, category_id, expected_version,
+            {"name": name, "sort_order": sort_order}, "分类"
+        )
+        bus.publish(MENU_CATEGORIES)
+        bus.publish(MENU_SEARCH_CATEGORIES, [category_id])
+        return category
 
     def delete_category(self, category_id: int) -> None:
         cat = self.db.query(Category).filter(Category.category_id == category_id).first()
@@ -106,22 +164,40 @@ class MenuService:
             return
         self.db.delete(cat)
         self.db.commit()
+        bus.publish(MENU_CATEGORIES)
+        bus.publish(MENU_SEARCH_CATEGORIES, [category_id])
 
-    def update_dish(self, dish_id: int, **fields) -> Dish:
-        dish = self.get_dish_detail(dish_id)
-        if not dish:
-            raise ValueError(f"菜品不存在：dish_id={dish_id}")
-        for k, v in fields.items():
-            if v is not None and hasattr(dish, k):
-                setattr(dish, k, v)
-        self.db.commit()
-        self.db.refresh(dish)
+    def update_dish(self, dish_id: int, expected_version: Optional[int] = None, **fields) -> Dish:
+        """
+        更新菜品（乐观锁，见 _compare_and_swap）
+        参数：fields 中值为 None 的字段不修改
+        """
+        from app.models.enums import DishStatus
+        values = {k: v for k, v in fields.items() if v is not None and k in Dish.__table__.c}
+        values.pop("version", None)
+        if "status" in values:
+            values["status"] = DishStatus(values["status"])
+        if "image_url" in values:
+            # 旧客户端可能回写展示用的哈希地址，保存逻辑路径
+            values["image_url"] = logical_asset_url(values["image_url"])
+        # 库存被直接赋值，旧值未知：同一事务内按表重算该菜品所在的摘要桶
+        refresh = None
+        if "stock" in values:
+            refresh = functools.partial(InventoryDigestService(self.db).refresh_dishes, [dish_id])
+        dish = self._compare_and_swap(Dish, Dish.dish_id, dish_id, expected_version, values, "菜品", refresh)
+        if "stock" in values or "status" in values:
+            stock_changes.record(dish.dish_id, stock=dish.stock, status=dish.status.value)
+        if "name" in values or "category_id" in values:
+            bus.publish(MENU_SEARCH, [dish_id])
         return dish
 
     def delete_dish(self, dish_id: int) -> None:
         dish = self.get_dish_detail(dish_id)
         if not dish:
             return
+        InventoryDigestService(self.db).remove_dishes({dish_id: dish.stock})
         self.db.delete(dish)
         self.db.commit()
+        bus.publish(OPTION_RULES, [dish_id])
+        bus.publish(MENU_SEARCH, [dish_id])
 
@@ -0,0 +1,128 @@
+"""
+菜品口味选项规则
+
+每道菜的选项组与选项编译为一张只读规则表（所属组、必选组、最多可选数、加价），按 dish_id 缓存；
+下单时每个订单项在内存中完成校验与计价，耗时 O(选项数)，不再逐项查询 option_items。
+选项编辑（导入、后台增删改）后须发布失效消息：bus.publish(OPTION_RULES, dish_ids)（见 app/invalidation.py）。
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.cache import Cache, MemoryBackend
+from app.invalidation import OPTION_RULES
+from app.models.dish import OptionGroup, OptionItem
+from app.models.enums import OptionType
+
+
+class OptionRuleError(ValueError):
+    """选项校验失败；reason 用于下单失败指标"""
+
+    def __init__(self, reason: str, message: str):
+        self.reason = reason
+        super().__init__(message)
+
+
+@dataclass(frozen=True)
+class GroupRule:
+    """一个选项组的约束"""
+    group_id: int
+    name: str
+    required: bool
+    max_select: int      # 单选组恒为 1
+
+
+@dataclass(frozen=True)
+class OptionRule:
+    """一个选项"""
+    item_id: int
+    group_id: int
+    name: str
+    price_delta: Decimal
+    available: bool
+
+
+@dataclass(frozen=True)
+class DishOptionRules:
+    """一道菜编译后的选项规则"""
+    dish_id: int
+    groups: Dict[int, GroupRule]
+    options: Dict[int, OptionRule]
+
+    def price(self, option_item_ids: Iterable[int]) -> Tuple[List[int], Decimal]:
+        """
+        校验所选选项并计算加价
+        契约：
+          - 选项须属于该菜品且可用
+          - 每个必选组至少选一项；单选组至多一项；多选组不超过 max_select
+          - 重复的 id 只计一次
+        返回：(去重后的选项 id，加价合计)
+        异常：OptionRuleError
+        """
+        selected = list(dict.fromkeys(option_item_ids))
+        per_group: Dict[int, int] = {}
+        delta = Decimal(0)
+        for item_id in selected:
+            option = self.options.get(item_id)
+            if option is None:
+                raise OptionRuleError("option_mismatch", f"选项不属于该菜品：option_item_id={item_id}")
+            if not option.available:
+                raise OptionRuleError("option_unavailable", f"选项不可用：{option.name}")
+            per_group[option.group_id] = per_group.get(option.group_id, 0) + 1
+            delta += option.price_delta
+        for group in self.groups.values():
+            count = per_group.get(group.group_id, 0)
+            if group.required and count == 0:
+                raise OptionRuleError("option_required", f"请选择{group.name}")
+            if count > group.max_select:
+                raise OptionRuleError("option_limit", f"{group.name}最多选择 {group.max_select} 项")
+        return selected, delta
+
+
+def compile_rules(db: Session, dish_ids: Iterable[int]) -> Dict[int, DishOptionRules]:
+    """一次查询读取多道菜的选项组与选项，编译为规则表（没有选项的菜品得到空规则）"""
+    dish_ids = list(dish_ids)
+    groups: Dict[int, Dict[int, GroupRule]] = {dish_id: {} for dish_id in dish_ids}
+    options: Dict[int, Dict[int, OptionRule]] = {dish_id: {} for dish_id in dish_ids}
+    rows = db.execute(
+        select(OptionGroup.dish_id, OptionGroup.group_id, OptionGroup.name, OptionGroup.type,
+               OptionGroup.required, OptionGroup.max_select,
+               OptionItem.item_id, OptionItem.name, OptionItem.price_delta, OptionItem.available)
+        .outerjoin(OptionItem, OptionItem.group_id == OptionGroup.group_id)
+        .where(OptionGroup.dish_id.in_(dish_ids))
+    ).all()
+    for (dish_id, group_id, group_name, group_type, required, max_select,
+         item_id, item_name, price_delta, available) in rows:
+        if group_id not in groups[dish_id]:
+            single = group_type == OptionType.SINGLE
+            groups[dish_id][group_id] = GroupRule(
+                group_id=group_id, name=group_name, required=bool(required),
+                max_select=1 if single else max(max_select or 1, 1),
+            )
+        if item_id is not None:
+            options[dish_id][item_id] = OptionRule(
+                item_id=item_id, group_id=group_id, name=item_name,
+                price_delta=Decimal(price_delta or 0), available=bool(available),
+            )
+    return {
+        dish_id: DishOptionRules(dish_id=dish_id, groups=groups[dish_id], options=options[dish_id])
+        for dish_id in dish_ids
+    }
+
+
+class OptionRulesCache(Cache):
+    """
+    dish_id -> DishOptionRules
+    固定使用进程内后端：下单热路径直接使用缓存的对象，不做反序列化；跨进程一致性由失效总线保证
+    """
+
+    def __init__(self):
+        super().__init__(OPTION_RULES, backend=MemoryBackend(max_entries=100000))
+
+    def load(self, db: Session, dish_ids: Iterable[int]) -> Dict[int, DishOptionRules]:
+        """取多道菜的规则；未命中的菜品一次查询编译后写入缓存（并发下单同一道菜只编译一次）"""
+        return self.get_many_or_load(dish_ids, lambda missing: compile_rules(db, missing))
+
+
+option_rules = OptionRulesCache()
@@ -0,0 +1,194 @@
+"""口味选项管理服务（后台）"""
+from typing import List, Optional
+from sqlalchemy import and_, delete, exists, insert, select, update as sa_update
+from sqlalchemy.orm import Session, aliased
+from app.models.archive import order_item_options_archive
+from app.models.dish import Dish, OptionGroup, OptionItem
+from app.models.order import order_item_options
+from app.schemas.option import (
+    OptionGroupCreate, OptionGroupResponse, OptionGroupUpdate, OptionItemCreate, OptionItemResponse, OptionItemUpdate,
+)
+from app.invalidation import MENU_SEARCH, OPTION_RULES, bus
+
+
+class OptionInUseError(ValueError):
+    """选项已被历史订单引用，不能删除（应改为停售）"""
+
+
+class OptionService:
+    """
+    选项组 / 选项的增删改与批量操作
+    所有写操作提交后发布失效消息：对应菜品的下单选项规则（OPTION_RULES）与搜索索引（MENU_SEARCH）
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ------- 查询 -------
+    def list_groups(self, dish_id: int) -> List[OptionGroupResponse]:
+        """菜品的全部选项组（含停售选项）"""
+        groups = (
+            self.db.query(OptionGroup)
+            .filter(OptionGroup.dish_id == dish_id)
+            .order_by(OptionGroup.group_id)
+            .all()
+        )
+        return [OptionGroupResponse.model_validate(group) for group in groups]
+
+    def _group(self, group_id: int) -> OptionGroup:
+        group = self.db.get(OptionGroup, group_id)
+        if group is None:
+            raise ValueError(f"选项组不存在：group_id={group_id}")
+        return group
+
+    def _dish_of_item(self, item_id: int) -> int:
+        dish_id = self.db.execute(
+            select(OptionGroup.dish_id)
+            .join(OptionItem, OptionItem.group_id == OptionGroup.group_id)
+            .where(OptionItem.item_id == item_id)
+        ).scalar()
+        if dish_id is None:
+            raise ValueError(f"选项不存在：item_id={item_id}")
+        return dish_id
+
+    def _commit(self, dish_ids: Optional[List[int]]) -> None:
+        """提交并失效选项规则与搜索索引（选项名可搜索）；dish_ids 为 None 时全部失效"""
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        bus.publish(OPTION_RULES, dish_ids)
+        bus.publish(MENU_SEARCH, dish_ids)
+
+    # ------- 选项组 -------
+    def create_group(self, dish_id: int, dto: OptionGroupCreate) -> OptionGroupResponse:
+        """
+        新增选项组（连同 dto.items）
+        异常：菜品不存在时抛出 ValueError
+        """
+        if self.db.get(Dish, dish_id) is None:
+            raise ValueError(f"菜品不存在：dish_id={dish_id}")
+        group = OptionGroup(
+            dish_id=dish_id, name=dto.name, type=dto.type, required=dto.required, max_select=dto.max_select,
+            items=[OptionItem(**item.model_dump()) for item in dto.items],
+        )
+        self.db.add(group)
+        self._commit([dish_id])
+        return OptionGroupResponse.model_validate(group)
+
+    def update_group(self, group_id: int, dto: OptionGroupUpdate) -> OptionGroupResponse:
+        """编辑选项组（单条 UPDATE，为空的字段不修改）"""
+        group = self._group(group_id)
+        values = dto.model_dump(exclude_none=True)
+        if values:
+            self.db.execute(
+                sa_update(OptionGroup).where(OptionGroup.group_id == group_id).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            self._commit([group.dish_id])
+        return OptionGroupResponse.model_validate(self._group(group_id))
+
+    def delete_group(self, group_id: int) -> None:
+        """
+        删除选项组及其选项
+        异常：组内选项已被订单引用时抛出 OptionInUseError
+        """
+        group = self._group(group_id)
+        item_ids = select(OptionItem.item_id).where(OptionItem.group_id == group_id)
+        self._ensure_unused(item_ids)
+        self.db.execute(delete(OptionItem).where(OptionItem.group_id == group_id))
+        self.db.execute(delete(OptionGroup).where(OptionGroup.group_id == group_id))
+        self.db.expunge(group)
+        self._commit([group.dish_id])
+
+    # ------- 选项 -------
+    def create_item(self, group_id: int, dto: OptionItemCreate) -> OptionItemResponse:
+        group = self._group(group_id)
+        item = OptionItem(group_id=group_id, **dto.model_dump())
+        self.db.add(item)
+        self._commit([group.dish_id])
+        return OptionItemResponse.model_validate(item)
+
+    def update_item(self, item_id: int, dto: OptionItemUpdate) -> OptionItemResponse:
+        """编辑选项（单条 UPDATE，为空的字段不修改）"""
+        dish_id = self._dish_of_item(item_id)
+        values = dto.model_dump(exclude_none=True)
+        if values:
+            self.db.execute(
+                sa_update(OptionItem).where(OptionItem.item_id == item_id).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            self._commit([dish_id])
+        self.db.expire_all()
+        return OptionItemResponse.model_validate(self.db.get(OptionItem, item_id))
+
+    def delete_item(self, item_id: int) -> None:
+        """
+        删除选项
+        异常：已被订单引用时抛出 OptionInUseError
+        """
+        dish_id = self._dish_of_item(item_id)
+        self._ensure_unused(select(OptionItem.item_id).where(OptionItem.item_id == item_id))
+        self.db.execute(delete(OptionItem).where(OptionItem.item_id == item_id))
+        self._commit([dish_id])
+
+    def _ensure_unused(self, item_ids) -> None:
+        """订单（含归档订单）引用的选项不能删除，否则历史订单的选项与金额无法还原"""
+        for table in (order_item_options, order_item_options_archive):
+            if self.db.execute(select(exists().where(table.c.option_item_id.in_(item_ids)))).scalar():
+                raise OptionInUseError("选项已被订单引用，不能删除，请改为停售")
+
+    # ------- 批量操作 -------
+    def set_availability_by_name(self, name: str, available: bool, dish_ids: Optional[List[int]] = None) -> int:
+        """
+        按选项名批量上下架（一条 UPDATE）
+        参数：dish_ids 为空时作用于所有菜品
+        返回：更新的选项数
+        """
+        stmt = sa_update(OptionItem).where(OptionItem.name == name)
+        if dish_ids is not None:
+            stmt = stmt.where(OptionItem.group_id.in_(
+                select(OptionGroup.group_id).where(OptionGroup.dish_id.in_(dish_ids))
+            ))
+        result = self.db.execute(
+            stmt.values(available=available).execution_options(synchronize_session=False)
+        )
+        self._commit(dish_ids)
+        return result.rowcount
+
+    def clone_groups(self, source_dish_id: int, target_dish_ids: List[int]) -> dict:
+        """
+        把源菜品的选项组与选项复制到目标菜品（INSERT ... SELECT，组与选项各一条语句）
+        契约：目标菜品已有同名组时不重复建组，只补齐该组缺少的同名选项；源菜品自身与不存在的菜品跳过
+        返回：{"groups": 新建组数, "items": 新建选项数}
+        """
+        source = aliased(OptionGroup)
+        target = aliased(OptionGroup)
+        targets = [dish_id for dish_id in dict.fromkeys(target_dish_ids) if dish_id != source_dish_id]
+        if not targets:
+            return {"groups": 0, "items": 0}
+
+        groups = self.db.execute(insert(OptionGroup).from_select(
+            ["dish_id", "name", "type", "required", "max_select"],
+            select(Dish.dish_id, source.name, source.type, source.required, source.max_select)
+            .join(source, source.dish_id == source_dish_id)
+            .where(
+                Dish.dish_id.in_(targets),
+                ~exists().where(and_(target.dish_id == Dish.dish_id, target.name == source.name)),
+            ),
+        ))
+        existing = aliased(OptionItem)
+        items = self.db.execute(insert(OptionItem).from_select(
+            ["group_id", "name", "price_delta", "available"],
+            select(target.group_id, OptionItem.name, OptionItem.price_delta, OptionItem.available)
+            .join(source, source.group_id == OptionItem.group_id)
+            .join(target, target.name == source.name)
+            .where(
+                source.dish_id == source_dish_id,
+                target.dish_id.in_(targets),
+                ~exists().where(and_(existing.group_id == target.group_id, existing.name == OptionItem.name)),
+            ),
+        ))
+        self._commit(targets)
+        return {"groups": groups.rowcount, "items": items.rowcount}
@@ -1,13 +1,63 @@
 """订单服务"""
+import base64
+from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, update as sa_update
-from app.models.order import Order, OrderItem
-from app.models.dish import Dish, OptionItem
+from sqlalchemy import and_, func, insert, or_, select, union_all, update as sa_update
+from app.config import settings
+from app.models.archive import ArchivedOrder
+from app.models.order import Order, OrderItem, order_item_options
+from app.models.dish import Dish
 from app.models.enums import OrderStatus
-from app.schemas.order import OrderCreate, OrderResponse, OrderDetailResponse, OrderItemResponse
+from app.schemas.order import (
+    OrderCreate, OrderResponse, OrderDetailResponse, OrderItemResponse, OrderHistoryPage, OrderSummary,
+)
+from app.services.archive_service import ArchiveService
 from app.services.inventory_service import InventoryService
+from app.services.option_rules import OptionRuleError, option_rules
+from app.services.pricing import from_cents, to_cents
+from app.services.report_service import RollupService
+from app import metrics
+from app.events import order_events, stock_changes
+
+
+def _reject(reason: str, message: str) -> ValueError:
+    """记录下单失败原因（指标），并构造业务异常"""
+    metrics.ORDERS_FAILED.inc(reason=reason)
+    return ValueError(message)
+
+
+# 状态流转：目标状态 -> 允许的原状态（与 Order.complete / Order.cancel 的前置条件一致，常见状态在前）
+STATUS_TRANSITIONS = {
+    OrderStatus.COMPLETED: (OrderStatus.SUBMITTED,),
+    OrderStatus.CANCELLED: (OrderStatus.SUBMITTED, OrderStatus.CREATED),
+}
+
+
+def _publish_status(order_id: int, status: OrderStatus, old_status: OrderStatus) -> None:
+    """广播订单状态变更事件（order_completed / order_cancelled），须在提交之后调用"""
+    order_events.publish(f"order_{status.value.lower()}", {
+        "order_id": order_id,
+        "status": status.value,
+        "old_status": old_status.value,
+    })
+
+
+def encode_cursor(created_at: datetime, order_id: int) -> str:
+    """订单历史分页游标：上一页最后一条的 (created_at, order_id)"""
+    raw = f"{created_at.isoformat()}|{order_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析分页游标；格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        created_at, order_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("无效的分页游标") from e
 
 
 class OrderService:
@@ -24,7 +74,8 @@ class OrderService:
         事务边界：
           1. 开启事务
           2. 对所有涉及的 Dish 行加锁（SELECT ... FOR UPDATE）
-          3. 校验：status==OnShelf AND stock >= qty
+          3. 校验：status==OnShelf AND stock >= qty；选项按缓存的菜品规则在内存中校验
+             （属于该菜品、可用、必选组已选、不超过 max_select）
           4. 计算总价（dish.price + sum(option.price_delta)）* qty
           5. 扣减库存
           6. 插入 orders、order_items、order_item_options
@@ -46,35 +97,32 @@ class OrderService:
             self.db.flush()  # 获取 order_id
             
             total_price = Decimal(0)
+            rollup_lines = []
+            event_items = []
+            option_links = []
+            rules = option_rules.load(self.db, (item.dish_id for item in dto.items))
             
             # 处理每个订单项
             for item_dto in dto.items:
                 # 查询菜品（用于价格与名称快照）；并发校验在条件更新时完成
                 dish = self.db.query(Dish).filter(Dish.dish_id == item_dto.dish_id).first()
                 if not dish:
-                    raise ValueError(f"菜品不存在：dish_id={item_dto.dish_id}")
+                    raise _reject("missing_dish", f"菜品不存在：dish_id={item_dto.dish_id}")
 
-                # 查询选中的口味选项
-                selected_options = []
-                if item_dto.option_item_ids:
-                    selected_options = self.db.query(OptionItem).filter(
-                        OptionItem.item_id.in_(item_dto.option_item_ids)
-                    ).all()
-                    
-                    # 校验选项可用性
-                    for opt in selected_options:
-                        if not opt.available:
-                            raise ValueError(f"选项不可用：{opt.name}")
+                # 校验选中的口味选项并计算加价（内存中完成）
+                try:
+                    option_ids, option_price = rules[dish.dish_id].price(item_dto.option_item_ids)
+                except OptionRuleError as e:
+                    raise _reject(e.reason, str(e))
                 
                 # 计算单项价格
-                option_price = sum((opt.price_delta for opt in selected_options), Decimal(0))
                 item_total = (dish.price + option_price) * item_dto.qty
                 total_price += item_total
                 
                 # 先检查菜品状态
                 from app.models.enums import DishStatus as DS
                 if dish.status != DS.ON_SHELF:
-                    raise ValueError(f"菜品不可用：{dish.name}（已下架）")
+                    raise _reject("off_shelf", f"菜品不可用：{dish.name}（已下架）")
                 
                 # 并发安全的条件扣减库存（SQLite 兼容）
                 result = self.db.execute(
@@ -87,30 +135,56 @@ class OrderService:
                     .values(stock=Dish.stock - item_dto.qty)
                 )
                 if result.rowcount == 0:
+                    metrics.STOCK_DECREMENT_CONFLICTS.inc()
                     # 重新查询以获取最新状态
                     self.db.refresh(dish)
                     if dish.status != DS.ON_SHELF:
-                        raise ValueError(f"菜品不可用：{dish.name}（已下架）")
-                    raise ValueError(f"库存不足：{dish.name} 当前库存 {dish.stock}，需要 {item_dto.qty}")
+                        raise _reject("off_shelf", f"菜品不可用：{dish.name}（已下架）")
+                    raise _reject("stock_shortage", f"库存不足：{dish.name} 当前库存 {dish.stock}，需要 {item_dto.qty}")
                 
                 # 创建订单项
                 order_item = OrderItem(
                     order_id=order.order_id,
                     dish_id=dish.dish_id,
                     qty=item_dto.qty,
-                    unit_price=dish.price,
-                    selected_options=selected_options
+                    unit_price=dish.price
                 )
                 self.db.add(order_item)
+                option_links.append((order_item, option_ids))
+                rollup_lines.append((dish.dish_id, dish.category_id, item_dto.qty, to_cents(item_total)))
+                event_items.append({
+                    "dish_id": dish.dish_id, "dish_name": dish.name,
+                    "qty": item_dto.qty, "subtotal": str(item_total),
+                })
+            
+            # 一次 flush 取得订单项 id，再批量写入订单项与选项的关联
+            self.db.flush()
+            links = [
+                {"order_item_id": order_item.id, "option_item_id": option_id}
+                for order_item, option_ids in option_links for option_id in option_ids
+            ]
+            if links:
+                self.db.execute(insert(order_item_options), links)
             
-            # 提交订单状态
+            # 提交订单状态，写入冗余汇总
             order.status = OrderStatus.SUBMITTED
+            order.total_cents = to_cents(total_price)
+            order.item_count = sum(item.qty for item in dto.items)
+            
+            # 同一事务内累加销售汇总与库存摘要
+            RollupService(self.db).record_order_created(order.created_at, order.status, rollup_lines)
+            stock_deltas = {}
+            for item in dto.items:
+                stock_deltas[item.dish_id] = stock_deltas.get(item.dish_id, 0) - item.qty
+            self.inventory_service.digest.record_deltas(stock_deltas)
             
             # 提交事务
             self.db.commit()
             self.db.refresh(order)
+            metrics.ORDERS_CREATED.inc()
+            stock_changes.record_many((item.dish_id, -item.qty) for item in dto.items)
             
-            return OrderResponse(
+            response = OrderResponse(
                 order_id=order.order_id,
                 user_id=order.user_id,
                 status=order.status.value,
@@ -118,23 +192,24 @@ class OrderService:
                 remark=order.remark,
                 created_at=order.created_at
             )
+            order_events.publish("order_created", {**response.model_dump(mode="json"), "items": event_items})
+            return response
         
         except Exception as e:
             self.db.rollback()
+            if not isinstance(e, ValueError):
+                metrics.ORDERS_FAILED.inc(reason="error")
             raise e
     
-    def cancel_order(self, order_id: int) -> None:
+    def cancel_order(self, order_id: int, restock: Optional[bool] = None) -> None:
         """
         取消订单
+        参数：restock 是否退库存，默认取 settings.RESTOCK_ON_CANCEL
         前置条件：order.status in [CREATED, SUBMITTED]
-        后置条件：order.status = CANCELLED（不退库存）
+        后置条件：order.status = CANCELLED；restock 时各菜品库存加回下单数量（同一事务）
         """
-        order = self.db.query(Order).filter(Order.order_id == order_id).first()
-        if not order:
-            raise ValueError(f"订单不存在：order_id={order_id}")
-        
-        order.cancel()
-        self.db.commit()
+        if not self._transition([order_id], OrderStatus.CANCELLED, restock=restock):
+            self._raise_transition_error(order_id, "取消")
     
     def complete_order(self, order_id: int) -> None:
         """
@@ -142,26 +217,116 @@ class OrderService:
         前置条件：order.status == SUBMITTED
         后置条件：order.status = COMPLETED
         """
-        order = self.db.query(Order).filter(Order.order_id == order_id).first()
-        if not order:
+        if not self._transition([order_id], OrderStatus.COMPLETED):
+            self._raise_transition_error(order_id, "完成")
+    
+    def cancel_orders(self, order_ids: Iterable[int], restock: Optional[bool] = None) -> List[int]:
+        """
+        批量取消订单
+        契约：单个事务；状态不允许取消或不存在的订单跳过；
+              restock 时所有取消订单的数量按菜品合并后一次加回
+        返回：成功取消的 order_id（升序）
+        """
+        return self._transition(order_ids, OrderStatus.CANCELLED, restock=restock)
+    
+    def complete_orders(self, order_ids: Iterable[int]) -> List[int]:
+        """
+        批量完成订单（后厨"全部出餐"）
+        契约：单个事务；非 Submitted 或不存在的订单跳过
+        返回：成功完成的 order_id（升序）
+        """
+        return self._transition(order_ids, OrderStatus.COMPLETED)
+    
+    def _transition(self, order_ids: Iterable[int], target: OrderStatus,
+                    restock: Optional[bool] = None) -> List[int]:
+        """
+        条件更新状态：UPDATE orders SET status=? WHERE order_id IN (...) AND status=?
+        按 STATUS_TRANSITIONS 中的原状态依次执行，全部命中后不再执行后续语句（通常只有一条 UPDATE）；
+        命中的行即流转成功的订单，并发的重复操作只有一个生效
+        汇总表、退库存与状态更新同一事务，提交后广播事件
+        """
+        if restock is None:
+            restock = settings.RESTOCK_ON_CANCEL
+        restock = restock and target == OrderStatus.CANCELLED
+        remaining = set(order_ids)
+        changed = []
+        restocked = {}
+        try:
+            for source in STATUS_TRANSITIONS[target]:
+                if not remaining:
+                    break
+                rows = self._update_status(remaining, source, target)
+                if rows:
+                    RollupService(self.db).record_status_changes(rows, source, target)
+                    changed.extend((row.order_id, source) for row in rows)
+                    remaining.difference_update(row.order_id for row in rows)
+            if restock and changed:
+                restocked = self._restock([order_id for order_id, _ in changed])
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        stock_changes.record_many(restocked.items())
+        for order_id, source in changed:
+            _publish_status(order_id, target, source)
+        return sorted(order_id for order_id, _ in changed)
+    
+    def _update_status(self, order_ids: Iterable[int], source: OrderStatus, target: OrderStatus) -> list:
+        """
+        把处于 source 状态的订单改为 target
+        返回：命中的 (order_id, created_at, total_cents) 行；支持 UPDATE ... RETURNING 的方言只需一条语句，
+              其他方言（MySQL）先 SELECT ... FOR UPDATE 锁定命中行再更新
+        """
+        condition = and_(Order.order_id.in_(list(order_ids)), Order.status == source)
+        columns = (Order.order_id, Order.created_at, Order.total_cents)
+        if self.db.get_bind().dialect.update_returning:
+            return self.db.execute(
+                sa_update(Order).where(condition).values(status=target).returning(*columns)
+            ).all()
+        rows = self.db.execute(select(*columns).where(condition).with_for_update()).all()
+        if rows:
+            self.db.execute(
+                sa_update(Order).where(Order.order_id.in_([row.order_id for row in rows])).values(status=target)
+            )
+        return rows
+    
+    def _restock(self, order_ids: List[int]) -> dict:
+        """
+        退库存：按 dish_id 汇总这些订单的下单数量（一次 GROUP BY），再用一条 CASE 更新加回
+        返回：{dish_id: 加回数量}
+        """
+        rows = self.db.execute(
+            select(OrderItem.dish_id, func.sum(OrderItem.qty))
+            .where(OrderItem.order_id.in_(order_ids))
+            .group_by(OrderItem.dish_id)
+        ).all()
+        deltas = {dish_id: int(qty) for dish_id, qty in rows}
+        self.inventory_service.restock(deltas)
+        return deltas
+    
+    def _raise_transition_error(self, order_id: int, action: str) -> None:
+        """流转未命中时区分订单不存在与状态不允许"""
+        status = self.db.execute(select(Order.status).where(Order.order_id == order_id)).scalar()
+        if status is None:
             raise ValueError(f"订单不存在：order_id={order_id}")
-        
-        order.complete()
-        self.db.commit()
+        raise ValueError(f"订单状态错误：当前为 {status.value}，无法{action}")
     
     def get_order_by_id(self, order_id: int) -> Optional[OrderDetailResponse]:
         """
         查询订单详情
-        契约：包含订单项明细与总价
+        契约：包含订单项明细与总价；已归档订单同样可查
         """
         order = self.db.query(Order).filter(Order.order_id == order_id).first()
+        if not order:
+            # 热表未命中时回退到归档表
+            order = ArchiveService(self.db).get_archived_order(order_id)
         if not order:
             return None
         
-        # 构建订单项响应
+        # 构建订单项响应（数据来自数据库，直接构造不再校验）
         items_response = []
         for item in order.items:
-            items_response.append(OrderItemResponse(
+            items_response.append(OrderItemResponse.model_construct(
                 id=item.id,
                 dish_id=item.dish_id,
                 dish_name=item.dish.name,
@@ -170,7 +335,7 @@ class OrderService:
                 subtotal=item.subtotal()
             ))
         
-        return OrderDetailResponse(
+        return OrderDetailResponse.model_construct(
             order_id=order.order_id,
             user_id=order.user_id,
             status=order.status.value,
@@ -206,7 +371,7 @@ class OrderService:
         orders = query.order_by(Order.created_at.desc()).offset(offset).limit(size).all()
         
         return [
-            OrderResponse(
+            OrderResponse.model_construct(
                 order_id=order.order_id,
                 user_id=order.user_id,
                 status=order.status.value,
@@ -217,3 +382,49 @@ class OrderService:
             for order in orders
         ]
 
+    def list_user_orders(self, user_id: int, limit: int = 20, cursor: Optional[str] = None) -> OrderHistoryPage:
+        """
+        用户订单历史（含已归档订单），按下单时间倒序
+        契约：
+          - keyset 分页：cursor 为上一页返回的 next_cursor，不使用 OFFSET
+          - 一条查询：热表与归档表各自走 (user_id, created_at DESC, order_id DESC) 覆盖索引取 limit + 1 行，
+            UNION ALL 后再取前 limit 行；摘要来自下单时写入的 total_cents / item_count，不加载明细
+        异常：cursor 无效时抛出 ValueError
+        """
+        after = decode_cursor(cursor) if cursor else None
+        sources = []
+        for model in (Order, ArchivedOrder):
+            stmt = select(
+                model.order_id, model.status, model.total_cents, model.item_count, model.created_at,
+            ).where(model.user_id == user_id)
+            if after is not None:
+                created_at, order_id = after
+                stmt = stmt.where(or_(
+                    model.created_at < created_at,
+                    and_(model.created_at == created_at, model.order_id < order_id),
+                ))
+            sources.append(select(
+                stmt.order_by(model.created_at.desc(), model.order_id.desc()).limit(limit + 1).subquery()
+            ))
+        history = union_all(*sources).subquery()
+        rows = self.db.execute(
+            select(history)
+            .order_by(history.c.created_at.desc(), history.c.order_id.desc())
+            .limit(limit + 1)
+        ).all()
+
+        items = [
+            OrderSummary.model_construct(
+                order_id=row.order_id,
+                status=row.status.value,
+                total_price=from_cents(row.total_cents),
+                item_count=row.item_count,
+                created_at=row.created_at,
+            )
+            for row in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last.created_at, last.order_id)
+        return OrderHistoryPage.model_construct(items=items, next_cursor=next_cursor)
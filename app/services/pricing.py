@@ -0,0 +1,116 @@
+"""
+定价引擎（列式、整数分）
+
+订单金额统一按 (unit_price + option_delta_sum) * qty 计算：
+  - OrderItem.subtotal() / Order.total_price()：逐对象 Decimal 计算（单个订单）
+  - 本模块：把成千上万行明细按列组织为整数分数组，一次 NumPy 运算得出行小计与订单总价，
+    用于报表、导出与总价回填；未安装 NumPy 时退化为等价的纯 Python 计算
+金额以"分"为单位的 int64 表示，只要输入为两位小数即与 Decimal 计算结果完全一致
+NumPy 在首次批量计算时才导入，不计入服务启动耗时
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Hashable, List, Optional, Sequence
+
+_NOT_LOADED = object()
+np = _NOT_LOADED
+
+
+def _numpy():
+    """按需导入 NumPy；未安装时返回 None"""
+    global np
+    if np is _NOT_LOADED:
+        try:
+            import numpy  # pylint: disable=import-outside-toplevel
+            np = numpy
+        except ImportError:  # pragma: no cover - 仅在未安装 NumPy 的环境中执行
+            np = None
+    return np
+
+
+def to_cents(amount) -> int:
+    """金额转为整数分（四舍五入）"""
+    return int((Decimal(amount or 0) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> Decimal:
+    """整数分转为两位小数金额"""
+    return (Decimal(int(cents or 0)) / 100).quantize(Decimal("0.01"))
+
+
+def line_totals_cents(unit_price_cents: Sequence[int], qty: Sequence[int],
+                      option_delta_cents: Sequence[int]):
+    """
+    行小计（分）：(unit_price + option_delta_sum) * qty
+    返回：NumPy int64 数组（无 NumPy 时为 list）
+    """
+    np = _numpy()
+    if np is None:
+        return [(u + o) * q for u, q, o in zip(unit_price_cents, qty, option_delta_cents)]
+    unit = np.asarray(unit_price_cents, dtype=np.int64)
+    delta = np.asarray(option_delta_cents, dtype=np.int64)
+    return (unit + delta) * np.asarray(qty, dtype=np.int64)
+
+
+def order_totals_cents(order_index: Sequence[int], unit_price_cents: Sequence[int],
+                       qty: Sequence[int], option_delta_cents: Sequence[int],
+                       n_orders: Optional[int] = None):
+    """
+    订单总价（分）：按 order_index（0..n_orders-1）把行小计分组求和
+    返回：长度为 n_orders 的 int64 数组（无 NumPy 时为 list）
+    """
+    lines = line_totals_cents(unit_price_cents, qty, option_delta_cents)
+    if n_orders is None:
+        n_orders = (max(order_index) + 1) if len(order_index) else 0
+    np = _numpy()
+    if np is None:
+        totals = [0] * n_orders
+        for i, cents in zip(order_index, lines):
+            totals[i] += cents
+        return totals
+    totals = np.zeros(n_orders, dtype=np.int64)
+    np.add.at(totals, np.asarray(order_index, dtype=np.intp), lines)
+    return totals
+
+
+class OrderPricer:
+    """
+    列式累加器：逐行追加明细，最后一次性计算
+    示例：
+        pricer = OrderPricer()
+        pricer.add_line(order_id, unit_price, qty, option_delta)
+        totals = pricer.order_totals()   # {order_id: Decimal}
+    """
+
+    def __init__(self):
+        self._keys: Dict[Hashable, int] = {}
+        self._index: List[int] = []
+        self._unit: List[int] = []
+        self._qty: List[int] = []
+        self._delta: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def add_line(self, order_key: Hashable, unit_price, qty: int, option_delta=0) -> None:
+        """追加一行明细（金额为 Decimal，内部转为分）"""
+        self._index.append(self._keys.setdefault(order_key, len(self._keys)))
+        self._unit.append(to_cents(unit_price))
+        self._qty.append(qty)
+        self._delta.append(to_cents(option_delta))
+
+    def line_totals_cents(self) -> List[int]:
+        """按追加顺序返回行小计（分）"""
+        return [int(v) for v in line_totals_cents(self._unit, self._qty, self._delta)]
+
+    def line_totals(self) -> List[Decimal]:
+        """按追加顺序返回行小计"""
+        return [from_cents(v) for v in self.line_totals_cents()]
+
+    def order_totals_cents(self) -> Dict[Hashable, int]:
+        """返回 {order_key: 总价（分）}"""
+        totals = order_totals_cents(self._index, self._unit, self._qty, self._delta, len(self._keys))
+        return {key: int(totals[i]) for key, i in self._keys.items()}
+
+    def order_totals(self) -> Dict[Hashable, Decimal]:
+        """返回 {order_key: 总价}"""
+        return {key: from_cents(cents) for key, cents in self.order_totals_cents().items()}
@@ -0,0 +1,272 @@
+"""
+销售汇总与报表服务
+  - RollupService：在下单、完成、取消时增量维护汇总表，并支持从历史订单重建
+  - ReportService：仪表盘查询，只读汇总表，耗时与订单总量无关
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from app.db import upsert_increment
+from app.models.dish import Category, Dish, OptionItem
+from app.models.enums import OrderStatus
+from app.models.order import OrderItem, order_item_options
+from app.models.report import DishDailySales, CategoryHourlySales, StatusDailyStats
+from app.schemas.report import (
+    DishDailyRow, DishRankingRow, CategoryHourlyRow, StatusDailyRow, SalesSummary,
+)
+from app.services.pricing import OrderPricer, from_cents
+
+# 汇总行：(dish_id, category_id, qty, 小计（分）)
+RollupLine = Tuple[int, Optional[int], int, int]
+
+
+def _hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class RollupService:
+    """汇总表增量维护"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_order_created(self, created_at: datetime, status: OrderStatus,
+                             lines: Iterable[RollupLine]) -> None:
+        """
+        下单：累加菜品日销量、分类小时销量与状态统计
+        前置条件：与订单写入处于同一事务
+        """
+        lines = list(lines)
+        self._apply_sales(created_at, lines, sign=1)
+        self._apply_status(created_at.date(), status, 1, sum(line[3] for line in lines))
+
+    def record_status_changes(self, orders: Iterable[Tuple[int, datetime, int]],
+                              old_status: OrderStatus, new_status: OrderStatus) -> None:
+        """
+        状态变更（可批量）：orders 为 (order_id, created_at, 总价（分）)
+        原状态 -1、新状态 +1；取消时从销量中扣回这些订单
+        前置条件：与状态更新处于同一事务
+        """
+        orders = list(orders)
+        per_day: Dict[date, List[int]] = defaultdict(lambda: [0, 0])
+        for _, created_at, cents in orders:
+            per_day[created_at.date()][0] += 1
+            per_day[created_at.date()][1] += cents
+        for day, (count, cents) in per_day.items():
+            self._apply_status(day, old_status, -count, -cents)
+            self._apply_status(day, new_status, count, cents)
+        if new_status == OrderStatus.CANCELLED:
+            lines = self.order_lines([order_id for order_id, _, _ in orders])
+            for order_id, created_at, _ in orders:
+                self._apply_sales(created_at, lines.get(order_id, []), sign=-1)
+
+    def order_lines(self, order_ids: List[int]) -> Dict[int, List[RollupLine]]:
+        """一次读取多个订单的明细并计算每行小计（分）"""
+        option_delta = (
+            select(func.coalesce(func.sum(OptionItem.price_delta), 0))
+            .select_from(order_item_options.join(
+                OptionItem, OptionItem.item_id == order_item_options.c.option_item_id
+            ))
+            .where(order_item_options.c.order_item_id == OrderItem.id)
+            .scalar_subquery()
+        )
+        rows = self.db.execute(
+            select(OrderItem.order_id, OrderItem.dish_id, Dish.category_id, OrderItem.qty,
+                   OrderItem.unit_price, option_delta)
+            .outerjoin(Dish, Dish.dish_id == OrderItem.dish_id)
+            .where(OrderItem.order_id.in_(order_ids))
+        ).all()
+        pricer = OrderPricer()
+        for order_id, _, _, qty, unit_price, delta in rows:
+            pricer.add_line(order_id, unit_price, qty, delta)
+        lines: Dict[int, List[RollupLine]] = defaultdict(list)
+        for (order_id, dish_id, category_id, qty, _, _), cents in zip(rows, pricer.line_totals_cents()):
+            lines[order_id].append((dish_id, category_id, qty, cents))
+        return lines
+
+    def _apply_sales(self, created_at: datetime, lines: List[RollupLine], sign: int) -> None:
+        per_dish: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+        per_category: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+        for dish_id, category_id, qty, cents in lines:
+            per_dish[dish_id][0] += qty
+            per_dish[dish_id][1] += cents
+            if category_id is not None:
+                per_category[category_id][0] += qty
+                per_category[category_id][1] += cents
+
+        day, hour = created_at.date(), _hour(created_at)
+        upsert_increment(self.db, DishDailySales.__table__, [
+            {"day": day, "dish_id": dish_id, "qty": sign * qty,
+             "order_count": sign, "revenue_cents": sign * cents}
+            for dish_id, (qty, cents) in per_dish.items()
+        ], ["day", "dish_id"], ["qty", "order_count", "revenue_cents"])
+        upsert_increment(self.db, CategoryHourlySales.__table__, [
+            {"hour": hour, "category_id": category_id, "qty": sign * qty, "revenue_cents": sign * cents}
+            for category_id, (qty, cents) in per_category.items()
+        ], ["hour", "category_id"], ["qty", "revenue_cents"])
+
+    def _apply_status(self, day: date, status: OrderStatus, count: int, cents: int) -> None:
+        upsert_increment(self.db, StatusDailyStats.__table__, [
+            {"day": day, "status": status.value, "order_count": count, "revenue_cents": cents}
+        ], ["day", "status"], ["order_count", "revenue_cents"])
+
+    def rebuild(self) -> int:
+        """
+        从历史订单（含已归档订单）重建全部汇总表（单事务：先清空再写入）
+        逐批流式读取订单明细，内存只保留聚合结果
+        契约：先清空汇总表再读取订单，清空即取得汇总表的写锁（SQLite 为数据库写锁，InnoDB 为全表行锁与间隙锁），
+             重建期间并发的下单、状态变更在累加汇总时等待本事务提交，其增量落在重建结果之上，不会被覆盖
+        前置条件：在新事务中调用（MySQL 的一致性读快照须在取得写锁之后建立）
+        返回：参与汇总的订单数
+        """
+        from app.services.export_service import OrderExportService
+
+        try:
+            for model in (DishDailySales, CategoryHourlySales, StatusDailyStats):
+                self.db.execute(delete(model))
+
+            categories = dict(self.db.execute(select(Dish.dish_id, Dish.category_id)).all())
+            per_dish: Dict[Tuple[date, int], List[int]] = defaultdict(lambda: [0, 0, 0])
+            per_category: Dict[Tuple[datetime, int], List[int]] = defaultdict(lambda: [0, 0])
+            per_status: Dict[Tuple[date, str], List[int]] = defaultdict(lambda: [0, 0])
+
+            order_count = 0
+            for order in OrderExportService(self.db).iter_orders(include_archive=True):
+                order_count += 1
+                created_at = order["created_at"]
+                day, hour = created_at.date(), _hour(created_at)
+                total = 0
+                seen_dishes = set()
+                for item in order["items"]:
+                    cents = item["subtotal_cents"]
+                    total += cents
+                    if order["status"] == OrderStatus.CANCELLED.value:
+                        continue
+                    dish_id = item["dish_id"]
+                    dish_row = per_dish[(day, dish_id)]
+                    dish_row[0] += item["qty"]
+                    dish_row[2] += cents
+                    if dish_id not in seen_dishes:
+                        dish_row[1] += 1
+                        seen_dishes.add(dish_id)
+                    category_id = categories.get(dish_id)
+                    if category_id is not None:
+                        per_category[(hour, category_id)][0] += item["qty"]
+                        per_category[(hour, category_id)][1] += cents
+                per_status[(day, order["status"])][0] += 1
+                per_status[(day, order["status"])][1] += total
+
+            upsert_increment(self.db, DishDailySales.__table__, [
+                {"day": day, "dish_id": dish_id, "qty": v[0], "order_count": v[1], "revenue_cents": v[2]}
+                for (day, dish_id), v in per_dish.items()
+            ], ["day", "dish_id"], ["qty", "order_count", "revenue_cents"])
+            upsert_increment(self.db, CategoryHourlySales.__table__, [
+                {"hour": hour, "category_id": category_id, "qty": v[0], "revenue_cents": v[1]}
+                for (hour, category_id), v in per_category.items()
+            ], ["hour", "category_id"], ["qty", "revenue_cents"])
+            upsert_increment(self.db, StatusDailyStats.__table__, [
+                {"day": day, "status": status, "order_count": v[0], "revenue_cents": v[1]}
+                for (day, status), v in per_status.items()
+            ], ["day", "status"], ["order_count", "revenue_cents"])
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return order_count
+
+
+class ReportService:
+    """仪表盘报表查询（只读汇总表）"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def dish_daily(self, start: Optional[date] = None, end: Optional[date] = None,
+                   dish_id: Optional[int] = None) -> List[DishDailyRow]:
+        """菜品日销量，区间为 [start, end)"""
+        stmt = (
+            select(DishDailySales, Dish.name)
+            .outerjoin(Dish, Dish.dish_id == DishDailySales.dish_id)
+            .order_by(DishDailySales.day, DishDailySales.dish_id)
+        )
+        stmt = self._day_range(stmt, DishDailySales.day, start, end)
+        if dish_id is not None:
+            stmt = stmt.where(DishDailySales.dish_id == dish_id)
+        return [
+            DishDailyRow(day=row.day, dish_id=row.dish_id, dish_name=name, qty=row.qty,
+                         order_count=row.order_count, revenue=from_cents(row.revenue_cents))
+            for row, name in self.db.execute(stmt).all()
+        ]
+
+    def dish_ranking(self, start: Optional[date] = None, end: Optional[date] = None,
+                     limit: int = 10) -> List[DishRankingRow]:
+        """区间内菜品销售额排行"""
+        qty = func.sum(DishDailySales.qty)
+        revenue = func.sum(DishDailySales.revenue_cents)
+        stmt = (
+            select(DishDailySales.dish_id, Dish.name, qty, func.sum(DishDailySales.order_count), revenue)
+            .outerjoin(Dish, Dish.dish_id == DishDailySales.dish_id)
+            .group_by(DishDailySales.dish_id, Dish.name)
+            .order_by(revenue.desc(), DishDailySales.dish_id)
+            .limit(limit)
+        )
+        stmt = self._day_range(stmt, DishDailySales.day, start, end)
+        return [
+            DishRankingRow(dish_id=dish_id, dish_name=name, qty=q or 0,
+                           order_count=orders or 0, revenue=from_cents(cents))
+            for dish_id, name, q, orders, cents in self.db.execute(stmt).all()
+        ]
+
+    def category_hourly(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                        category_id: Optional[int] = None) -> List[CategoryHourlyRow]:
+        """分类小时销量，区间为 [start, end)"""
+        stmt = (
+            select(CategoryHourlySales, Category.name)
+            .outerjoin(Category, Category.category_id == CategoryHourlySales.category_id)
+            .order_by(CategoryHourlySales.hour, CategoryHourlySales.category_id)
+        )
+        stmt = self._day_range(stmt, CategoryHourlySales.hour, start, end)
+        if category_id is not None:
+            stmt = stmt.where(CategoryHourlySales.category_id == category_id)
+        return [
+            CategoryHourlyRow(hour=row.hour, category_id=row.category_id, category_name=name,
+                              qty=row.qty, revenue=from_cents(row.revenue_cents))
+            for row, name in self.db.execute(stmt).all()
+        ]
+
+    def status_daily(self, start: Optional[date] = None, end: Optional[date] = None) -> List[StatusDailyRow]:
+        """订单状态日统计"""
+        stmt = select(StatusDailyStats).order_by(StatusDailyStats.day, StatusDailyStats.status)
+        stmt = self._day_range(stmt, StatusDailyStats.day, start, end)
+        return [
+            StatusDailyRow(day=row.day, status=row.status, order_count=row.order_count,
+                           revenue=from_cents(row.revenue_cents))
+            for row in self.db.scalars(stmt).all()
+        ]
+
+    def summary(self, start: Optional[date] = None, end: Optional[date] = None) -> SalesSummary:
+        """区间汇总：有效订单数与营业额（不含已取消），以及各状态订单数"""
+        stmt = (
+            select(StatusDailyStats.status, func.sum(StatusDailyStats.order_count),
+                   func.sum(StatusDailyStats.revenue_cents))
+            .group_by(StatusDailyStats.status)
+        )
+        stmt = self._day_range(stmt, StatusDailyStats.day, start, end)
+        by_status = {}
+        order_count, revenue = 0, 0
+        for status, count, cents in self.db.execute(stmt).all():
+            by_status[status] = count or 0
+            if status != OrderStatus.CANCELLED.value:
+                order_count += count or 0
+                revenue += cents or 0
+        return SalesSummary(order_count=order_count, revenue=from_cents(revenue), by_status=by_status)
+
+    @staticmethod
+    def _day_range(stmt, column, start, end):
+        if start is not None:
+            stmt = stmt.where(column >= start)
+        if end is not None:
+            stmt = stmt.where(column < end)
+        return stmt
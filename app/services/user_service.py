@@ -0,0 +1,38 @@
+"""用户服务"""
+from sqlalchemy.orm import Session
+from app.cache import Cache
+from app.config import settings
+from app.db import insert_ignore
+from app.invalidation import USERS
+from app.models.user import User
+from app.schemas.user import UserResponse
+
+
+# username -> UserResponse；用户创建后 user_id / username 不再变化，修改 is_admin 等字段后需 user_cache.invalidate([username])
+user_cache = Cache(USERS, max_entries=settings.USER_CACHE_SIZE)
+
+
+class UserService:
+    """用户登录服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def login(self, username: str) -> UserResponse:
+        """
+        假登录：用户名不存在时创建普通用户
+        契约：
+          - 命中缓存时不访问数据库
+          - 未命中时先 INSERT ... ON CONFLICT DO NOTHING 再按用户名读取，
+            并发创建同名用户不会触发唯一约束错误，且返回同一个 user_id
+        """
+        user = user_cache.get(username)
+        if user is not None:
+            return user
+
+        insert_ignore(self.db, User.__table__, [{"username": username, "is_admin": False}], ["username"])
+        self.db.commit()
+        row = self.db.query(User).filter(User.username == username).one()
+        user = UserResponse.model_validate(row)
+        user_cache.set(username, user)
+        return user
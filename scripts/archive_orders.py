@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+归档历史订单：已完成/已取消且下单超过指定天数的订单移入归档表
+
+使用：
+  python scripts/archive_orders.py                  # 默认 ARCHIVE_AFTER_DAYS 天
+  python scripts/archive_orders.py --days 30 --batch-size 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings  # noqa: E402
+from app.db import SessionLocal, init_db  # noqa: E402
+from app.services.archive_service import ARCHIVE_BATCH_SIZE, ArchiveService  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="归档历史订单")
+    parser.add_argument("--days", type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                        help=f"归档下单超过该天数的订单（默认 {settings.ARCHIVE_AFTER_DAYS}）")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="每个事务归档的订单数")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        count = ArchiveService(db).archive_orders(older_than_days=args.days, batch_size=args.batch_size)
+        print(f"✅ 已归档 {count} 个订单，用时 {time.perf_counter() - start:.2f}s")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+从历史订单重建销售汇总表（sales_dish_daily / sales_category_hourly / sales_status_daily）
+
+使用：
+  python scripts/backfill_rollups.py
+"""
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import SessionLocal, init_db  # noqa: E402
+from app.services.report_service import RollupService  # noqa: E402
+
+
+def main() -> int:
+    init_db()
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        count = RollupService(db).rebuild()
+        print(f"✅ 已从 {count} 个订单重建汇总表，用时 {time.perf_counter() - start:.2f}s")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
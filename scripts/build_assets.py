@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+构建静态资源（部署时运行）：内容哈希文件名 + 预压缩变体 + 资源清单
+
+  app/static/images/dish_1.jpg -> app/static/dist/images/dish_1.<哈希>.jpg
+  文本类资源另生成 .gz（以及安装 brotli 时的 .br）
+  清单写入 app/static/dist/manifest.json，由 app.assets.asset_url 读取
+
+使用：
+  python scripts/build_assets.py
+  python scripts/build_assets.py --prune      # 同时删除清单外的旧哈希文件
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from mimetypes import guess_type
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.assets import DIST_DIRNAME, HASH_LENGTH, MANIFEST_NAME, STATIC_DIR  # noqa: E402
+from app.compression import COMPRESSIBLE_TYPES, brotli  # noqa: E402
+
+
+def content_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def precompress(path: str, min_size: int) -> list:
+    """为文本类资源写出 .gz / .br；返回生成的文件"""
+    media_type, _ = guess_type(path)
+    if media_type not in COMPRESSIBLE_TYPES or os.path.getsize(path) < min_size:
+        return []
+    with open(path, "rb") as f:
+        data = f.read()
+    written = []
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    written.append(path + ".gz")
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+        written.append(path + ".br")
+    return written
+
+
+def build(static_dir: str, min_size: int, prune: bool) -> dict:
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    manifest = {}
+    keep = {os.path.join(dist_dir, MANIFEST_NAME)}
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == os.path.abspath(static_dir):
+            dirs[:] = [d for d in dirs if d != DIST_DIRNAME]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            rel = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            stem, ext = os.path.splitext(rel)
+            hashed = f"{stem}.{content_hash(source)}{ext}"
+            target = os.path.join(dist_dir, hashed)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(source, target)
+                keep.update(precompress(target, min_size))
+            else:
+                keep.update(p for p in (target + ".gz", target + ".br") if os.path.exists(p))
+            keep.add(target)
+            manifest[rel] = hashed
+
+    os.makedirs(dist_dir, exist_ok=True)
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    if prune:
+        for root, _, files in os.walk(dist_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if path not in keep:
+                    os.remove(path)
+    return manifest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="构建哈希文件名的静态资源与预压缩变体")
+    parser.add_argument("--static-dir", default=STATIC_DIR, help="静态资源目录")
+    parser.add_argument("--min-size", type=int, default=1024, help="小于该字节数的文件不预压缩")
+    parser.add_argument("--prune", action="store_true", help="删除清单外的旧哈希文件")
+    args = parser.parse_args()
+
+    manifest = build(args.static_dir, args.min_size, args.prune)
+    print(f"✅ 已构建 {len(manifest)} 个资源 -> {os.path.join(args.static_dir, DIST_DIRNAME)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+订单流式导出（对账用）
+
+使用：
+  python scripts/export_orders.py --format csv --start 2024-05-01 --end 2024-06-01 -o may.csv
+  python scripts/export_orders.py --status Completed > orders.ndjson
+  python scripts/export_orders.py --format parquet -o orders.parquet   # 需要 pyarrow
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import SessionLocal  # noqa: E402
+from app.services.export_service import EXPORT_FORMATS, OrderExportService  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="订单流式导出")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson", help="导出格式")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="起始时间（含），如 2024-05-01")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="截止时间（不含）")
+    parser.add_argument("--status", help="订单状态筛选，如 Completed")
+    parser.add_argument("--include-archive", action="store_true", help="包含已归档订单")
+    parser.add_argument("-o", "--output", help="输出文件（默认标准输出）")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        chunks = OrderExportService(db).iter_export(
+            args.format, start=args.start, end=args.end, status=args.status,
+            include_archive=args.include_archive,
+        )
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
+    except ValueError as e:
+        print(f"❌ 导出失败: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
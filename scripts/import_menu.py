@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+菜单批量导入（CSV / NDJSON）
+
+使用：
+  python scripts/import_menu.py menu.csv
+  python scripts/import_menu.py menu.ndjson --chunk-size 1000
+  cat menu.ndjson | python scripts/import_menu.py - --format ndjson
+"""
+import argparse
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import SessionLocal, engine  # noqa: E402
+from app.invalidation import bus, start_from_settings  # noqa: E402
+from app.services.import_service import (  # noqa: E402
+    IMPORT_CHUNK_SIZE, MenuImportService, detect_format, read_records,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="菜单批量导入")
+    parser.add_argument("path", help="导入文件路径，- 表示标准输入")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="文件格式（默认按扩展名推断）")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="每次提交的记录数")
+    args = parser.parse_args()
+
+    if args.path == "-" and not args.format:
+        parser.error("从标准输入读取时必须指定 --format")
+    try:
+        fmt = args.format or detect_format(args.path)
+    except ValueError as e:
+        parser.error(str(e))
+    # 导入后通知正在运行的服务进程丢弃菜单缓存（只发布不接收）
+    start_from_settings(engine, listen=False)
+    db = SessionLocal()
+    try:
+        if args.path == "-":
+            report = MenuImportService(db).import_records(
+                read_records(sys.stdin.buffer, fmt), chunk_size=args.chunk_size
+            )
+        else:
+            with open(args.path, "rb") as f:
+                report = MenuImportService(db).import_records(
+                    read_records(f, fmt), chunk_size=args.chunk_size
+                )
+    finally:
+        db.close()
+        bus.stop()
+
+    print(f"✅ 读取 {report.rows} 行，提交 {report.chunks} 块")
+    for kind, counts in report.counts.items():
+        print(f"  - {kind}: 新增 {counts.created}，更新 {counts.updated}")
+    if report.error_count:
+        print(f"⚠️  {report.error_count} 行失败：")
+        for err in report.errors:
+            print(f"  第 {err.line} 行：{err.message}")
+    return 1 if report.error_count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+数据库结构迁移（部署时运行一次，之后各 worker 以 DB_STARTUP_MODE=verify 快速启动）
+
+使用：
+  python scripts/migrate.py            # 建表 + 迁移 + 写入版本戳
+  python scripts/migrate.py --check    # 只检查版本戳，未迁移时返回 1
+"""
+import argparse
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import engine  # noqa: E402
+from app.migrations import SCHEMA_VERSION, SchemaVersionError, migrate, verify  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="数据库结构迁移")
+    parser.add_argument("--check", action="store_true", help="只检查版本戳")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.check:
+        try:
+            version = verify(engine)
+        except SchemaVersionError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+        print(f"✅ 数据库结构版本 {version}（要求 {SCHEMA_VERSION}）")
+        return 0
+
+    version = migrate(engine)
+    print(f"✅ 数据库结构已迁移到版本 {version}，用时 {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
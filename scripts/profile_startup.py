@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+启动耗时剖析：导入 app.main 的 import-time 明细 + 启动检查耗时，超出预算时返回 1（可放进 CI）
+
+使用：
+  python scripts/profile_startup.py                  # 默认预算 2500ms，列出自身耗时最高的 15 个顶层包
+  python scripts/profile_startup.py --budget-ms 1200 --top 30
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# python -X importtime 的输出行：import time: self [us] | cumulative | imported package
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+STARTUP_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main as m; t1 = time.perf_counter();"
+    "from app.migrations import bootstrap; bootstrap(m.engine, 'verify');"
+    "print(f'{(t1 - t) * 1000:.1f} {(time.perf_counter() - t1) * 1000:.1f}')"
+)
+
+
+def parse_importtime(stderr: str) -> list:
+    """返回 [(模块, 自身耗时 us, 累计耗时 us, 缩进层级)]"""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="启动耗时剖析")
+    parser.add_argument("--budget-ms", type=float, default=2500.0, help="导入 + 启动检查的总预算（毫秒）")
+    parser.add_argument("--top", type=int, default=15, help="列出的顶层包数量")
+    args = parser.parse_args()
+
+    env = {**os.environ, "DB_STARTUP_MODE": "verify"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SNIPPET],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=False,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr.splitlines()[-1] if proc.stderr else "启动失败", file=sys.stderr)
+        return 1
+    import_ms, verify_ms = (float(v) for v in proc.stdout.split())
+
+    # 按顶层包汇总自身耗时（累计耗时会在嵌套导入间重复计算）
+    per_package = Counter()
+    modules = Counter()
+    for module, self_us, _, _ in parse_importtime(proc.stderr):
+        per_package[module.split(".")[0]] += self_us
+        modules[module.split(".")[0]] += 1
+    print(f"{'自身(ms)':>10} {'模块数':>6}  顶层包")
+    for package, self_us in per_package.most_common(args.top):
+        print(f"{self_us / 1000:>10.1f} {modules[package]:>6}  {package}")
+
+    total = import_ms + verify_ms
+    print(f"\n导入 app.main：{import_ms:.1f}ms，版本戳检查：{verify_ms:.1f}ms，合计 {total:.1f}ms（预算 {args.budget_ms:.0f}ms）")
+    if total > args.budget_ms:
+        print("❌ 超出启动预算", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,7 @@ from app.db import SessionLocal, init_db
 from app.models.user import User
 from app.models.dish import Category, Dish, OptionGroup, OptionItem
 from app.models.enums import DishStatus, OptionType
+from app.services.inventory_digest import InventoryDigestService
 
 
 def seed_data():
@@ -160,7 +161,9 @@ def seed_data():
         
         print("✅ 创建口味选项")
         
-        # 提交事务
+        # 计算库存摘要，提交事务
+        db.flush()
+        InventoryDigestService(db).rebuild(commit=False)
         db.commit()
         print("\n🎉 样例数据初始化完成！")
         print("\n📊 数据统计:")
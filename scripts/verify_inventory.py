@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+库存一致性校验（库存摘要，见 app/services/inventory_digest.py）
+
+使用：
+  python scripts/verify_inventory.py                            # 已保存的摘要与 dishes 表是否一致
+  python scripts/verify_inventory.py --repair                   # 不一致时按表重算
+  python scripts/verify_inventory.py --replica sqlite:///r.db   # 与副本比较，列出库存不同的菜品
+"""
+import argparse
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.db import SessionLocal, init_db  # noqa: E402
+from app.services.inventory_digest import InventoryDigestService, MerkleTree, bucket_range  # noqa: E402
+
+
+def compare_replica(primary: InventoryDigestService, replica: InventoryDigestService) -> int:
+    """按 Merkle 树比较已保存的摘要，再逐个比较不一致桶内的菜品库存；返回不一致的菜品数"""
+    mine, theirs = primary.buckets(), replica.buckets()
+    size = max(max(mine, default=-1), max(theirs, default=-1)) + 1
+    primary_tree, replica_tree = MerkleTree(mine, size), MerkleTree(theirs, size)
+    print(f"主库 root={primary_tree.root[:16]}  副本 root={replica_tree.root[:16]}（{primary_tree.leaves} 个桶）")
+    mismatched = 0
+    for bucket in primary_tree.diff(replica_tree):
+        start, end = bucket_range(bucket)
+        left, right = primary.bucket_stock(bucket), replica.bucket_stock(bucket)
+        for dish_id in sorted(set(left) | set(right)):
+            if left.get(dish_id) != right.get(dish_id):
+                mismatched += 1
+                print(f"  ❌ 桶 {bucket} [{start}, {end}) dish_id={dish_id}："
+                      f"主库 {left.get(dish_id, '缺失')}，副本 {right.get(dish_id, '缺失')}")
+    return mismatched
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="库存一致性校验")
+    parser.add_argument("--replica", help="副本数据库 URL；省略时校验主库摘要与 dishes 表")
+    parser.add_argument("--repair", action="store_true", help="主库摘要与表不一致时重算")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        primary = InventoryDigestService(db)
+        stale = primary.verify()
+        if stale:
+            print(f"❌ 主库摘要与 dishes 表不一致：桶 {stale}")
+            if not args.repair:
+                return 1
+            print(f"✅ 已重算 {primary.rebuild()} 个桶")
+        else:
+            print(f"✅ 主库摘要与 dishes 表一致（{settings.DATABASE_URL}）")
+
+        if args.replica:
+            replica_db = Session(bind=create_engine(args.replica))
+            try:
+                mismatched = compare_replica(primary, InventoryDigestService(replica_db))
+            finally:
+                replica_db.close()
+            if mismatched:
+                print(f"❌ 副本有 {mismatched} 道菜库存不一致")
+                return 1
+            print("✅ 副本库存一致")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
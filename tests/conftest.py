@@ -1,17 +1,40 @@
 """pytest 配置与 fixtures"""
 import pytest
+from decimal import Decimal
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.config import settings
 from app.db import Base, get_db
+from app.models.dish import Category, Dish, OptionGroup, OptionItem
+from app.models.enums import DishStatus, OptionType
+from app.models.user import User
 from app.main import app
+from app.cache import clear_all
+from app.services.menu_search import menu_search
 from fastapi.testclient import TestClient
 
+# 测试进程内只用本地失效总线（跨进程广播见 tests/test_invalidation.py）
+settings.INVALIDATION_BACKEND = "local"
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """进程级缓存在测试之间清空（每个测试使用新的数据库）"""
+    clear_all()
+    menu_search.invalidate()
+    yield
+
 
 @pytest.fixture(scope="function")
 def db_session():
     """创建测试数据库会话"""
-    # 使用内存数据库
-    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    # 使用内存数据库（StaticPool：TestClient 在线程池中执行接口时共享同一连接）
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
     Base.metadata.create_all(bind=engine)
     
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -22,6 +45,30 @@ def db_session():
     session.close()
 
 
+@pytest.fixture
+def sample_menu(db_session):
+    """
+    下单用的基础菜单：用户、分类“热菜”、菜品A（30 元，库存 100）、
+    菜品A 的加料组（多选，最多 2 项）与其中的“加蛋”（+2.5 元）
+    各测试文件在此基础上追加自己的菜品、选项与订单
+    """
+    user = User(username="menu_user", is_admin=False)
+    category = Category(name="热菜", sort_order=1)
+    db_session.add_all([user, category])
+    db_session.flush()
+    dish = Dish(category_id=category.category_id, name="菜品A", price=Decimal("30"),
+                stock=100, status=DishStatus.ON_SHELF)
+    db_session.add(dish)
+    db_session.flush()
+    group = OptionGroup(dish_id=dish.dish_id, name="加料", type=OptionType.MULTIPLE, max_select=2)
+    db_session.add(group)
+    db_session.flush()
+    extra = OptionItem(group_id=group.group_id, name="加蛋", price_delta=Decimal("2.5"))
+    db_session.add(extra)
+    db_session.commit()
+    return {"user": user, "category": category, "dish": dish, "group": group, "extra": extra}
+
+
 @pytest.fixture(scope="function")
 def client(db_session):
     """创建测试客户端"""
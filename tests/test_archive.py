@@ -0,0 +1,134 @@
+"""订单归档测试"""
+import json
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from app.models.user import User
+from app.models.dish import Dish
+from app.models.order import Order, OrderItem, order_item_options
+from app.models.archive import ArchivedOrder, ArchivedOrderItem, order_item_options_archive
+from app.schemas.order import OrderCreate, OrderItemCreate
+from app.services.archive_service import ArchiveService
+from app.services.export_service import OrderExportService
+from app.services.order_service import OrderService
+from app.services.report_service import ReportService, RollupService
+
+
+@pytest.fixture
+def history(db_session, sample_menu):
+    """
+    5 个订单：#1 已完成（带选项）、#2 已取消、#3 已提交（均为 100 天前），
+    #4 已完成（1 天前），#5 已完成（100 天前，但持有最大 id）
+    """
+    user, dish, extra = sample_menu["user"], sample_menu["dish"], sample_menu["extra"]
+    service = OrderService(db_session)
+    created = [
+        service.create_order(OrderCreate(user_id=user.user_id, items=[
+            OrderItemCreate(dish_id=dish.dish_id, qty=2, option_item_ids=[extra.item_id]),
+        ]))
+        for _ in range(5)
+    ]
+    ids = [o.order_id for o in created]
+    service.complete_order(ids[0])
+    service.cancel_order(ids[1])
+    service.complete_order(ids[3])
+    service.complete_order(ids[4])
+
+    old = datetime.utcnow() - timedelta(days=100)
+    for order_id in (ids[0], ids[1], ids[2], ids[4]):
+        db_session.query(Order).filter(Order.order_id == order_id).update({"created_at": old})
+    db_session.query(Order).filter(Order.order_id == ids[3]).update(
+        {"created_at": datetime.utcnow() - timedelta(days=1)}
+    )
+    db_session.commit()
+    return ids
+
+
+def test_archive_moves_old_terminal_orders(db_session, history):
+    """测试只归档超期的已完成/已取消订单，明细与选项一并移动"""
+    archived = ArchiveService(db_session).archive_orders(older_than_days=30, batch_size=1)
+    assert archived == 2
+
+    hot_ids = {o.order_id for o in db_session.query(Order).all()}
+    assert hot_ids == {history[2], history[3], history[4]}
+    archived_ids = {o.order_id for o in db_session.query(ArchivedOrder).all()}
+    assert archived_ids == {history[0], history[1]}
+
+    assert db_session.query(OrderItem).filter(OrderItem.order_id.in_(archived_ids)).count() == 0
+    assert db_session.query(ArchivedOrderItem).count() == 2
+    assert db_session.query(order_item_options_archive).count() == 2
+    assert db_session.query(order_item_options).count() == 3
+
+
+def test_user_history_includes_archived_orders(db_session, history):
+    """测试用户订单历史合并归档表，摘要随订单一起归档"""
+    ArchiveService(db_session).archive_orders(older_than_days=30)
+    user_id = db_session.query(User).filter(User.username == "menu_user").one().user_id
+    service = OrderService(db_session)
+    first = service.list_user_orders(user_id, limit=3)
+    rest = service.list_user_orders(user_id, limit=3, cursor=first.next_cursor)
+    summaries = first.items + rest.items
+    assert rest.next_cursor is None
+    assert [s.order_id for s in summaries] == [history[3], history[4], history[2], history[1], history[0]]
+    assert all(s.total_price == Decimal("65.00") and s.item_count == 2 for s in summaries)
+    assert summaries[-1].status == "Completed" and summaries[-2].status == "Cancelled"
+
+
+def test_archive_is_idempotent(db_session, history):
+    """测试重复执行不会重复归档"""
+    service = ArchiveService(db_session)
+    assert service.archive_orders(older_than_days=30) == 2
+    assert service.archive_orders(older_than_days=30) == 0
+
+
+def test_get_order_falls_back_to_archive(db_session, history):
+    """测试归档后仍可查询订单详情，总价不变"""
+    service = OrderService(db_session)
+    before = service.get_order_by_id(history[0])
+    ArchiveService(db_session).archive_orders(older_than_days=30)
+
+    after = service.get_order_by_id(history[0])
+    assert after is not None
+    assert after.status == "Completed"
+    assert after.total_price == before.total_price == Decimal("65.00")
+    assert [item.subtotal for item in after.items] == [item.subtotal for item in before.items]
+    assert service.get_order_by_id(999999) is None
+
+
+def test_new_orders_do_not_reuse_archived_ids(db_session, history):
+    """测试归档后新订单 id 不与归档订单冲突"""
+    ArchiveService(db_session).archive_orders(older_than_days=30)
+    order = OrderService(db_session).create_order(OrderCreate(
+        user_id=db_session.query(User).first().user_id,
+        items=[OrderItemCreate(dish_id=db_session.query(Dish).first().dish_id, qty=1)],
+    ))
+    assert order.order_id > max(history)
+
+
+def test_export_and_rebuild_include_archive(db_session, history):
+    """测试导出可包含归档订单，汇总重建不丢失归档订单"""
+    summary_before = ReportService(db_session).summary()
+    ArchiveService(db_session).archive_orders(older_than_days=30)
+
+    exporter = OrderExportService(db_session)
+    hot = [json.loads(line) for line in b"".join(exporter.iter_export("ndjson")).splitlines()]
+    everything = [
+        json.loads(line)
+        for line in b"".join(exporter.iter_export("ndjson", include_archive=True)).splitlines()
+    ]
+    assert len(hot) == 3
+    assert [o["order_id"] for o in everything] == sorted(history)
+
+    assert RollupService(db_session).rebuild() == 5
+    assert ReportService(db_session).summary() == summary_before
+
+
+def test_archive_endpoint(client, db_session, history):
+    """测试归档接口"""
+    response = client.post("/api/admin/orders/archive", params={"older_than_days": 30})
+    assert response.status_code == 200
+    assert response.json() == {"archived": 2}
+
+    response = client.get(f"/api/admin/orders/{history[0]}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "Completed"
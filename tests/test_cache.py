@@ -0,0 +1,341 @@
+"""缓存子系统测试"""
+import itertools
+import multiprocessing
+import socketserver
+import threading
+import time
+import pytest
+from app import metrics
+from app.cache import Cache, CacheBackend, MemoryBackend, SQLiteBackend, cached
+from app.cache import backends as cache_backends
+from app.cache.redis import RedisBackend, RespClient, RespError
+from app.services.menu_service import MenuService
+
+_ids = itertools.count()
+
+
+@pytest.fixture
+def namespace():
+    """每个测试独立的命名空间（命名空间全局唯一）"""
+    return f"test.ns{next(_ids)}"
+
+
+# ------- Redis 兼容的本地替身 -------
+class _RespStandIn(socketserver.ThreadingTCPServer):
+    """只实现缓存用到的命令：PING AUTH SELECT GET MGET SET(PX) DEL SCAN"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, password=None):
+        super().__init__(("127.0.0.1", 0), _RespHandler)
+        self.password = password
+        self.data = {}          # key -> (value, 过期时刻)
+        self.commands = []
+
+    def live(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _bulk(self, value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        server = self.server
+        authed = server.password is None
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            name = args[0].decode().upper()
+            server.commands.append(name)
+            if name == "QUIT":
+                return
+            if name == "AUTH":
+                authed = args[1].decode() == server.password
+                self.wfile.write(b"+OK\r\n" if authed else b"-ERR invalid password\r\n")
+            elif not authed:
+                self.wfile.write(b"-NOAUTH Authentication required.\r\n")
+            elif name in ("PING", "SELECT"):
+                self.wfile.write(b"+OK\r\n")
+            elif name == "GET":
+                entry = server.live(args[1])
+                self.wfile.write(self._bulk(entry and entry[0]))
+            elif name == "MGET":
+                entries = [server.live(key) for key in args[1:]]
+                self.wfile.write(b"*%d\r\n" % len(entries) + b"".join(self._bulk(e and e[0]) for e in entries))
+            elif name == "SET":
+                deadline = None
+                if len(args) == 5 and args[3].upper() == b"PX":
+                    deadline = time.monotonic() + int(args[4]) / 1000
+                server.data[args[1]] = (args[2], deadline)
+                self.wfile.write(b"+OK\r\n")
+            elif name == "DEL":
+                removed = sum(server.data.pop(key, None) is not None for key in args[1:])
+                self.wfile.write(b":%d\r\n" % removed)
+            elif name == "SCAN":
+                prefix = args[3][:-1]
+                keys = [key for key in list(server.data) if key.startswith(prefix) and server.live(key)]
+                self.wfile.write(b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys) + b"".join(self._bulk(k) for k in keys))
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+
+@pytest.fixture
+def resp_server():
+    server = _RespStandIn(password="s3cret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# ------- 命名空间、TTL、LRU -------
+def test_namespaces_are_isolated(namespace):
+    first = Cache(namespace + ".a", backend="memory")
+    second = Cache(namespace + ".b", backend="memory")
+    first.set(1, "a")
+    second.set(1, "b")
+    assert first.get(1) == "a" and second.get(1) == "b"
+    first.invalidate()
+    assert first.get(1) is None and second.get(1) == "b"
+    with pytest.raises(ValueError):
+        Cache(namespace + ".a")
+    with pytest.raises(ValueError):
+        Cache("Bad Name")
+
+
+def test_memory_ttl_and_lru(namespace):
+    cache = Cache(namespace, ttl=0.05, backend=MemoryBackend(max_entries=2))
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    time.sleep(0.08)
+    assert cache.get("a") is None and cache.get("b") == 2
+    cache.set("c", 3, ttl=60)
+    cache.get("b")
+    cache.set("d", 4, ttl=60)               # 淘汰最久未使用的 c
+    assert cache.get_many(["b", "c", "d"]) == {"b": 2, "d": 4}
+
+
+def test_hit_miss_metrics(namespace):
+    metrics.CACHE_REQUESTS.reset()
+    cache = Cache(namespace, backend="memory")
+    loads = []
+    result = cache.get_many_or_load([1, 2, 3], lambda keys: loads.append(keys) or {k: k * 10 for k in keys if k != 3})
+    assert result == {1: 10, 2: 20}
+    assert cache.get_many_or_load([1, 2, 3], lambda keys: loads.append(keys) or {}) == {1: 10, 2: 20}
+    assert loads == [[1, 2, 3], [3]]        # 不存在的键不缓存
+    assert metrics.CACHE_REQUESTS.get(cache=namespace, result="hit") == 2
+    assert metrics.CACHE_REQUESTS.get(cache=namespace, result="miss") == 4
+
+
+# ------- single-flight -------
+def test_single_flight(namespace):
+    """测试并发未命中同一个键时只加载一次"""
+    cache = Cache(namespace, backend="memory")
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"value": 42}
+
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(cache.get_or_load("k", loader))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"value": 42}] * 8
+
+
+def test_single_flight_propagates_errors(namespace):
+    cache = Cache(namespace, backend="memory")
+    started = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("db down")
+
+    def follower():
+        started.wait()
+        try:
+            cache.get_or_load("k", lambda: "unused")
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("k", failing)
+    thread.join()
+    assert len(errors) == 1
+    assert cache.get_or_load("k", lambda: "ok") == "ok"      # 失败不缓存
+
+
+def test_invalidation_during_load_is_not_cached(namespace):
+    """测试加载期间发生失效时不写回旧值（加载者在失效前读库）"""
+    cache = Cache(namespace, backend="memory")
+    source = {"k": "old"}
+
+    def stale_loader(keys):
+        value = source["k"]             # 读到失效前的值
+        source["k"] = "new"             # 另一个请求写库并发布失效
+        cache.invalidate(["k"])
+        return {"k": value}
+
+    assert cache.get_many_or_load(["k"], stale_loader) == {"k": "old"}
+    assert len(cache) == 0
+    assert cache.get_or_load("k", lambda: source["k"]) == "new"
+    assert cache.get("k") == "new"
+
+    # 清空整个命名空间同样生效
+    assert cache.get_or_load("other", lambda: cache.clear() or "stale") == "stale"
+    assert cache.get("other") is None
+
+
+def test_backend_failure_is_a_miss(namespace):
+    class Broken(MemoryBackend):
+        def get_many(self, keys):
+            raise OSError("backend down")
+
+        def set_many(self, items, ttl=None):
+            raise OSError("backend down")
+
+    cache = Cache(namespace, backend=Broken())
+    assert cache.get("k", "default") == "default"
+    assert cache.get_or_load("k", lambda: 1) == 1
+
+
+def test_incomplete_backend_fails_at_construction():
+    """缺少接口方法的后端在构造时失败，而不是在第一次未命中时"""
+    class Incomplete(CacheBackend):
+        def get_many(self, keys):
+            return {}
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+# ------- 服务方法装饰器 -------
+def test_cached_method(namespace):
+    class Service:
+        calls = 0
+
+        def __init__(self, db):
+            self.db = db
+
+        @cached(namespace, ttl=60, backend="memory")
+        def lookup(self, dish_id, lang="zh"):
+            Service.calls += 1
+            return f"{dish_id}-{lang}-{Service.calls}"
+
+    assert Service(None).lookup(1) == "1-zh-1"
+    assert Service(object()).lookup(1) == "1-zh-1"          # 与实例无关
+    assert Service(None).lookup(1, lang="en") == "1-en-2"
+    Service.lookup.cache.invalidate()
+    assert Service(None).lookup(1) == "1-zh-3"
+
+
+def test_categories_cached_until_category_write(client, db_session):
+    """测试分类列表缓存：命中时不查库，后台新增分类后失效"""
+    metrics.CACHE_REQUESTS.reset()
+    assert client.get("/api/categories").json() == []
+    MenuService(db_session).create_category("热菜", 1)
+    assert [c["name"] for c in client.get("/api/categories").json()] == ["热菜"]
+    assert [c["name"] for c in client.get("/api/categories").json()] == ["热菜"]
+    assert metrics.CACHE_REQUESTS.get(cache="menu.categories", result="hit") == 1
+    assert metrics.CACHE_REQUESTS.get(cache="menu.categories", result="miss") == 2
+
+
+# ------- SQLite 共享文件 -------
+def _sqlite_writer(path, namespace):
+    SQLiteBackend(path, namespace).set_many({"shared": {"from": "child"}}, ttl=60)
+
+
+def test_sqlite_shared_between_processes(tmp_path, namespace):
+    path = str(tmp_path / "cache.db")
+    ctx = multiprocessing.get_context("spawn")
+    child = ctx.Process(target=_sqlite_writer, args=(path, namespace))
+    child.start()
+    child.join(timeout=60)
+    assert child.exitcode == 0
+    cache = Cache(namespace, backend=SQLiteBackend(path, namespace))
+    assert cache.get("shared") == {"from": "child"}
+
+
+def test_sqlite_ttl_lru_and_namespace_clear(tmp_path, namespace, monkeypatch):
+    monkeypatch.setattr(cache_backends, "EVICT_EVERY", 1)
+    path = str(tmp_path / "cache.db")
+    cache = Cache(namespace, backend=SQLiteBackend(path, namespace, max_entries=2))
+    other = Cache(namespace + "x", backend=SQLiteBackend(path, namespace + "x"))
+    other.set("k", "keep")
+    cache.set("ttl", 1, ttl=0.05)
+    time.sleep(0.08)
+    assert cache.get("ttl") is None
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", 3)                       # 淘汰最久未访问的 b
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+    assert len(cache) == 2
+    cache.clear()
+    assert len(cache) == 0 and other.get("k") == "keep"
+
+
+# ------- Redis 兼容后端 -------
+def test_resp_client_against_stand_in(resp_server, namespace):
+    port = resp_server.server_address[1]
+    client = RespClient.from_url(f"redis://:s3cret@127.0.0.1:{port}/1")
+    cache = Cache(namespace, backend=RedisBackend(client, namespace))
+    cache.set_many({1: {"a": 1}, 2: [1, 2]})
+    cache.set(3, "short", ttl=0.05)
+    assert cache.get_many([1, 2, 4]) == {1: {"a": 1}, 2: [1, 2]}
+    time.sleep(0.08)
+    assert cache.get(3) is None
+    assert len(cache) == 2
+    cache.delete([1])
+    assert cache.get(1) is None
+    resp_server.data[b"unrelated"] = (b"x", None)
+    cache.clear()
+    assert len(cache) == 0 and b"unrelated" in resp_server.data
+    assert resp_server.commands[:2] == ["AUTH", "SELECT"]
+    with pytest.raises(RespError):
+        client.execute("FLUSHALL")
+
+
+def test_resp_client_reconnects(resp_server):
+    port = resp_server.server_address[1]
+    client = RespClient("127.0.0.1", port, password="s3cret")
+    assert client.execute("PING") == "OK"
+    client._sock.close()                    # 模拟空闲断开
+    assert client.execute("PING") == "OK"
+    with pytest.raises(ValueError):
+        RespClient.from_url("http://localhost")
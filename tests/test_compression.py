@@ -0,0 +1,177 @@
+"""响应压缩与静态资源缓存测试"""
+import gzip
+import json
+import os
+import sys
+import zlib
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.testclient import TestClient
+from app import assets
+from app.assets import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, StaticAssets, asset_url, logical_asset_url
+from app.compression import CompressionMiddleware, accepted_encodings, choose_encoding
+from app.models.dish import Category, Dish
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import build_assets  # noqa: E402
+
+
+def _app(**options):
+    async def big(request):
+        return PlainTextResponse("点单" * 2000, headers={"ETag": '"abc"'})
+
+    async def small(request):
+        return PlainTextResponse("ok")
+
+    async def ndjson(request):
+        async def rows():
+            for n in range(3):
+                yield json.dumps({"n": n}).encode() + b"\n"
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    async def sse(request):
+        async def events():
+            yield b"data: 1\n\n" * 500
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app = Starlette(routes=[
+        Route("/big", big), Route("/small", small), Route("/ndjson", ndjson), Route("/sse", sse),
+    ])
+    app.add_middleware(CompressionMiddleware, **options)
+    return TestClient(app)
+
+
+def test_accept_encoding_negotiation():
+    assert accepted_encodings("gzip;q=0, br;q=0.5, identity") == {"br", "identity"}
+    assert choose_encoding("gzip, deflate", allow_brotli=True) == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("br, gzip", allow_brotli=False) == "gzip"
+
+
+def test_gzip_large_responses_only():
+    """测试超过阈值的文本响应被压缩，小响应与不接受压缩的请求原样返回"""
+    client = _app(minimum_size=100, allow_brotli=False)
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert int(response.headers["content-length"]) < len("点单".encode("utf-8")) * 2000
+    assert response.text == "点单" * 2000
+
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streaming_is_compressed_per_chunk_and_sse_skipped():
+    """测试流式响应逐块压缩；事件流不压缩"""
+    client = _app(minimum_size=100, allow_brotli=False)
+    with client.stream("GET", "/ndjson", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    lines = zlib.decompress(raw, 31).splitlines()
+    assert [json.loads(line)["n"] for line in lines] == [0, 1, 2]
+
+    response = client.get("/sse", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_brotli_when_available():
+    brotli = pytest.importorskip("brotli")
+    client = _app(minimum_size=100)
+    with client.stream("GET", "/big", headers={"Accept-Encoding": "br, gzip"}) as response:
+        assert response.headers["content-encoding"] == "br"
+        raw = b"".join(response.iter_raw())
+    assert brotli.decompress(raw).decode("utf-8") == "点单" * 2000
+
+
+def test_app_pages_are_compressed(client):
+    """测试应用的大页面按 gzip 返回"""
+    response = client.get("/admin", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "images").mkdir()
+    (tmp_path / "images" / "dish.jpg").write_bytes(b"\xff\xd8" + b"\x00" * 4000)
+    (tmp_path / "app.css").write_text("body { color: red; }\n" * 200, encoding="utf-8")
+    return tmp_path
+
+
+def test_build_assets_hashes_and_precompresses(static_dir):
+    """测试构建产物：哈希文件名、文本资源预压缩、清单"""
+    manifest = build_assets.build(str(static_dir), min_size=100, prune=True)
+    assert set(manifest) == {"images/dish.jpg", "app.css"}
+    css = static_dir / "dist" / manifest["app.css"]
+    assert manifest["app.css"].startswith("app.") and css.exists()
+    assert gzip.decompress((static_dir / "dist" / (manifest["app.css"] + ".gz")).read_bytes()) == css.read_bytes()
+    assert not (static_dir / "dist" / (manifest["images/dish.jpg"] + ".gz")).exists()
+    assert json.loads((static_dir / "dist" / "manifest.json").read_text(encoding="utf-8")) == manifest
+
+    # 内容不变时哈希不变；旧文件在 --prune 时清理
+    (static_dir / "app.css").write_text("body { color: blue; }\n" * 200, encoding="utf-8")
+    rebuilt = build_assets.build(str(static_dir), min_size=100, prune=True)
+    assert rebuilt["images/dish.jpg"] == manifest["images/dish.jpg"]
+    assert rebuilt["app.css"] != manifest["app.css"]
+    assert not css.exists()
+
+
+def test_static_assets_serve_precompressed_and_cache_headers(static_dir, monkeypatch):
+    """测试预压缩变体与缓存头；asset_url 映射到哈希地址"""
+    manifest = build_assets.build(str(static_dir), min_size=100, prune=False)
+    app = Starlette(routes=[Mount("/static", StaticAssets(directory=str(static_dir)))])
+    client = TestClient(app)
+
+    hashed_css = f"/static/dist/{manifest['app.css']}"
+    response = client.get(hashed_css, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/css")
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.text == (static_dir / "app.css").read_text(encoding="utf-8")
+
+    plain = client.get("/static/app.css", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    assert client.get("/static/app.css", headers={"If-None-Match": plain.headers["etag"]}).status_code == 304
+
+    monkeypatch.setattr(assets, "_manifest", manifest)
+    assert asset_url("/static/images/dish.jpg") == f"/static/dist/{manifest['images/dish.jpg']}"
+    assert asset_url("/static/images/missing.jpg") == "/static/images/missing.jpg"
+    assert asset_url("https://cdn.example.com/a.jpg") == "https://cdn.example.com/a.jpg"
+
+
+def test_logical_asset_url_round_trip():
+    """测试哈希路径还原为逻辑路径，不依赖当前清单"""
+    assert logical_asset_url("/static/dist/images/dish_1.3f2a9c1b.jpg") == "/static/images/dish_1.jpg"
+    assert logical_asset_url("/static/dist/app.0123abcd.css") == "/static/app.css"
+    assert logical_asset_url("/static/dist/LICENSE.0123abcd") == "/static/LICENSE"
+    assert logical_asset_url("/static/images/dish_1.jpg") == "/static/images/dish_1.jpg"
+    assert logical_asset_url("https://cdn.example.com/a.jpg") == "https://cdn.example.com/a.jpg"
+    assert logical_asset_url("") == ""
+
+
+def test_dish_edit_keeps_logical_image_url(client, db_session, monkeypatch):
+    """测试 API 返回逻辑路径与展示地址，编辑表单回写哈希地址时仍保存逻辑路径"""
+    monkeypatch.setattr(assets, "_manifest", {"images/dish.jpg": "images/dish.3f2a9c1b.jpg"})
+    category = Category(name="图片分类", sort_order=1)
+    db_session.add(category)
+    db_session.flush()
+    dish = Dish(category_id=category.category_id, name="图片菜品", price=10, stock=1,
+                image_url="/static/images/dish.jpg")
+    db_session.add(dish)
+    db_session.commit()
+
+    body = client.get(f"/api/dishes/{dish.dish_id}").json()
+    assert body["image_url"] == "/static/images/dish.jpg"
+    assert body["image_src"] == "/static/dist/images/dish.3f2a9c1b.jpg"
+
+    res = client.patch(f"/api/admin/dishes/{dish.dish_id}", json={"image_url": body["image_src"]})
+    assert res.status_code == 200
+    assert res.json()["image_url"] == "/static/images/dish.jpg"
+    db_session.refresh(dish)
+    assert dish.image_url == "/static/images/dish.jpg"
@@ -8,6 +8,7 @@ from app.db import Base
 from app.models.user import User
 from app.models.dish import Category, Dish
 from app.models.enums import DishStatus
+from app.models.report import StatusDailyStats
 from app.schemas.order import OrderCreate, OrderItemCreate
 from app.services.order_service import OrderService
 
@@ -160,3 +161,49 @@ def test_sequential_orders(concurrent_db_session, test_users, limited_dish):
     finally:
         db.close()
 
+
+
+def test_concurrent_complete_only_once(concurrent_db_session, test_users, limited_dish):
+    """
+    并发完成同一订单（管理员重复点击）
+    预期：条件更新只有一次命中，另一次报状态错误；汇总只计一次
+    """
+    db = TestSessionLocal()
+    try:
+        order = OrderService(db).create_order(OrderCreate(
+            user_id=test_users[0].user_id,
+            items=[OrderItemCreate(dish_id=limited_dish.dish_id, qty=1, option_item_ids=[])]
+        ))
+    finally:
+        db.close()
+
+    results = {"success": 0, "failure": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(4)
+
+    def complete():
+        db = TestSessionLocal()
+        try:
+            barrier.wait()
+            OrderService(db).complete_order(order.order_id)
+            with lock:
+                results["success"] += 1
+        except ValueError:
+            with lock:
+                results["failure"] += 1
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=complete) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {"success": 1, "failure": 3}
+    db = TestSessionLocal()
+    try:
+        stats = {r.status: r.order_count for r in db.query(StatusDailyStats).all()}
+        assert stats == {"Submitted": 0, "Completed": 1}
+    finally:
+        db.close()
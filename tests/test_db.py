@@ -0,0 +1,76 @@
+"""请求级惰性会话测试"""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from app import db as app_db
+from app.db import LazySession
+from app.main import app
+from app.models.dish import Category
+
+
+def test_lazy_session_created_on_first_use(db_session):
+    """第一次访问属性时才创建会话；未创建时 close() 无操作"""
+    created = []
+
+    def factory():
+        created.append(1)
+        return sessionmaker(bind=db_session.get_bind())()
+
+    lazy = LazySession(factory)
+    lazy.close()
+    assert not lazy.started and created == []
+
+    assert lazy.query(Category).count() == 0
+    assert lazy.started and len(created) == 1
+    lazy.query(Category).count()
+    assert len(created) == 1
+
+    lazy.close()
+    assert not lazy.started
+
+
+@pytest.fixture
+def lazy_client(db_session, monkeypatch):
+    """不覆盖 get_db：接口经 LazySession 使用测试引擎，记录会话创建与连接取出次数"""
+    engine = db_session.get_bind()
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    counts = {"sessions": 0, "checkouts": 0}
+
+    def counting_factory():
+        counts["sessions"] += 1
+        return factory()
+
+    def on_checkout(*_):
+        counts["checkouts"] += 1
+
+    monkeypatch.setattr(app_db, "SessionLocal", counting_factory)
+    event.listen(engine, "checkout", on_checkout)
+    app.dependency_overrides.clear()
+    with TestClient(app) as test_client:
+        yield test_client, counts
+    event.remove(engine, "checkout", on_checkout)
+
+
+def test_cached_request_does_not_open_session(db_session, lazy_client):
+    """分类列表命中缓存时，请求不创建会话、不从连接池取连接"""
+    client, counts = lazy_client
+    db_session.add(Category(name="热菜", sort_order=1))
+    db_session.commit()
+
+    first = client.get("/api/categories")
+    assert first.status_code == 200
+    assert counts["sessions"] == 1
+
+    before = dict(counts)
+    second = client.get("/api/categories")
+    assert second.json() == first.json()
+    assert counts == before
+
+
+def test_validation_error_does_not_open_session(lazy_client):
+    """参数校验失败的请求不创建会话"""
+    client, counts = lazy_client
+    response = client.get("/api/dishes", params={"page": 0})
+    assert response.status_code == 422
+    assert counts["sessions"] == 0
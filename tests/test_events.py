@@ -0,0 +1,216 @@
+"""订单 / 库存事件广播测试"""
+import asyncio
+import json
+import threading
+import pytest
+from decimal import Decimal
+from app.events import (
+    EventBroadcaster, StockChangeCoalescer, format_sse, order_events, parse_last_event_id,
+    stock_changes, stream_events,
+)
+from app.models.user import User
+from app.models.dish import Category, Dish
+from app.models.enums import DishStatus
+from app.schemas.order import OrderCreate, OrderItemCreate
+from app.services.inventory_service import InventoryService
+from app.services.menu_service import MenuService
+from app.services.order_service import OrderService
+
+
+def _parse(chunk: bytes) -> dict:
+    fields = dict(line.split(": ", 1) for line in chunk.decode("utf-8").strip().splitlines())
+    return {"id": int(fields["id"]), "event": fields["event"], "data": json.loads(fields["data"])}
+
+
+def test_fan_out_to_many_subscribers():
+    """测试所有订阅者按序收到事件，包括从其他线程发布的事件"""
+    broadcaster = EventBroadcaster()
+
+    async def scenario():
+        subs = [broadcaster.subscribe()[0] for _ in range(3)]
+        broadcaster.publish("a", {"n": 1})
+        worker = threading.Thread(target=broadcaster.publish, args=("b", {"n": 2}))
+        worker.start()
+        worker.join()
+        received = []
+        for sub in subs:
+            received.append([(await sub.get(timeout=1)).type, (await sub.get(timeout=1)).type])
+            broadcaster.unsubscribe(sub)
+        return received
+
+    assert asyncio.run(scenario()) == [["a", "b"]] * 3
+    assert broadcaster.subscriber_count() == 0
+
+
+def test_resume_from_last_event_id():
+    """测试携带 Last-Event-ID 订阅时补发之后的事件"""
+    broadcaster = EventBroadcaster(history=10)
+    for n in range(5):
+        broadcaster.publish("tick", {"n": n})
+
+    async def scenario():
+        sub, backlog = broadcaster.subscribe(last_event_id=3)
+        broadcaster.unsubscribe(sub)
+        return backlog
+
+    assert [e.id for e in asyncio.run(scenario())] == [4, 5]
+
+
+def test_resume_gap_sends_reset():
+    """测试断线期间的事件已被挤出缓冲区时先发送 reset"""
+    broadcaster = EventBroadcaster(history=3)
+    for n in range(10):
+        broadcaster.publish("tick", {"n": n})
+
+    async def scenario(last_id):
+        sub, backlog = broadcaster.subscribe(last_event_id=last_id)
+        broadcaster.unsubscribe(sub)
+        return backlog
+
+    backlog = asyncio.run(scenario(2))
+    assert [e.type for e in backlog] == ["reset", "tick", "tick", "tick"]
+    assert [e.id for e in backlog] == [7, 8, 9, 10]
+    # 来自重启前进程的更大 id
+    assert [e.type for e in asyncio.run(scenario(99))] == ["reset"]
+
+
+def test_slow_subscriber_is_disconnected():
+    """测试队列写满的订阅者被断开，不影响其他订阅者"""
+    broadcaster = EventBroadcaster(queue_size=2)
+
+    async def scenario():
+        slow, _ = broadcaster.subscribe()
+        fast, _ = broadcaster.subscribe()
+        seen = []
+        for n in range(3):
+            broadcaster.publish("tick", {"n": n})
+            await asyncio.sleep(0)
+            seen.append((await fast.get(timeout=1)).data["n"])
+        return slow.overflowed, await slow.get(timeout=1), seen
+
+    overflowed, first, seen = asyncio.run(scenario())
+    assert overflowed and first is None
+    assert seen == [0, 1, 2]
+
+
+def test_stream_events_format():
+    """测试 SSE 响应体：retry 指令、补发事件、心跳"""
+    broadcaster = EventBroadcaster()
+    broadcaster.publish("order_created", {"order_id": 1})
+
+    async def scenario():
+        stream = stream_events(broadcaster, last_event_id=0, heartbeat=0.01)
+        chunks = [await stream.__anext__() for _ in range(3)]
+        await stream.aclose()
+        return chunks
+
+    retry, event, ping = asyncio.run(scenario())
+    assert retry == b"retry: 3000\n\n"
+    assert _parse(event) == {"id": 1, "event": "order_created", "data": {"order_id": 1}}
+    assert ping == b": ping\n\n"
+    assert broadcaster.subscriber_count() == 0
+    assert parse_last_event_id("abc") is None and parse_last_event_id("7") == 7
+
+
+def test_order_service_publishes_events(db_session):
+    """测试下单、完成、取消后发布订单事件"""
+    user = User(username="event_user", is_admin=False)
+    category = Category(name="事件分类", sort_order=1)
+    db_session.add_all([user, category])
+    db_session.flush()
+    dish = Dish(category_id=category.category_id, name="事件菜品",
+                price=Decimal("12.5"), stock=10, status=DishStatus.ON_SHELF)
+    db_session.add(dish)
+    db_session.commit()
+
+    start = order_events.last_id
+    service = OrderService(db_session)
+    first = service.create_order(OrderCreate(user_id=user.user_id, items=[
+        OrderItemCreate(dish_id=dish.dish_id, qty=2),
+    ]))
+    second = service.create_order(OrderCreate(user_id=user.user_id, items=[
+        OrderItemCreate(dish_id=dish.dish_id, qty=1),
+    ]))
+    service.complete_order(first.order_id)
+    service.cancel_order(second.order_id)
+    with pytest.raises(ValueError):
+        service.cancel_order(first.order_id)
+
+    async def scenario():
+        sub, backlog = order_events.subscribe(last_event_id=start)
+        order_events.unsubscribe(sub)
+        return backlog
+
+    events = [_parse(format_sse(e)) for e in asyncio.run(scenario())]
+    assert [e["event"] for e in events] == [
+        "order_created", "order_created", "order_completed", "order_cancelled",
+    ]
+    created = events[0]["data"]
+    assert created["order_id"] == first.order_id
+    assert created["total_price"] == "25.00"
+    assert created["items"] == [{"dish_id": dish.dish_id, "dish_name": "事件菜品", "qty": 2, "subtotal": "25.00"}]
+    assert events[3]["data"] == {"order_id": second.order_id, "status": "Cancelled", "old_status": "Submitted"}
+
+
+def test_stock_changes_coalesce_within_window():
+    """测试窗口内的库存变化按菜品合并为一个事件"""
+    broadcaster = EventBroadcaster()
+    coalescer = StockChangeCoalescer(broadcaster, window=60)
+    coalescer.record(1, -2)
+    coalescer.record(2, -1)
+    coalescer.record(1, 5, stock=20)
+    coalescer.record(1, -3)
+    coalescer.record(2, 0, stock=7, status="OffShelf")
+
+    event = coalescer.flush()
+    assert event.type == "stock"
+    assert event.data == {"dishes": [
+        {"dish_id": 1, "delta": 0, "stock": 17},
+        {"dish_id": 2, "delta": -1, "stock": 7, "status": "OffShelf"},
+    ]}
+    assert coalescer.flush() is None
+    assert broadcaster.last_id == 1
+
+
+def test_stock_changes_flush_after_window():
+    """测试窗口到期后自动发布"""
+    broadcaster = EventBroadcaster()
+    coalescer = StockChangeCoalescer(broadcaster, window=0.01)
+
+    async def scenario():
+        sub, _ = broadcaster.subscribe()
+        coalescer.record_many([(1, -1), (1, -1), (3, 1)])
+        event = await sub.get(timeout=2)
+        broadcaster.unsubscribe(sub)
+        return event
+
+    assert asyncio.run(scenario()).data == {"dishes": [
+        {"dish_id": 1, "delta": -2}, {"dish_id": 3, "delta": 1},
+    ]}
+
+
+def test_services_record_stock_changes(db_session, monkeypatch):
+    """测试下单、调整库存、批量调整、上下架都会记录库存变化"""
+    user = User(username="stock_user", is_admin=False)
+    category = Category(name="库存分类", sort_order=1)
+    db_session.add_all([user, category])
+    db_session.flush()
+    dish = Dish(category_id=category.category_id, name="库存菜品",
+                price=Decimal("8"), stock=10, status=DishStatus.ON_SHELF)
+    other = Dish(category_id=category.category_id, name="库存菜品2",
+                 price=Decimal("8"), stock=5, status=DishStatus.ON_SHELF)
+    db_session.add_all([dish, other])
+    db_session.commit()
+
+    stock_changes.flush()
+    monkeypatch.setattr(stock_changes, "window", 60)
+    OrderService(db_session).create_order(OrderCreate(user_id=user.user_id, items=[
+        OrderItemCreate(dish_id=dish.dish_id, qty=3),
+    ]))
+    InventoryService(db_session).adjust_stock(other.dish_id, 4)
+    InventoryService(db_session).adjust_stock_batch([(dish.dish_id, 1), (other.dish_id, -2)])
+    MenuService(db_session).update_dish_status(other.dish_id, "OffShelf")
+
+    changes = {c["dish_id"]: c for c in stock_changes.flush().data["dishes"]}
+    assert changes[dish.dish_id] == {"dish_id": dish.dish_id, "delta": -2}
+    assert changes[other.dish_id] == {"dish_id": other.dish_id, "delta": 2, "stock": 7, "status": "OffShelf"}
@@ -0,0 +1,144 @@
+"""订单流式导出测试"""
+import csv
+import io
+import json
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from importlib import import_module
+from sqlalchemy import select
+from app.db import group_concat
+from app.models.dish import OptionItem
+from app.models.order import Order
+from app.schemas.order import OrderCreate, OrderItemCreate
+from app.services import export_service
+from app.services.export_service import OrderExportService
+from app.services.order_service import OrderService
+
+
+@pytest.fixture
+def orders(db_session, sample_menu):
+    """创建 3 个订单：第 1 个带加价选项，第 3 个已完成"""
+    user, dish, extra = sample_menu["user"], sample_menu["dish"], sample_menu["extra"]
+    # 选项名含逗号：导出时不能被拆开
+    cheese = OptionItem(group_id=sample_menu["group"].group_id, name="芝士,双份", price_delta=Decimal("5.5"))
+    db_session.add(cheese)
+    db_session.commit()
+
+    service = OrderService(db_session)
+    results = [
+        service.create_order(OrderCreate(user_id=user.user_id, items=[
+            OrderItemCreate(dish_id=dish.dish_id, qty=2, option_item_ids=[extra.item_id, cheese.item_id]),
+            OrderItemCreate(dish_id=dish.dish_id, qty=1),
+        ])),
+        service.create_order(OrderCreate(user_id=user.user_id, items=[
+            OrderItemCreate(dish_id=dish.dish_id, qty=1),
+        ])),
+        service.create_order(OrderCreate(user_id=user.user_id, items=[
+            OrderItemCreate(dish_id=dish.dish_id, qty=4),
+        ])),
+    ]
+    service.complete_order(results[2].order_id)
+    return results
+
+
+def _read(chunks):
+    return b"".join(chunks)
+
+
+def test_export_ndjson_matches_order_totals(db_session, orders):
+    """测试 NDJSON 每行一个订单，总价与下单时一致"""
+    data = _read(OrderExportService(db_session).iter_export("ndjson"))
+    exported = [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+    assert [o["order_id"] for o in exported] == [o.order_id for o in orders]
+    for row, order in zip(exported, orders):
+        assert Decimal(row["total_price"]) == order.total_price
+    first = exported[0]["items"][0]
+    assert Decimal(first["option_delta"]) == Decimal("8")
+    assert sorted(first["option_names"]) == sorted(["芝士,双份", "加蛋"])
+    assert Decimal(first["subtotal"]) == Decimal("76")
+
+
+def test_export_csv_filters(db_session, orders):
+    """测试 CSV 每行一条明细，并支持状态筛选"""
+    data = _read(OrderExportService(db_session).iter_export("csv", status="Completed"))
+    rows = list(csv.DictReader(io.StringIO(data.decode("utf-8"))))
+
+    assert len(rows) == 1
+    assert int(rows[0]["order_id"]) == orders[2].order_id
+    assert Decimal(rows[0]["subtotal"]) == Decimal("120")
+
+
+def test_export_date_range(db_session, orders):
+    """测试按下单时间范围筛选"""
+    old = db_session.query(Order).filter(Order.order_id == orders[0].order_id).one()
+    old.created_at = datetime.utcnow() - timedelta(days=40)
+    db_session.commit()
+
+    service = OrderExportService(db_session)
+    since = datetime.utcnow() - timedelta(days=30)
+    recent = list(service.iter_orders(start=since))
+    assert [o["order_id"] for o in recent] == [orders[1].order_id, orders[2].order_id]
+    older = list(service.iter_orders(end=since))
+    assert [o["order_id"] for o in older] == [orders[0].order_id]
+
+
+def test_export_streams_in_batches(db_session, orders, monkeypatch):
+    """测试按批读取：批大小小于明细数时跨批的订单仍被完整聚合"""
+    monkeypatch.setattr(export_service, "EXPORT_BATCH_SIZE", 1)
+    service = OrderExportService(db_session)
+
+    batches = list(service.iter_line_batches())
+    assert [len(b) for b in batches] == [1, 1, 1, 1]
+    assert len(list(service.iter_orders())[0]["items"]) == 2
+
+
+def test_export_parquet(db_session, orders):
+    """测试 Parquet 导出（需要 pyarrow）"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    data = _read(OrderExportService(db_session).iter_export("parquet"))
+
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 4
+    assert table.column("subtotal").to_pylist()[0] == Decimal("76.00")
+
+
+def test_export_unknown_format(db_session):
+    """测试不支持的格式抛出 ValueError"""
+    with pytest.raises(ValueError):
+        OrderExportService(db_session).iter_export("xlsx")
+
+
+def test_export_csv_option_names(db_session, orders):
+    """测试 CSV 中选项名为 JSON 数组，含逗号的选项名保持完整"""
+    data = _read(OrderExportService(db_session).iter_export("csv"))
+    rows = list(csv.DictReader(io.StringIO(data.decode("utf-8"))))
+    assert sorted(json.loads(rows[0]["option_names"])) == sorted(["芝士,双份", "加蛋"])
+    assert json.loads(rows[1]["option_names"]) == []
+
+
+@pytest.mark.parametrize("dialect, expected", [
+    ("sqlite", "group_concat(option_items.name, ?)"),
+    ("mysql", "GROUP_CONCAT(option_items.name SEPARATOR %s)"),
+    ("postgresql", "string_agg(option_items.name, %(group_concat_2)s)"),
+])
+def test_option_names_separator_per_dialect(dialect, expected):
+    """测试选项名聚合按方言渲染分隔符（MySQL 的第二个参数不是分隔符，须用 SEPARATOR 子句）"""
+    query = select(group_concat(OptionItem.name, export_service.OPTION_NAME_SEPARATOR))
+    assert expected in str(query.compile(dialect=import_module(f"sqlalchemy.dialects.{dialect}").dialect()))
+
+
+def test_export_api_rejects_unknown_status(client, orders):
+    """测试无效的状态筛选在开始流式输出前返回 400"""
+    res = client.get("/api/admin/orders/export", params={"status": "Bogus"})
+    assert res.status_code == 400
+    assert "Bogus" in res.json()["detail"]
+
+
+def test_export_api(client, orders):
+    """测试导出接口返回流式 CSV"""
+    res = client.get("/api/admin/orders/export", params={"format": "csv"})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/csv")
+    assert len(res.text.strip().splitlines()) == 5  # 表头 + 4 条明细
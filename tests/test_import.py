@@ -0,0 +1,140 @@
+"""菜单批量导入测试"""
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+from decimal import Decimal
+from app.models.dish import Category, Dish, OptionItem
+from app.models.enums import DishStatus, OptionType
+from app.services.import_service import MenuImportService, read_records, detect_format
+
+
+CSV_MENU = """kind,category,dish,group,name,price,stock,status,sort_order,type,required,max_select,price_delta,available
+category,,,,特色菜,,,,1,,,,,
+dish,特色菜,,,宫保鸡丁,38,20,OnShelf,,,,,,
+option_group,,宫保鸡丁,,辣度,,,,,Single,true,1,,
+option_item,,宫保鸡丁,辣度,特辣,,,,,,,,2,true
+option_item,,宫保鸡丁,辣度,微辣,,,,,,,,0,
+"""
+
+
+def _ndjson(records):
+    return io.BytesIO("\n".join(json.dumps(r, ensure_ascii=False) for r in records).encode("utf-8"))
+
+
+def test_import_csv_creates_menu(db_session):
+    """测试 CSV 导入分类、菜品、口味组与选项"""
+    report = MenuImportService(db_session).import_records(
+        read_records(io.BytesIO(CSV_MENU.encode("utf-8")), "csv")
+    )
+
+    assert report.error_count == 0
+    assert report.counts["dish"].created == 1
+    dish = db_session.query(Dish).filter(Dish.name == "宫保鸡丁").one()
+    assert dish.price == Decimal("38")
+    assert dish.stock == 20
+    assert dish.status == DishStatus.ON_SHELF
+    group = dish.option_groups[0]
+    assert group.required is True
+    assert group.type == OptionType.SINGLE
+    assert sorted(i.name for i in group.items) == ["微辣", "特辣"]
+
+
+def test_import_upserts_by_natural_key(db_session):
+    """测试重复导入按自然键更新而非重复插入，并递增版本号"""
+    service = MenuImportService(db_session)
+    service.import_records(read_records(io.BytesIO(CSV_MENU.encode("utf-8")), "csv"))
+
+    report = service.import_records(read_records(_ndjson([
+        {"kind": "dish", "category": "特色菜", "name": "宫保鸡丁", "price": "42", "stock": 5},
+        {"kind": "option_item", "dish": "宫保鸡丁", "group": "辣度", "name": "特辣",
+         "price_delta": "3", "available": False},
+    ]), "ndjson"))
+
+    assert report.counts["dish"].updated == 1
+    assert report.counts["option_item"].updated == 1
+    assert db_session.query(Dish).count() == 1
+    db_session.expire_all()
+    dish = db_session.query(Dish).one()
+    assert dish.price == Decimal("42")
+    assert dish.stock == 5
+    assert dish.version == 2
+    item = db_session.query(OptionItem).filter(OptionItem.name == "特辣").one()
+    assert item.price_delta == Decimal("3")
+    assert item.available is False
+
+
+def test_import_reports_bad_rows(db_session):
+    """测试错误行（校验失败、引用缺失、JSON 损坏）被跳过并记录行号"""
+    stream = io.BytesIO(
+        b'{"kind": "category", "name": "\xe4\xb8\xbb\xe9\xa3\x9f"}\n'
+        b'{"kind": "dish", "category": "\xe4\xb8\xbb\xe9\xa3\x9f", "name": "A", "price": -1}\n'
+        b'{"kind": "dish", "category": "nope", "name": "B", "price": 1}\n'
+        b'not json\n'
+        b'{"kind": "unknown"}\n'
+        b'{"kind": "dish", "category": "\xe4\xb8\xbb\xe9\xa3\x9f", "name": "C", "price": 1}\n'
+    )
+    report = MenuImportService(db_session).import_records(read_records(stream, "ndjson"))
+
+    assert report.rows == 6
+    assert report.error_count == 4
+    assert sorted(e.line for e in report.errors) == [2, 3, 4, 5]
+    assert [d.name for d in db_session.query(Dish).all()] == ["C"]
+
+
+def test_import_large_menu_in_chunks(db_session):
+    """测试大批量导入分块提交且耗时可控"""
+    records = [{"kind": "category", "name": f"分类{i}"} for i in range(20)]
+    records += [
+        {"kind": "dish", "category": f"分类{i % 20}", "name": f"菜品{i}", "price": "9.9", "stock": i}
+        for i in range(3000)
+    ]
+    start = time.perf_counter()
+    report = MenuImportService(db_session).import_records(
+        read_records(_ndjson(records), "ndjson"), chunk_size=500
+    )
+    elapsed = time.perf_counter() - start
+
+    assert report.error_count == 0
+    assert report.chunks == 7
+    assert db_session.query(Dish).count() == 3000
+    assert db_session.query(Category).count() == 20
+    assert elapsed < 10
+
+
+def test_detect_format():
+    """测试按扩展名推断格式"""
+    assert detect_format("menu.CSV") == "csv"
+    assert detect_format("menu.jsonl") == "ndjson"
+    with pytest.raises(ValueError):
+        detect_format("menu.xlsx")
+
+
+def test_import_api(client):
+    """测试上传导入接口"""
+    res = client.post(
+        "/api/admin/import",
+        files={"file": ("menu.csv", CSV_MENU.encode("utf-8"), "text/csv")},
+    )
+    assert res.status_code == 200
+    body = res.json()
+    assert body["counts"]["option_item"]["created"] == 2
+
+    res = client.post("/api/admin/import", files={"file": ("menu.txt", b"", "text/plain")})
+    assert res.status_code == 400
+
+
+@pytest.mark.parametrize("argv, message", [
+    (["-"], "--format"),
+    (["menu.txt"], "menu.txt"),
+])
+def test_import_script_rejects_unknown_format(argv, message):
+    """测试导入脚本无法确定格式时给出用法错误而不是异常堆栈（在连接数据库之前退出）"""
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "import_menu.py")
+    proc = subprocess.run([sys.executable, script, *argv], input=b"", capture_output=True, timeout=60)
+    stderr = proc.stderr.decode("utf-8")
+    assert proc.returncode == 2
+    assert message in stderr and "Traceback" not in stderr
@@ -135,7 +135,7 @@ class TestOrderFlowIntegration:
         order_dto = OrderCreate(
             user_id=data["user"].user_id,
             remark="测试订单",
-            items=[OrderItemCreate(dish_id=dish.dish_id, qty=5, option_item_ids=[])]
+            items=[OrderItemCreate(dish_id=dish.dish_id, qty=5, option_item_ids=[data["options"][0].item_id])]
         )
         order = order_service.create_order(order_dto)
         
@@ -173,7 +173,7 @@ class TestOrderFlowIntegration:
             user_id=data["user"].user_id,
             remark="多菜品订单",
             items=[
-                OrderItemCreate(dish_id=data["dishes"][0].dish_id, qty=2, option_item_ids=[]),  # 宫保鸡丁 38*2
+                OrderItemCreate(dish_id=data["dishes"][0].dish_id, qty=2, option_item_ids=[data["options"][0].item_id]),  # 宫保鸡丁 38*2
                 OrderItemCreate(dish_id=data["dishes"][1].dish_id, qty=1, option_item_ids=[]),  # 红烧肉 58*1
                 OrderItemCreate(dish_id=data["dishes"][2].dish_id, qty=3, option_item_ids=[]),  # 清炒时蔬 28*3
             ]
@@ -232,7 +232,7 @@ class TestOrderFlowIntegration:
         order_dto = OrderCreate(
             user_id=data["user"].user_id,
             remark="待取消订单",
-            items=[OrderItemCreate(dish_id=dish.dish_id, qty=3, option_item_ids=[])]
+            items=[OrderItemCreate(dish_id=dish.dish_id, qty=3, option_item_ids=[data["options"][0].item_id])]
         )
         order = order_service.create_order(order_dto)
         
@@ -353,7 +353,7 @@ class TestInventoryOrderIntegration:
             user_id=data["user"].user_id,
             remark="",
             items=[
-                OrderItemCreate(dish_id=data["dishes"][0].dish_id, qty=2, option_item_ids=[]),
+                OrderItemCreate(dish_id=data["dishes"][0].dish_id, qty=2, option_item_ids=[data["options"][0].item_id]),
                 OrderItemCreate(dish_id=data["dishes"][1].dish_id, qty=100, option_item_ids=[]),  # 超过库存
             ]
         )
@@ -384,7 +384,7 @@ class TestInventoryOrderIntegration:
         order_dto = OrderCreate(
             user_id=data["user"].user_id,
             remark="",
-            items=[OrderItemCreate(dish_id=dish.dish_id, qty=1, option_item_ids=[])]
+            items=[OrderItemCreate(dish_id=dish.dish_id, qty=1, option_item_ids=[data["options"][0].item_id])]
         )
         
         with pytest.raises(ValueError, match="菜品不可用"):
@@ -423,7 +423,7 @@ class TestMultiUserIntegration:
         order1_dto = OrderCreate(
             user_id=data["user"].user_id,
             remark="用户1订单",
-            items=[OrderItemCreate(dish_id=dish.dish_id, qty=5, option_item_ids=[])]
+            items=[OrderItemCreate(dish_id=dish.dish_id, qty=5, option_item_ids=[data["options"][0].item_id])]
         )
         order1 = order_service.create_order(order1_dto)
         assert order1.order_id > 0
@@ -432,7 +432,7 @@ class TestMultiUserIntegration:
         order2_dto = OrderCreate(
             user_id=user2.user_id,
             remark="用户2订单",
-            items=[OrderItemCreate(dish_id=dish.dish_id, qty=3, option_item_ids=[])]
+            items=[OrderItemCreate(dish_id=dish.dish_id, qty=3, option_item_ids=[data["options"][0].item_id])]
         )
         order2 = order_service.create_order(order2_dto)
         assert order2.order_id > 0
@@ -457,7 +457,11 @@ class TestMultiUserIntegration:
             order_dto = OrderCreate(
                 user_id=data["user"].user_id,
                 remark=f"订单{i+1}",
-                items=[OrderItemCreate(dish_id=data["dishes"][i % 3].dish_id, qty=1, option_item_ids=[])]
+                items=[OrderItemCreate(
+                    dish_id=data["dishes"][i % 3].dish_id, qty=1,
+                    # 宫保鸡丁的辣度为必选
+                    option_item_ids=[data["options"][0].item_id] if i % 3 == 0 else []
+                )]
             )
             order_service.create_order(order_dto)
         
@@ -0,0 +1,167 @@
+"""跨进程缓存失效总线测试"""
+import multiprocessing
+import time
+import pytest
+from decimal import Decimal
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from app.db import Base
+from app.invalidation import DatabaseTransport, InvalidationBus, bus
+from app.models.dish import Category, Dish, OptionGroup, OptionItem
+from app.models.invalidation import cache_invalidations
+from app.services.option_rules import option_rules
+from app.services.option_service import OptionService
+
+POLL_INTERVAL = 0.05
+# 其他进程丢弃缓存的时限：轮询间隔 + 进程调度余量
+MAX_DELAY = 3.0
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    """多个进程共享的 SQLite 文件：一道带辣度选项的菜"""
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        category = Category(name="热菜", sort_order=1)
+        session.add(category)
+        session.flush()
+        session.add(Dish(category_id=category.category_id, name="水煮鱼", price=Decimal("48"), stock=10,
+                         option_groups=[OptionGroup(name="辣度", items=[OptionItem(name="特辣")])]))
+        session.commit()
+    engine.dispose()
+    return url
+
+
+def _recorder(bus_, topic):
+    received = []
+    bus_.subscribe(topic, received.append)
+    return received
+
+
+def test_local_publish():
+    """测试本进程订阅者同步失效；空 keys 不发布；处理异常不影响其他订阅者"""
+    local = InvalidationBus()
+    local.subscribe("t", lambda keys: 1 / 0)
+    received = _recorder(local, "t")
+    local.publish("t", [1, 2, 1])
+    local.publish("t", [])
+    local.publish("t")
+    local.publish("other", [3])
+    assert received == [[1, 2], None]
+
+
+def test_database_transport(db_url):
+    """测试消息经数据库表送达其他总线，发布方不重复处理自己的消息"""
+    engine = create_engine(db_url)
+    a, b = InvalidationBus(), InvalidationBus()
+    got_a, got_b = _recorder(a, "t"), _recorder(b, "t")
+    try:
+        a.start(DatabaseTransport(engine, POLL_INTERVAL), listen=False)
+        b.start(DatabaseTransport(engine, POLL_INTERVAL), listen=False)
+        a.publish("t", [1, 2])
+        a.publish("t")
+        b.publish("t", ["x"])
+        assert a.poll_once() == 1
+        assert b.poll_once() == 2
+        assert b.poll_once() == 0
+        assert got_a == [[1, 2], None, ["x"]]
+        assert got_b == [["x"], [1, 2], None]
+    finally:
+        a.stop()
+        b.stop()
+
+
+def test_late_commit_below_polled_id_is_delivered(db_url):
+    """测试较小的 id 晚于较大的 id 提交时（MySQL / PostgreSQL）消息不会被跳过；空洞超时后放弃"""
+    engine = create_engine(db_url)
+    transport = DatabaseTransport(engine, POLL_INTERVAL, gap_timeout=0.2)
+    transport.open()
+    start = transport._last_id
+
+    def commit(row_id, topic):
+        with engine.begin() as conn:
+            conn.execute(cache_invalidations.insert().values(
+                id=row_id, topic=topic, cache_keys=None, origin="other"))
+
+    commit(start + 3, "c")
+    assert transport.poll()[0] == [("c", None)]
+    commit(start + 1, "a")
+    assert transport.poll()[0] == [("a", None)]
+    assert transport.poll()[0] == []
+
+    time.sleep(0.3)
+    transport.poll()                    # id start+2 超时，不再查询
+    commit(start + 2, "b")
+    assert transport.poll()[0] == []
+
+
+def test_missed_messages_reset_everything(db_url):
+    """测试轮询中断超过保留期（消息可能已被清理）时全部主题全部失效"""
+    engine = create_engine(db_url)
+    listener = InvalidationBus()
+    first, second = _recorder(listener, "a"), _recorder(listener, "b")
+    transport = DatabaseTransport(engine, POLL_INTERVAL, retention=60)
+    try:
+        listener.start(transport, listen=False)
+        transport._last_poll -= 61
+        listener.poll_once()
+        assert first == [None] and second == [None]
+        listener.poll_once()
+        assert first == [None]
+    finally:
+        listener.stop()
+
+
+def test_publisher_prunes_old_messages(db_url, monkeypatch):
+    monkeypatch.setattr("app.invalidation.PRUNE_EVERY", 2)
+    engine = create_engine(db_url)
+    transport = DatabaseTransport(engine, POLL_INTERVAL, retention=0.5)
+    transport.send("t", [1])
+    time.sleep(0.6)
+    transport.send("t", [2])
+    with engine.connect() as conn:
+        keys = conn.execute(select(cache_invalidations.c.cache_keys)).scalars().all()
+    assert keys == ["[2]"]
+
+
+def _worker(db_url, ready, results):
+    """工作进程：预热选项规则缓存，等待其他进程的失效消息"""
+    engine = create_engine(db_url)
+    with Session(engine) as session:
+        dish_id = session.execute(select(func.min(Dish.dish_id))).scalar()
+        option_rules.load(session, [dish_id])
+    bus.start(DatabaseTransport(engine, POLL_INTERVAL))
+    ready.put(True)
+    deadline = time.time() + 30
+    while len(option_rules) and time.time() < deadline:
+        time.sleep(0.01)
+    results.put(time.time() if not len(option_rules) else None)
+    bus.stop()
+
+
+def test_workers_drop_stale_entries(db_url):
+    """测试多个工作进程在有界延迟内丢弃其他进程写入后失效的缓存"""
+    ctx = multiprocessing.get_context("spawn")
+    ready, results = ctx.Queue(), ctx.Queue()
+    workers = [ctx.Process(target=_worker, args=(db_url, ready, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    engine = create_engine(db_url)
+    try:
+        for _ in workers:
+            ready.get(timeout=60)
+        bus.start(DatabaseTransport(engine, POLL_INTERVAL), listen=False)
+        with Session(engine) as session:
+            published = time.time()
+            assert OptionService(session).set_availability_by_name("特辣", False) == 1
+        delays = [results.get(timeout=60) for _ in workers]
+    finally:
+        bus.stop()
+        for worker in workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+    assert all(done is not None for done in delays)
+    assert max(done - published for done in delays) < MAX_DELAY
@@ -1,10 +1,11 @@
 """库存服务测试"""
 import pytest
 from decimal import Decimal
+from sqlalchemy import event
 from app.models.user import User
 from app.models.dish import Category, Dish
 from app.models.enums import DishStatus
-from app.services.inventory_service import InventoryService
+from app.services.inventory_service import InventoryService, StockBatchError, BATCH_CHUNK_SIZE, UPDATE_CHUNK_SIZE
 
 
 @pytest.fixture
@@ -229,3 +230,96 @@ def test_adjust_stock_batch_nonexistent_dish(db_session, multiple_dishes):
     assert multiple_dishes[0].stock == 10
 
 
+def test_adjust_stock_batch_structured_failures(db_session, multiple_dishes):
+    """测试批量调整失败时返回逐菜品失败明细"""
+    service = InventoryService(db_session)
+
+    with pytest.raises(StockBatchError) as exc_info:
+        service.adjust_stock_batch([
+            (multiple_dishes[0].dish_id, 5),
+            (multiple_dishes[1].dish_id, -20),
+            (9999, 1),
+        ])
+
+    failures = {f.dish_id: f for f in exc_info.value.result.failures}
+    assert failures[multiple_dishes[1].dish_id].reason == "insufficient_stock"
+    assert failures[multiple_dishes[1].dish_id].stock == 10
+    assert failures[9999].reason == "missing_dish"
+    assert multiple_dishes[0].dish_id not in failures
+
+
+def test_adjust_stock_batch_non_atomic(db_session, multiple_dishes):
+    """测试非原子模式：跳过失败项，提交其余"""
+    service = InventoryService(db_session)
+
+    result = service.adjust_stock_batch([
+        (multiple_dishes[0].dish_id, 5),
+        (multiple_dishes[1].dish_id, -20),
+    ], atomic=False)
+
+    assert result.applied == [multiple_dishes[0].dish_id]
+    assert [f.dish_id for f in result.failures] == [multiple_dishes[1].dish_id]
+    db_session.refresh(multiple_dishes[0])
+    db_session.refresh(multiple_dishes[1])
+    assert multiple_dishes[0].stock == 15
+    assert multiple_dishes[1].stock == 10
+
+
+def test_adjust_stock_batch_merges_duplicates(db_session, multiple_dishes):
+    """测试同一菜品多次出现时合并调整量（合计不为负即可）"""
+    service = InventoryService(db_session)
+    dish_id = multiple_dishes[0].dish_id
+
+    service.adjust_stock_batch([(dish_id, -8), (dish_id, 5), (dish_id, -6)])
+
+    db_session.refresh(multiple_dishes[0])
+    assert multiple_dishes[0].stock == 1
+
+
+def test_adjust_stock_batch_large(db_session):
+    """测试超过单批上限的大批量调整（跨多个 IN/CASE 分块），每条语句的参数数低于 SQLite 旧版本上限 999"""
+    category = Category(name="批量分类", sort_order=1)
+    db_session.add(category)
+    db_session.flush()
+    count = max(BATCH_CHUNK_SIZE, UPDATE_CHUNK_SIZE) * 2 + 7
+    dishes = [
+        Dish(category_id=category.category_id, name=f"菜{i}", price=Decimal("1"),
+             stock=i, status=DishStatus.ON_SHELF)
+        for i in range(count)
+    ]
+    db_session.add_all(dishes)
+    db_session.commit()
+
+    parameter_counts = []
+    engine = db_session.get_bind()
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        rows = parameters if executemany else [parameters]
+        parameter_counts.extend(len(row) for row in rows)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        result = InventoryService(db_session).adjust_stock_batch([(d.dish_id, 3) for d in dishes])
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert len(result.applied) == count
+    assert max(parameter_counts) <= 999
+    stocks = dict(db_session.query(Dish.dish_id, Dish.stock).all())
+    assert all(stocks[d.dish_id] == i + 3 for i, d in enumerate(dishes))
+
+
+def test_adjust_stock_batch_api_failure_detail(client, multiple_dishes):
+    """测试接口返回 400 时包含结构化失败明细"""
+    res = client.post("/api/admin/inventory/adjust-batch", json=[
+        {"dish_id": multiple_dishes[0].dish_id, "delta": 1},
+        {"dish_id": 9999, "delta": 1},
+    ])
+    assert res.status_code == 400
+    assert res.json()["detail"]["failures"][0]["reason"] == "missing_dish"
+
+    res = client.post("/api/admin/inventory/adjust-batch", json=[
+        {"dish_id": multiple_dishes[0].dish_id, "delta": 1},
+    ])
+    assert res.status_code == 200
+    assert res.json()["applied"] == [multiple_dishes[0].dish_id]
@@ -0,0 +1,177 @@
+"""库存摘要测试"""
+import io
+import pytest
+from sqlalchemy import event, update
+from sqlalchemy.dialects import mysql
+from app.models.dish import Category, Dish
+from app.models.user import User
+from app.schemas.order import OrderCreate, OrderItemCreate
+from app.services.import_service import MenuImportService, read_records
+from app.services.inventory_digest import (
+    BUCKET_WIDTH, DIFF_BUCKET_MARGIN, MAX_LEAVES, MODULUS, InventoryDigestService, MerkleTree,
+    bucket_of, digest_stock, dish_term,
+)
+from app.services.inventory_service import InventoryService
+from app.services.menu_service import MenuService
+from app.services.order_service import OrderService
+
+
+@pytest.fixture
+def menu(db_session):
+    """经 MenuService 创建的菜品（跨越多个桶），返回 dish_id 列表"""
+    category = Category(name="测试分类", sort_order=1)
+    db_session.add(category)
+    db_session.add(User(username="digest-user", is_admin=False))
+    db_session.commit()
+    service = MenuService(db_session)
+    dish_ids = []
+    for i in range(BUCKET_WIDTH + 10):
+        dish = service.create_dish(category.category_id, f"菜品{i}", 10, "", 50, "OnShelf")
+        dish_ids.append(dish.dish_id)
+    return dish_ids
+
+
+def _consistent(db_session) -> bool:
+    digest = InventoryDigestService(db_session)
+    return digest.buckets() == digest.scan()
+
+
+def test_term_is_linear_in_stock():
+    """摘要项对库存线性：stock + delta 的摘要 = 原摘要 + delta 的系数项"""
+    delta = (dish_term(7, 13) - dish_term(7, 10)) % MODULUS
+    assert (dish_term(7, 10) + delta) % MODULUS == dish_term(7, 13)
+    assert (dish_term(7, 1) - dish_term(7, 0)) % MODULUS * 3 % MODULUS == delta
+    assert dish_term(7, 10) != dish_term(8, 10)
+
+
+def test_merkle_diff_locates_buckets():
+    """只有被修改的桶出现在 diff 中"""
+    stock = {dish_id: dish_id % 7 for dish_id in range(1, 1000)}
+    base = digest_stock(stock)
+    changed = dict(stock)
+    changed[5] += 1
+    changed[700] += 2
+    other = digest_stock(changed)
+
+    size = max(base) + 1
+    left, right = MerkleTree(base, size), MerkleTree(other, size)
+    assert left.root != right.root
+    assert left.diff(right) == sorted({bucket_of(5), bucket_of(700)})
+    assert left.diff(MerkleTree(base, size)) == []
+    with pytest.raises(ValueError):
+        left.diff(MerkleTree(base, size * 2))
+
+
+def test_incremental_digest_matches_full_scan(db_session, menu):
+    """下单、取消退库存、调整库存、批量调整、修改与删除菜品后，增量摘要与全表重算一致"""
+    assert _consistent(db_session)
+    user_id = db_session.query(User.user_id).scalar()
+
+    order_service = OrderService(db_session)
+    order = order_service.create_order(OrderCreate(user_id=user_id, items=[
+        OrderItemCreate(dish_id=menu[0], qty=2, option_item_ids=[]),
+        OrderItemCreate(dish_id=menu[0], qty=1, option_item_ids=[]),
+        OrderItemCreate(dish_id=menu[-1], qty=4, option_item_ids=[]),
+    ]))
+    assert _consistent(db_session)
+    order_service.cancel_order(order.order_id, restock=True)
+    assert _consistent(db_session)
+
+    inventory = InventoryService(db_session)
+    inventory.adjust_stock(menu[1], -7)
+    inventory.adjust_stock_batch([(menu[2], 5), (menu[-2], -3), (menu[2], 1)])
+    inventory.adjust_stock_batch([(menu[3], 1), (999999, 1)], atomic=False)
+    assert _consistent(db_session)
+
+    menu_service = MenuService(db_session)
+    menu_service.update_dish(menu[4], stock=3)
+    menu_service.delete_dish(menu[5])
+    assert _consistent(db_session)
+    assert InventoryDigestService(db_session).verify() == []
+
+
+def test_failed_write_leaves_digest_unchanged(db_session, menu):
+    """库存写入回滚时摘要一起回滚"""
+    before = InventoryDigestService(db_session).buckets()
+    user_id = db_session.query(User.user_id).scalar()
+    with pytest.raises(ValueError):
+        OrderService(db_session).create_order(OrderCreate(user_id=user_id, items=[
+            OrderItemCreate(dish_id=menu[0], qty=1, option_item_ids=[]),
+            OrderItemCreate(dish_id=menu[1], qty=1000, option_item_ids=[]),
+        ]))
+    assert InventoryDigestService(db_session).buckets() == before
+
+
+def test_refresh_locks_dishes_before_rewriting_buckets(db_session, menu):
+    """按表重算桶时先锁定读桶内菜品（MySQL 渲染为 FOR UPDATE），再删除重写桶行"""
+    statements = []
+    engine = db_session.get_bind()
+
+    def capture(conn, clauseelement, *args):
+        statements.append(str(clauseelement.compile(dialect=mysql.dialect())))
+
+    event.listen(engine, "before_execute", capture)
+    try:
+        MenuService(db_session).update_dish(menu[0], stock=3)
+    finally:
+        event.remove(engine, "before_execute", capture)
+    scans = [i for i, s in enumerate(statements) if s.startswith("SELECT dishes.dish_id, dishes.stock")]
+    rewrite = next(i for i, s in enumerate(statements) if s.startswith("DELETE FROM inventory_digest_buckets"))
+    assert scans and scans[0] < rewrite and statements[scans[0]].endswith("FOR UPDATE")
+    assert _consistent(db_session)
+
+
+def test_import_refreshes_digest(db_session):
+    """导入覆盖库存后摘要与表一致"""
+    csv_menu = (
+        "kind,category,dish,group,name,price,stock,status,sort_order,type,required,max_select,price_delta,available\n"
+        "category,,,,特色菜,,,,1,,,,,\n"
+        "dish,特色菜,,,宫保鸡丁,38,20,OnShelf,,,,,,\n"
+    )
+    service = MenuImportService(db_session)
+    service.import_records(read_records(io.BytesIO(csv_menu.encode("utf-8")), "csv"))
+    assert _consistent(db_session) and InventoryDigestService(db_session).buckets()
+    service.import_records(read_records(io.BytesIO(csv_menu.replace(",20,", ",3,").encode("utf-8")), "csv"))
+    assert _consistent(db_session)
+
+
+def test_digest_endpoints(client, db_session, menu):
+    """根哈希、逐层下钻、桶详情、与对端比较、校验与重算"""
+    response = client.get("/api/admin/inventory/digest")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["nodes"] == [body["root"]] and body["bucket_width"] == BUCKET_WIDTH
+    leaves = client.get("/api/admin/inventory/digest", params={"level": body["depth"]}).json()
+    assert len(leaves["nodes"]) == body["leaves"]
+    assert client.get("/api/admin/inventory/digest", params={"level": body["depth"] + 1}).status_code == 400
+
+    bucket = bucket_of(menu[0])
+    detail = client.get(f"/api/admin/inventory/digest/buckets/{bucket}").json()
+    assert detail["stock"][str(menu[0])] == 50
+    assert detail["start"] <= menu[0] < detail["end"]
+
+    # 副本上一道菜的库存不同：只报告它所在的桶
+    replica = dict(db_session.query(Dish.dish_id, Dish.stock).all())
+    assert client.post("/api/admin/inventory/digest/diff",
+                       json={"buckets": digest_stock(replica)}).json() == {"ok": True, "buckets": []}
+    replica[menu[-1]] += 1
+    result = client.post("/api/admin/inventory/digest/diff", json={"buckets": digest_stock(replica)}).json()
+    assert result == {"ok": False, "buckets": [bucket_of(menu[-1])]}
+
+    # 绕过服务直接改表：verify 发现，rebuild 修复
+    db_session.execute(update(Dish).where(Dish.dish_id == menu[0]).values(stock=1))
+    db_session.commit()
+    assert client.get("/api/admin/inventory/digest/verify").json() == {"ok": False, "buckets": [bucket]}
+    assert client.post("/api/admin/inventory/digest/rebuild").json()["buckets"] >= 2
+    assert client.get("/api/admin/inventory/digest/verify").json() == {"ok": True, "buckets": []}
+
+
+def test_digest_endpoints_reject_oversized_trees(client, menu):
+    """叶子数与对端桶号有上限：超出时 4xx，不按请求分配任意大的树"""
+    assert client.get("/api/admin/inventory/digest", params={"leaves": MAX_LEAVES * 2}).status_code == 422
+    limit = bucket_of(max(menu)) + DIFF_BUCKET_MARGIN
+    for bucket in (-1, limit + 1, 4_000_000_000):
+        response = client.post("/api/admin/inventory/digest/diff", json={"buckets": {str(bucket): 1}})
+        assert response.status_code == 400
+    response = client.post("/api/admin/inventory/digest/diff", json={"buckets": {str(limit): 1}})
+    assert response.status_code == 200 and response.json()["buckets"][-1] == limit
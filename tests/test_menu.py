@@ -0,0 +1,99 @@
+"""菜品与分类服务测试"""
+import pytest
+from decimal import Decimal
+from app.models.dish import Category, Dish
+from app.models.enums import DishStatus
+from app.services.menu_service import MenuService, VersionConflictError
+
+
+@pytest.fixture
+def sample_dish(db_session):
+    """创建测试分类与菜品"""
+    category = Category(name="测试分类", sort_order=1)
+    db_session.add(category)
+    db_session.flush()
+    dish = Dish(
+        category_id=category.category_id,
+        name="测试菜品",
+        price=Decimal("30"),
+        stock=10,
+        status=DishStatus.ON_SHELF
+    )
+    db_session.add(dish)
+    db_session.commit()
+    return dish
+
+
+def test_update_dish_bumps_version(db_session, sample_dish):
+    """测试编辑菜品后版本号递增"""
+    service = MenuService(db_session)
+    assert sample_dish.version == 1
+
+    dish = service.update_dish(sample_dish.dish_id, expected_version=1, name="新名字", price=None)
+
+    assert dish.name == "新名字"
+    assert dish.price == Decimal("30")
+    assert dish.version == 2
+
+
+def test_update_dish_version_conflict(db_session, sample_dish):
+    """测试两名管理员基于同一版本编辑时，后提交者冲突"""
+    service = MenuService(db_session)
+    service.update_dish(sample_dish.dish_id, expected_version=1, name="管理员A")
+
+    with pytest.raises(VersionConflictError):
+        service.update_dish(sample_dish.dish_id, expected_version=1, name="管理员B")
+
+    assert service.get_dish_detail(sample_dish.dish_id).name == "管理员A"
+
+
+def test_update_dish_without_version(db_session, sample_dish):
+    """测试未携带版本号时直接更新（兼容旧客户端）"""
+    service = MenuService(db_session)
+    dish = service.update_dish(sample_dish.dish_id, stock=3, status="OffShelf")
+
+    assert dish.stock == 3
+    assert dish.status == DishStatus.OFF_SHELF
+    assert dish.version == 2
+
+
+def test_update_dish_nonexistent(db_session):
+    """测试编辑不存在的菜品抛出 ValueError（而非冲突）"""
+    service = MenuService(db_session)
+    with pytest.raises(ValueError, match="菜品不存在") as exc_info:
+        service.update_dish(9999, expected_version=1, name="x")
+    assert not isinstance(exc_info.value, VersionConflictError)
+
+
+def test_update_dish_status_bumps_version(db_session, sample_dish):
+    """测试上下架也会递增版本号，使并发编辑可感知"""
+    service = MenuService(db_session)
+    service.update_dish_status(sample_dish.dish_id, "OffShelf")
+
+    with pytest.raises(VersionConflictError):
+        service.update_dish(sample_dish.dish_id, expected_version=1, name="x")
+
+
+def test_update_category_version_conflict(db_session, sample_dish):
+    """测试分类乐观锁"""
+    service = MenuService(db_session)
+    category_id = sample_dish.category_id
+
+    cat = service.update_category(category_id, "分类A", 1, expected_version=1)
+    assert cat.version == 2
+    with pytest.raises(VersionConflictError):
+        service.update_category(category_id, "分类B", 1, expected_version=1)
+
+
+def test_update_dish_api_conflict(client, sample_dish):
+    """测试接口在版本冲突时返回 409"""
+    url = f"/api/admin/dishes/{sample_dish.dish_id}"
+    res = client.patch(url, json={"name": "A", "version": 1})
+    assert res.status_code == 200
+    assert res.json()["version"] == 2
+
+    res = client.patch(url, json={"name": "B", "version": 1})
+    assert res.status_code == 409
+
+    res = client.patch("/api/admin/dishes/9999", json={"name": "B", "version": 1})
+    assert res.status_code == 404
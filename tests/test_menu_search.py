@@ -0,0 +1,153 @@
+"""菜品搜索索引测试"""
+import time
+import pytest
+from decimal import Decimal
+from sqlalchemy import event
+from app.models.dish import Category, Dish, OptionGroup, OptionItem
+from app.models.enums import DishStatus
+from app.services.menu_search import MenuSearchIndex, menu_search, ngrams, normalize
+from app.services.menu_service import MenuService
+
+# 测试用的小拼音表（不依赖 pypinyin）
+PINYIN = {"宫": "gong", "保": "bao", "鸡": "ji", "丁": "ding", "水": "shui", "煮": "zhu", "鱼": "yu",
+          "酸": "suan", "菜": "cai", "米": "mi", "饭": "fan"}
+
+
+def fake_pinyin(text):
+    return [PINYIN[ch] for ch in text if ch in PINYIN]
+
+
+@pytest.fixture
+def menu(db_session):
+    """热菜：宫保鸡丁、水煮鱼、酸菜鱼；主食：米饭"""
+    hot, staple = Category(name="热菜", sort_order=1), Category(name="主食", sort_order=2)
+    db_session.add_all([hot, staple])
+    db_session.flush()
+    dishes = {}
+    for name, category in (("宫保鸡丁", hot), ("水煮鱼", hot), ("酸菜鱼", hot), ("米饭", staple)):
+        dishes[name] = Dish(category_id=category.category_id, name=name, price=Decimal("20"),
+                            stock=10, status=DishStatus.ON_SHELF)
+    dishes["水煮鱼"].option_groups = [OptionGroup(name="辣度", items=[OptionItem(name="特辣")])]
+    db_session.add_all(dishes.values())
+    db_session.commit()
+    return {name: dish.dish_id for name, dish in dishes.items()}
+
+
+def _names(db_session, ids):
+    return [db_session.get(Dish, i).name for i in ids]
+
+
+def test_tokenize():
+    assert normalize(" ＧＢ ｊｄ ") == "gbjd"
+    assert ngrams("水煮鱼") == {"水", "煮", "鱼", "水煮", "煮鱼"}
+
+
+def test_search_fields_and_ranking(db_session, menu):
+    """测试菜名、拼音、首字母、分类、选项匹配与排序"""
+    index = MenuSearchIndex(pinyin=fake_pinyin)
+    assert _names(db_session, index.search(db_session, "鱼")) == ["水煮鱼", "酸菜鱼"]
+    assert _names(db_session, index.search(db_session, "gbjd")) == ["宫保鸡丁"]
+    assert _names(db_session, index.search(db_session, "GongBao")) == ["宫保鸡丁"]
+    assert _names(db_session, index.search(db_session, "shuizhu")) == ["水煮鱼"]
+    assert _names(db_session, index.search(db_session, "特辣")) == ["水煮鱼"]
+    assert _names(db_session, index.search(db_session, "主食")) == ["米饭"]
+    # 菜名命中排在分类命中之前；多个关键词须全部命中
+    assert _names(db_session, index.search(db_session, "热菜 鱼")) == ["水煮鱼", "酸菜鱼"]
+    assert _names(db_session, index.search(db_session, "酸菜")) == ["酸菜鱼"]
+    assert index.search(db_session, "煮丁") == []     # 二字均存在于索引但不是子串
+    assert index.search(db_session, "  ") == []
+    assert len(index.search(db_session, "鱼", limit=1)) == 1
+
+
+def test_without_pypinyin(db_session, menu, monkeypatch):
+    """测试未安装 pypinyin 时退化为只按汉字匹配"""
+    monkeypatch.setattr("app.services.menu_search.lazy_pinyin", None)
+    index = MenuSearchIndex()
+    assert index.search(db_session, "gbjd") == []
+    assert _names(db_session, index.search(db_session, "鸡丁")) == ["宫保鸡丁"]
+
+
+def test_pypinyin_initials(db_session, menu):
+    pytest.importorskip("pypinyin")
+    index = MenuSearchIndex()
+    assert _names(db_session, index.search(db_session, "gbjd")) == ["宫保鸡丁"]
+    assert _names(db_session, index.search(db_session, "szy")) == ["水煮鱼"]
+
+
+def test_incremental_refresh(db_session, menu):
+    """测试菜单写入后只重建脏菜品"""
+    index = MenuSearchIndex(pinyin=fake_pinyin)
+    index.search(db_session, "鱼")
+    statements = []
+    engine = db_session.get_bind()
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        assert index.search(db_session, "鱼")                       # 无失效：不查库
+        assert statements == []
+        db_session.get(Dish, menu["水煮鱼"]).name = "水煮牛肉"
+        db_session.commit()
+        index.invalidate([menu["水煮鱼"]])
+        statements.clear()
+        assert index.search(db_session, "鱼") == [menu["酸菜鱼"]]
+        assert len(statements) == 2                                  # 一道菜 + 其选项
+        assert "IN" in statements[0]
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert _names(db_session, index.search(db_session, "牛肉")) == ["水煮牛肉"]
+
+    db_session.delete(db_session.get(Dish, menu["米饭"]))
+    db_session.commit()
+    index.invalidate([menu["米饭"]])
+    assert index.search(db_session, "米饭") == []
+    assert len(index) == 3
+
+
+def test_service_hooks_invalidate(client, db_session, menu):
+    """测试后台编辑菜品、分类、选项后搜索结果立即更新"""
+    res = client.get("/api/dishes/search", params={"q": "鱼"})
+    assert res.status_code == 200
+    assert [d["name"] for d in res.json()] == ["水煮鱼", "酸菜鱼"]
+    assert res.json()[0]["stock"] == 10
+
+    service = MenuService(db_session)
+    service.update_dish(menu["酸菜鱼"], name="老坛酸菜鱼")
+    assert [d.name for d in service.search_dishes("老坛")] == ["老坛酸菜鱼"]
+
+    category_id = db_session.get(Dish, menu["米饭"]).category_id
+    service.update_category(category_id, name="面点")
+    assert [d.name for d in service.search_dishes("面点")] == ["米饭"]
+    assert service.search_dishes("主食") == []
+
+    created = service.create_dish(category_id, "扬州炒饭", 15, "", 5, "OnShelf")
+    assert [d.dish_id for d in service.search_dishes("炒饭")] == [created.dish_id]
+
+    client.post(f"/api/admin/dishes/{menu['宫保鸡丁']}/options", json={"name": "加料", "items": [{"name": "花生"}]})
+    assert [d["name"] for d in client.get("/api/dishes/search", params={"q": "花生"}).json()] == ["宫保鸡丁"]
+
+    assert client.get("/api/dishes/search", params={"q": ""}).status_code == 422
+    assert len(menu_search) == 5
+
+
+def test_search_latency(db_session):
+    """测试千道菜规模下单次搜索在毫秒以内"""
+    category = Category(name="热菜", sort_order=1)
+    db_session.add(category)
+    db_session.flush()
+    db_session.add_all(
+        Dish(category_id=category.category_id, name=f"招牌{n}号鱼" if n % 10 == 0 else f"家常菜{n}",
+             price=Decimal("10"), stock=1, status=DishStatus.ON_SHELF)
+        for n in range(2000)
+    )
+    db_session.commit()
+    index = MenuSearchIndex(pinyin=fake_pinyin)
+    index.refresh(db_session)
+    start = time.perf_counter()
+    for _ in range(200):
+        ids = index.search(db_session, "招牌 鱼")
+    elapsed = (time.perf_counter() - start) / 200
+    assert len(ids) == 20
+    assert elapsed < 0.005
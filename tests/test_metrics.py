@@ -0,0 +1,142 @@
+"""指标模块测试"""
+import json
+import os
+import time
+import pytest
+from decimal import Decimal
+from app import metrics
+from app.metrics import MetricsRegistry
+from app.models.user import User
+from app.models.dish import Category, Dish
+from app.models.enums import DishStatus
+from app.schemas.order import OrderCreate, OrderItemCreate
+from app.services.order_service import OrderService
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """每个用例前清空全局指标"""
+    metrics.registry.reset()
+    yield
+
+
+@pytest.fixture
+def order_data(db_session):
+    """创建用户与菜品"""
+    user = User(username="metrics_user", is_admin=False)
+    category = Category(name="测试分类", sort_order=1)
+    db_session.add_all([user, category])
+    db_session.flush()
+    dish = Dish(category_id=category.category_id, name="菜品A",
+                price=Decimal("10"), stock=2, status=DishStatus.ON_SHELF)
+    off = Dish(category_id=category.category_id, name="菜品B",
+               price=Decimal("10"), stock=2, status=DishStatus.OFF_SHELF)
+    db_session.add_all([dish, off])
+    db_session.commit()
+    return user, dish, off
+
+
+def test_render_counter_and_histogram():
+    """测试文本格式渲染（累计分桶、sum、count）"""
+    reg = MetricsRegistry()
+    counter = reg.counter("demo_total", "demo", ("reason",))
+    hist = reg.histogram("demo_seconds", "demo", ("route",), buckets=(0.1, 1.0))
+    counter.inc(reason="a")
+    counter.inc(2, reason="a")
+    hist.observe(0.05, route="/x")
+    hist.observe(0.5, route="/x")
+
+    text = reg.render()
+    assert '# TYPE demo_total counter' in text
+    assert 'demo_total{reason="a"} 3' in text
+    assert 'demo_seconds_bucket{route="/x",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/x",le="1"} 2' in text
+    assert 'demo_seconds_bucket{route="/x",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{route="/x"} 2' in text
+
+
+def test_label_mismatch_raises():
+    """测试标签不匹配时报错"""
+    reg = MetricsRegistry()
+    counter = reg.counter("demo_total", "demo", ("reason",))
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+
+def test_multiprocess_merge(tmp_path):
+    """测试多进程汇总：计数器跨进程累加，已退出进程的仪表被丢弃"""
+    reg = MetricsRegistry(str(tmp_path))
+    counter = reg.counter("demo_total", "demo")
+    gauge = reg.gauge("demo_in_flight", "demo")
+    counter.inc(1)
+    gauge.set(1)
+
+    # 模拟一个已退出的 worker 留下的快照
+    dead_pid = 2 ** 22 + 7
+    with open(os.path.join(str(tmp_path), f"metrics_{dead_pid}.json"), "w", encoding="utf-8") as f:
+        json.dump({"demo_total": [[[], 5]], "demo_in_flight": [[[], 3]]}, f)
+
+    text = reg.render()
+    assert "demo_total 6" in text
+    assert "demo_in_flight 1" in text
+
+
+def test_idle_worker_snapshot_is_flushed(tmp_path):
+    """测试空闲 worker 的最后增量：节流窗口内的增量由后台线程补写，关闭时再写一次"""
+    reg = MetricsRegistry(str(tmp_path))
+    counter = reg.counter("demo_total", "demo")
+    path = os.path.join(str(tmp_path), f"metrics_{os.getpid()}.json")
+
+    def written():
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["demo_total"]
+
+    counter.inc(1)
+    reg.maybe_flush()
+    counter.inc(1)
+    reg.maybe_flush()  # 节流：不落盘
+    assert written() == [[[], 1]]
+
+    reg.start_flushing(interval=0.01)
+    try:
+        deadline = time.monotonic() + 5
+        while written() != [[[], 2]] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert written() == [[[], 2]]
+    finally:
+        reg.stop_flushing(final=False)
+
+    counter.inc(1)
+    reg.stop_flushing()
+    assert written() == [[[], 3]]
+
+
+def test_order_metrics(db_session, order_data):
+    """测试下单成功/失败原因与扣减冲突计数"""
+    user, dish, off = order_data
+    service = OrderService(db_session)
+
+    service.create_order(OrderCreate(user_id=user.user_id, items=[
+        OrderItemCreate(dish_id=dish.dish_id, qty=1)
+    ]))
+    for dish_id, qty in [(dish.dish_id, 5), (off.dish_id, 1), (9999, 1)]:
+        with pytest.raises(ValueError):
+            service.create_order(OrderCreate(user_id=user.user_id, items=[
+                OrderItemCreate(dish_id=dish_id, qty=qty)
+            ]))
+
+    assert metrics.ORDERS_CREATED.get() == 1
+    assert metrics.ORDERS_FAILED.get(reason="stock_shortage") == 1
+    assert metrics.ORDERS_FAILED.get(reason="off_shelf") == 1
+    assert metrics.ORDERS_FAILED.get(reason="missing_dish") == 1
+    assert metrics.STOCK_DECREMENT_CONFLICTS.get() == 1
+
+
+def test_metrics_endpoint(client, order_data):
+    """测试 /metrics 接口输出路由级耗时与连接池状态"""
+    client.get("/api/categories")
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/categories",status="200"} 1' in res.text
+    assert "db_pool_connections" in res.text
@@ -0,0 +1,99 @@
+"""数据库结构迁移与启动模式测试"""
+import os
+import sys
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from app.migrations import SCHEMA_VERSION, SchemaVersionError, bootstrap, current_version, migrate, verify
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import profile_startup  # noqa: E402
+
+
+@pytest.fixture
+def old_engine(tmp_path):
+    """旧版数据库：分类/菜品表没有 version 列，也没有版本戳"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE categories (category_id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL, sort_order INTEGER)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE dishes (dish_id INTEGER PRIMARY KEY, category_id INTEGER NOT NULL, "
+            "name VARCHAR(100) NOT NULL, price NUMERIC(10, 2) NOT NULL, image_url VARCHAR(500), "
+            "stock INTEGER, status VARCHAR(8) NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO categories VALUES (1, '热菜', 1)"))
+        conn.execute(text("INSERT INTO dishes VALUES (1, 1, '宫保鸡丁', 28.00, '', 10, 'ON_SHELF')"))
+    yield engine
+    engine.dispose()
+
+
+def test_verify_rejects_unmigrated_database(old_engine):
+    with old_engine.connect() as conn:
+        assert current_version(conn) is None
+    with pytest.raises(SchemaVersionError):
+        verify(old_engine)
+    with pytest.raises(SchemaVersionError):
+        bootstrap(old_engine, "verify")
+    assert bootstrap(old_engine, "skip") is None
+
+
+def test_migrate_upgrades_old_schema_and_is_idempotent(old_engine):
+    """测试迁移补齐旧库缺少的列并写入版本戳；重复执行无副作用"""
+    assert migrate(old_engine) == SCHEMA_VERSION
+    columns = {c["name"] for c in inspect(old_engine).get_columns("dishes")}
+    assert "version" in columns
+    assert "orders" in inspect(old_engine).get_table_names()
+    with old_engine.connect() as conn:
+        assert conn.execute(text("SELECT version FROM dishes WHERE dish_id = 1")).scalar() == 1
+
+    assert verify(old_engine) == SCHEMA_VERSION
+    assert migrate(old_engine) == SCHEMA_VERSION
+    with old_engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM schema_version")).scalar() == SCHEMA_VERSION
+
+
+def test_migrate_backfills_order_summaries(old_engine):
+    """测试旧订单按明细回填 total_cents / item_count"""
+    with old_engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE orders (order_id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+            "status VARCHAR(9) NOT NULL, remark VARCHAR(500), created_at DATETIME NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO orders VALUES (1, 1, 'SUBMITTED', '', '2024-01-01 12:00:00')"))
+    migrate(old_engine)
+    with old_engine.begin() as conn:
+        conn.execute(text("INSERT INTO order_items (id, order_id, dish_id, qty, unit_price) VALUES (1, 1, 1, 3, 28.00)"))
+        conn.execute(text("INSERT INTO option_groups (group_id, dish_id, name, type, max_select, required) "
+                          "VALUES (1, 1, '加料', 'MULTIPLE', 2, 0)"))
+        conn.execute(text("INSERT INTO option_items (item_id, group_id, name, price_delta, available) "
+                          "VALUES (1, 1, '加蛋', 1.50, 1)"))
+        conn.execute(text("INSERT INTO order_item_options VALUES (1, 1)"))
+        conn.execute(text("UPDATE orders SET total_cents = 0, item_count = 0"))
+    from app.migrations import _v2_order_summaries
+    with old_engine.begin() as conn:
+        _v2_order_summaries(conn)
+    with old_engine.connect() as conn:
+        assert conn.execute(text("SELECT total_cents, item_count FROM orders")).one() == (8850, 3)
+        indexes = {i["name"] for i in inspect(conn).get_indexes("orders")}
+    assert "ix_orders_user_history" in indexes
+
+
+def test_bootstrap_modes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    try:
+        with pytest.raises(ValueError):
+            bootstrap(engine, "eager")
+        assert bootstrap(engine, "auto") == SCHEMA_VERSION
+        assert bootstrap(engine, "verify") == SCHEMA_VERSION
+    finally:
+        engine.dispose()
+
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     _io\n"
+        "import time:      5000 |      80000 | app.main\n"
+    )
+    assert profile_startup.parse_importtime(stderr) == [("_io", 120, 120, 2), ("app.main", 5000, 80000, 0)]
@@ -0,0 +1,133 @@
+"""口味选项后台管理测试"""
+import pytest
+from decimal import Decimal
+from sqlalchemy import event
+from app.models.user import User
+from app.models.dish import Category, Dish, OptionGroup, OptionItem
+from app.models.enums import DishStatus
+from app.services.option_rules import option_rules
+
+
+@pytest.fixture
+def dishes(db_session):
+    category = Category(name="热菜", sort_order=1)
+    db_session.add_all([category, User(username="guest", is_admin=False)])
+    db_session.flush()
+    rows = [
+        Dish(category_id=category.category_id, name=f"菜品{n}", price=Decimal("20"),
+             stock=50, status=DishStatus.ON_SHELF)
+        for n in range(4)
+    ]
+    db_session.add_all(rows)
+    db_session.commit()
+    return [d.dish_id for d in rows]
+
+
+def _spicy_group(client, dish_id):
+    res = client.post(f"/api/admin/dishes/{dish_id}/options", json={
+        "name": "辣度", "type": "Single", "required": True,
+        "items": [{"name": "微辣"}, {"name": "加辣", "price_delta": "1.5"}],
+    })
+    assert res.status_code == 201
+    return res.json()
+
+
+def test_group_and_item_crud(client, dishes):
+    """测试选项组与选项的增删改"""
+    group = _spicy_group(client, dishes[0])
+    assert [i["name"] for i in group["items"]] == ["微辣", "加辣"]
+    assert client.post("/api/admin/dishes/9999/options", json={"name": "x"}).status_code == 404
+
+    res = client.patch(f"/api/admin/options/groups/{group['group_id']}", json={"required": False})
+    assert res.json()["required"] is False and res.json()["name"] == "辣度"
+
+    item = client.post(f"/api/admin/options/groups/{group['group_id']}/items",
+                       json={"name": "特辣", "price_delta": "3"}).json()
+    res = client.patch(f"/api/admin/options/items/{item['item_id']}", json={"available": False})
+    assert res.json()["available"] is False and Decimal(res.json()["price_delta"]) == Decimal("3")
+
+    listed = client.get(f"/api/admin/dishes/{dishes[0]}/options").json()
+    assert [i["name"] for i in listed[0]["items"]] == ["微辣", "加辣", "特辣"]
+
+    assert client.delete(f"/api/admin/options/items/{item['item_id']}").status_code == 204
+    assert client.delete(f"/api/admin/options/groups/{group['group_id']}").status_code == 204
+    assert client.get(f"/api/admin/dishes/{dishes[0]}/options").json() == []
+    assert client.patch("/api/admin/options/items/9999", json={"available": True}).status_code == 404
+
+
+def test_options_used_by_orders_cannot_be_deleted(client, dishes):
+    group = _spicy_group(client, dishes[0])
+    mild = group["items"][0]["item_id"]
+    res = client.post("/api/orders", json={"user_id": 1, "items": [
+        {"dish_id": dishes[0], "qty": 1, "option_item_ids": [mild]},
+    ]})
+    assert res.status_code == 201
+    assert client.delete(f"/api/admin/options/items/{mild}").status_code == 409
+    assert client.delete(f"/api/admin/options/groups/{group['group_id']}").status_code == 409
+
+
+def test_edits_invalidate_option_rules(client, dishes):
+    """测试编辑选项后下单立即使用新规则"""
+    group = _spicy_group(client, dishes[0])
+    hot = group["items"][1]["item_id"]
+    order = {"user_id": 1, "items": [{"dish_id": dishes[0], "qty": 1, "option_item_ids": [hot]}]}
+    assert client.post("/api/orders", json=order).json()["total_price"] == "21.50"
+
+    client.patch(f"/api/admin/options/items/{hot}", json={"price_delta": "2"})
+    assert client.post("/api/orders", json=order).json()["total_price"] == "22.00"
+
+    client.post("/api/admin/options/availability", json={"name": "加辣", "available": False})
+    res = client.post("/api/orders", json=order)
+    assert res.status_code == 400 and "选项不可用" in res.json()["detail"]
+
+
+def test_bulk_availability_is_one_statement(client, db_session, dishes):
+    """测试按名称批量上下架：一条 UPDATE，可限定菜品"""
+    for dish_id in dishes:
+        _spicy_group(client, dish_id)
+
+    statements = []
+    engine = db_session.get_bind()
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        res = client.post("/api/admin/options/availability", json={"name": "加辣", "available": False})
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert res.json() == {"updated": 4}
+    assert sum(s.lstrip().upper().startswith("UPDATE") for s in statements) == 1
+
+    res = client.post("/api/admin/options/availability",
+                      json={"name": "加辣", "available": True, "dish_ids": dishes[:2]})
+    assert res.json() == {"updated": 2}
+    db_session.expire_all()
+    flags = {i.group.dish_id: i.available for i in db_session.query(OptionItem).filter(OptionItem.name == "加辣")}
+    assert flags == {dishes[0]: True, dishes[1]: True, dishes[2]: False, dishes[3]: False}
+
+
+def test_clone_groups(client, db_session, dishes):
+    """测试复制选项组：同名组只补齐缺少的选项，重复执行不产生重复数据"""
+    _spicy_group(client, dishes[0])
+    client.post(f"/api/admin/dishes/{dishes[0]}/options", json={
+        "name": "加料", "type": "Multiple", "max_select": 2, "items": [{"name": "加蛋", "price_delta": "2"}],
+    })
+    client.post(f"/api/admin/dishes/{dishes[1]}/options", json={"name": "辣度", "items": [{"name": "微辣"}]})
+    option_rules.load(db_session, dishes)
+
+    res = client.post("/api/admin/options/clone",
+                      json={"source_dish_id": dishes[0], "target_dish_ids": dishes[1:] + [dishes[0], 9999]})
+    assert res.json() == {"groups": 5, "items": 8}
+    assert len(option_rules) == 1      # 目标菜品的规则已失效
+    again = client.post("/api/admin/options/clone",
+                        json={"source_dish_id": dishes[0], "target_dish_ids": dishes[1:]})
+    assert again.json() == {"groups": 0, "items": 0}
+
+    for dish_id in dishes[1:]:
+        groups = {g["name"]: g for g in client.get(f"/api/admin/dishes/{dish_id}/options").json()}
+        assert set(groups) == {"辣度", "加料"}
+        assert sorted(i["name"] for i in groups["辣度"]["items"]) == ["加辣", "微辣"]
+        assert groups["加料"]["max_select"] == 2 and groups["加料"]["type"] == "Multiple"
+    assert db_session.query(OptionGroup).count() == 8
@@ -0,0 +1,111 @@
+"""下单选项规则测试"""
+import io
+import pytest
+from decimal import Decimal
+from sqlalchemy import event
+from app.models.dish import Dish, OptionGroup, OptionItem
+from app.models.enums import DishStatus, OptionType
+from app.schemas.order import OrderCreate, OrderItemCreate
+from app.services.import_service import MenuImportService, read_records
+from app.services.option_rules import OptionRuleError, compile_rules, option_rules
+from app.services.order_service import OrderService
+
+
+@pytest.fixture
+def menu(db_session, sample_menu):
+    """菜品A：辣度（单选必选）、加料（多选，最多 2 项，其中一项停售）；菜品B 无选项"""
+    user, category, dish_a, extra = (
+        sample_menu["user"], sample_menu["category"], sample_menu["dish"], sample_menu["group"],
+    )
+    dish_b = Dish(category_id=category.category_id, name="菜品B", price=Decimal("10"),
+                  stock=100, status=DishStatus.ON_SHELF)
+    db_session.add(dish_b)
+    db_session.flush()
+    spicy = OptionGroup(dish_id=dish_a.dish_id, name="辣度", type=OptionType.SINGLE, required=True, max_select=1)
+    other = OptionGroup(dish_id=dish_b.dish_id, name="温度", type=OptionType.SINGLE)
+    db_session.add_all([spicy, other])
+    db_session.flush()
+    items = {
+        name: OptionItem(group_id=group.group_id, name=name, price_delta=Decimal(delta), available=available)
+        for name, group, delta, available in [
+            ("微辣", spicy, "0", True), ("特辣", spicy, "1", True),
+            ("加肉", extra, "6", True), ("加芝士", extra, "3", True),
+            ("加鲍鱼", extra, "50", False), ("去冰", other, "0", True),
+        ]
+    }
+    db_session.add_all(items.values())
+    db_session.commit()
+    items["加蛋"] = sample_menu["extra"]
+    return {"user": user, "a": dish_a, "b": dish_b, "items": items}
+
+
+def _order(db_session, menu, dish, names):
+    return OrderService(db_session).create_order(OrderCreate(user_id=menu["user"].user_id, items=[
+        OrderItemCreate(dish_id=dish.dish_id, qty=2, option_item_ids=[menu["items"][n].item_id for n in names]),
+    ]))
+
+
+def test_valid_selection_is_priced(db_session, menu):
+    order = _order(db_session, menu, menu["a"], ["特辣", "加蛋", "加肉", "加蛋"])
+    assert order.total_price == Decimal("79.00")   # (30 + 1 + 2.5 + 6) * 2，重复选项只计一次
+    detail = OrderService(db_session).get_order_by_id(order.order_id)
+    assert detail.items[0].subtotal == Decimal("79.00")
+
+
+@pytest.mark.parametrize("names, reason", [
+    ([], "option_required"),
+    (["微辣", "特辣"], "option_limit"),
+    (["微辣", "加蛋", "加肉", "加芝士"], "option_limit"),
+    (["微辣", "加鲍鱼"], "option_unavailable"),
+    (["微辣", "去冰"], "option_mismatch"),
+])
+def test_invalid_selection_is_rejected(db_session, menu, names, reason):
+    """测试选项不属于菜品、必选组未选、超过可选数、停售选项均被拒绝，且不扣库存"""
+    with pytest.raises(ValueError):
+        _order(db_session, menu, menu["a"], names)
+    rules = compile_rules(db_session, [menu["a"].dish_id])[menu["a"].dish_id]
+    with pytest.raises(OptionRuleError) as e:
+        rules.price([menu["items"][n].item_id for n in names])
+    assert e.value.reason == reason
+    db_session.expire_all()
+    assert db_session.get(Dish, menu["a"].dish_id).stock == 100
+
+
+def test_rules_are_cached_until_invalidated(db_session, menu):
+    """测试规则按菜品缓存：再次下单不查询选项表；导入修改选项后失效"""
+    _order(db_session, menu, menu["a"], ["微辣"])
+    assert len(option_rules) == 1
+
+    dto = OrderCreate(user_id=menu["user"].user_id, items=[OrderItemCreate(
+        dish_id=menu["a"].dish_id, qty=1, option_item_ids=[menu["items"][n].item_id for n in ("微辣", "加蛋")],
+    )])
+    statements = []
+    engine = db_session.get_bind()
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        OrderService(db_session).create_order(dto)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert not any("option_groups" in s or "FROM option_items" in s for s in statements)
+
+    csv_menu = (
+        "kind,category,dish,group,name,price_delta,available\n"
+        "option_item,,菜品A,加料,加蛋,2.5,false\n"
+    )
+    MenuImportService(db_session).import_records(read_records(io.BytesIO(csv_menu.encode("utf-8")), "csv"))
+    assert len(option_rules) == 0
+    with pytest.raises(ValueError, match="选项不可用"):
+        _order(db_session, menu, menu["a"], ["微辣", "加蛋"])
+
+
+def test_dish_without_options_accepts_empty_selection(db_session, menu):
+    rules = compile_rules(db_session, [menu["b"].dish_id, 9999])
+    assert rules[9999].groups == {} and rules[9999].options == {}
+    order = OrderService(db_session).create_order(OrderCreate(user_id=menu["user"].user_id, items=[
+        OrderItemCreate(dish_id=menu["b"].dish_id, qty=1),
+    ]))
+    assert order.total_price == Decimal("10")
@@ -4,6 +4,7 @@ from decimal import Decimal
 from app.models.user import User
 from app.models.dish import Category, Dish, OptionGroup, OptionItem
 from app.models.enums import DishStatus, OrderStatus, OptionType
+from app.models.order import Order
 from app.schemas.order import OrderCreate, OrderItemCreate
 from app.services.order_service import OrderService
 
@@ -451,3 +452,162 @@ def test_create_order_multiple_same_dish(db_session, test_user, test_dishes):
     assert test_dishes[0].stock == 5
 
 
+
+
+def test_list_user_orders_keyset_pagination(db_session, test_user, test_dishes):
+    """测试用户订单历史：倒序、游标翻页不重不漏、摘要来自冗余汇总列"""
+    service = OrderService(db_session)
+    created = []
+    for qty in (1, 2, 1, 3, 1):
+        created.append(service.create_order(OrderCreate(
+            user_id=test_user.user_id,
+            items=[OrderItemCreate(dish_id=test_dishes[0].dish_id, qty=qty, option_item_ids=[]),
+                   OrderItemCreate(dish_id=test_dishes[1].dish_id, qty=1, option_item_ids=[])],
+        )))
+    other = User(username="other", is_admin=False)
+    db_session.add(other)
+    db_session.commit()
+    service.create_order(OrderCreate(
+        user_id=other.user_id, items=[OrderItemCreate(dish_id=test_dishes[0].dish_id, qty=1)],
+    ))
+
+    seen, cursor = [], None
+    while True:
+        page = service.list_user_orders(test_user.user_id, limit=2, cursor=cursor)
+        seen.extend(page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert [s.order_id for s in seen] == [o.order_id for o in reversed(created)]
+    by_id = {o.order_id: o for o in created}
+    for summary in seen:
+        assert summary.total_price == by_id[summary.order_id].total_price
+        assert summary.status == OrderStatus.SUBMITTED.value
+    assert [s.item_count for s in seen] == [2, 4, 2, 3, 2]
+
+    with pytest.raises(ValueError):
+        service.list_user_orders(test_user.user_id, cursor="not-a-cursor")
+
+
+def test_list_user_orders_uses_covering_index(db_session):
+    from sqlalchemy import text
+    plan = db_session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT order_id, status, total_cents, item_count, created_at FROM orders "
+        "WHERE user_id = 1 ORDER BY created_at DESC, order_id DESC LIMIT 21"
+    )).all()
+    detail = " ".join(row[-1] for row in plan)
+    assert "COVERING INDEX ix_orders_user_history" in detail
+    assert "TEMP B-TREE" not in detail
+
+
+def test_user_orders_endpoint(client, db_session, test_user, test_dishes):
+    for _ in range(3):
+        res = client.post("/api/orders", json={
+            "user_id": test_user.user_id, "items": [{"dish_id": test_dishes[1].dish_id, "qty": 1}],
+        })
+        assert res.status_code == 201
+    first = client.get(f"/api/users/{test_user.user_id}/orders", params={"limit": 2}).json()
+    assert len(first["items"]) == 2 and first["items"][0]["total_price"] == "20.00"
+    rest = client.get(f"/api/users/{test_user.user_id}/orders",
+                      params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert len(rest["items"]) == 1 and rest["next_cursor"] is None
+    assert client.get(f"/api/users/{test_user.user_id}/orders", params={"cursor": "!!"}).status_code == 400
+
+
+def test_transition_rejects_wrong_status(db_session, test_user, test_dishes):
+    """测试条件更新未命中时给出当前状态，且不改变订单"""
+    service = OrderService(db_session)
+    order = service.create_order(OrderCreate(
+        user_id=test_user.user_id, items=[OrderItemCreate(dish_id=test_dishes[0].dish_id, qty=1)],
+    ))
+    service.complete_order(order.order_id)
+    with pytest.raises(ValueError, match="当前为 Completed，无法取消"):
+        service.cancel_order(order.order_id)
+    with pytest.raises(ValueError, match="无法完成"):
+        service.complete_order(order.order_id)
+    assert service.get_order_by_id(order.order_id).status == OrderStatus.COMPLETED.value
+
+
+def test_bulk_complete_and_cancel_endpoints(client, db_session, test_user, test_dishes):
+    """测试批量完成/取消：只流转状态允许的订单，其余列入 skipped"""
+    ids = []
+    for _ in range(3):
+        res = client.post("/api/orders", json={
+            "user_id": test_user.user_id, "items": [{"dish_id": test_dishes[0].dish_id, "qty": 1}],
+        })
+        ids.append(res.json()["order_id"])
+
+    res = client.post("/api/admin/orders/complete", json={"order_ids": ids[:2] + [9999]})
+    assert res.status_code == 200
+    assert res.json() == {"updated": ids[:2], "skipped": [9999]}
+
+    res = client.post("/api/admin/orders/cancel", json={"order_ids": ids})
+    assert res.json() == {"updated": [ids[2]], "skipped": ids[:2]}
+    statuses = {o.order_id: o.status for o in db_session.query(Order).all()}
+    assert statuses == {ids[0]: OrderStatus.COMPLETED, ids[1]: OrderStatus.COMPLETED, ids[2]: OrderStatus.CANCELLED}
+
+    assert client.post("/api/admin/orders/complete", json={"order_ids": []}).status_code == 422
+
+
+def _stock(db_session, dish):
+    db_session.expire_all()
+    return db_session.query(Dish).filter(Dish.dish_id == dish.dish_id).one().stock
+
+
+def test_cancel_order_restock(db_session, test_user, test_dishes, monkeypatch):
+    """测试取消退库存：显式开启、按配置默认、重复取消不重复退"""
+    from app.config import settings
+    service = OrderService(db_session)
+
+    def place():
+        return service.create_order(OrderCreate(user_id=test_user.user_id, items=[
+            OrderItemCreate(dish_id=test_dishes[0].dish_id, qty=2),
+            OrderItemCreate(dish_id=test_dishes[0].dish_id, qty=1),
+            OrderItemCreate(dish_id=test_dishes[1].dish_id, qty=1),
+        ]))
+
+    first, second, third = place(), place(), place()
+    assert (_stock(db_session, test_dishes[0]), _stock(db_session, test_dishes[1])) == (1, 2)
+
+    service.cancel_order(first.order_id)                      # 默认不退
+    assert _stock(db_session, test_dishes[0]) == 1
+    service.cancel_order(second.order_id, restock=True)
+    assert (_stock(db_session, test_dishes[0]), _stock(db_session, test_dishes[1])) == (4, 3)
+    with pytest.raises(ValueError):
+        service.cancel_order(second.order_id, restock=True)
+    assert _stock(db_session, test_dishes[0]) == 4
+
+    monkeypatch.setattr(settings, "RESTOCK_ON_CANCEL", True)
+    service.cancel_order(third.order_id)
+    assert (_stock(db_session, test_dishes[0]), _stock(db_session, test_dishes[1])) == (7, 4)
+
+
+def test_bulk_cancel_restock_single_update(client, db_session, test_user, test_dishes):
+    """测试批量取消退库存：跨订单按菜品合并，dishes 只执行一条 UPDATE"""
+    from sqlalchemy import event
+    ids = []
+    for qty in (1, 2, 3):
+        res = client.post("/api/orders", json={"user_id": test_user.user_id, "items": [
+            {"dish_id": test_dishes[0].dish_id, "qty": qty}, {"dish_id": test_dishes[1].dish_id, "qty": 1},
+        ]})
+        ids.append(res.json()["order_id"])
+    client.post(f"/api/admin/orders/{ids[0]}/complete")
+    assert (_stock(db_session, test_dishes[0]), _stock(db_session, test_dishes[1])) == (4, 2)
+
+    statements = []
+    engine = db_session.get_bind()
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        res = client.post("/api/admin/orders/cancel", json={"order_ids": ids, "restock": True})
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert res.json() == {"updated": ids[1:], "skipped": ids[:1]}
+    assert (_stock(db_session, test_dishes[0]), _stock(db_session, test_dishes[1])) == (9, 4)
+    assert sum(s.lstrip().upper().startswith("UPDATE DISHES") for s in statements) == 1
+
+    res = client.post(f"/api/admin/orders/{ids[0]}/cancel", params={"restock": "true"})
+    assert res.status_code == 400
@@ -0,0 +1,140 @@
+"""页面预渲染缓存测试"""
+import gzip
+import os
+import subprocess
+import sys
+import time
+import pytest
+from jinja2 import Environment, FileSystemLoader
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from app.page_cache import PageCache
+
+
+@pytest.fixture
+def page_dir(tmp_path):
+    (tmp_path / "home.html").write_text("<h1>{{ 1 + 1 }} 份</h1>", encoding="utf-8")
+    (tmp_path / "raw.html").write_text("<p>{{ raw }}</p>", encoding="utf-8")
+    return tmp_path
+
+
+def _cache(page_dir, dev_mode=False):
+    env = Environment(loader=FileSystemLoader(str(page_dir)))
+    return PageCache(env, templates=["home.html"], files={"raw": str(page_dir / "raw.html")}, dev_mode=dev_mode)
+
+
+def _client(cache):
+    async def home(request):
+        return cache.response("home.html", request)
+    return TestClient(Starlette(routes=[Route("/", home)]))
+
+
+def _touch(path, text):
+    path.write_text(text, encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 5))
+
+
+def test_renders_once_with_etag(page_dir):
+    """测试模板渲染为字节，静态文件原样发送，ETag 命中返回 304"""
+    cache = _cache(page_dir)
+    cache.warm()
+    assert cache.get("home.html").body == "<h1>2 份</h1>".encode("utf-8")
+    assert cache.get("raw").body == b"<p>{{ raw }}</p>"
+
+    client = _client(cache)
+    response = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/", headers={"If-None-Match": "W/" + etag}).status_code == 304
+    assert client.get("/", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_serves_precompressed_variant(page_dir):
+    """测试按 Accept-Encoding 直接发送预压缩变体"""
+    cache = _cache(page_dir)
+    with _client(cache).stream("GET", "/", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        raw = b"".join(response.iter_raw())
+        etag = response.headers["etag"]
+    assert gzip.decompress(raw) == cache.get("home.html").body
+    assert etag.endswith('-gzip"')
+    assert _client(cache).get("/", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_production_mode_ignores_file_changes(page_dir):
+    cache = _cache(page_dir)
+    before = cache.get("home.html")
+    _touch(page_dir / "home.html", "<h1>changed</h1>")
+    assert cache.get("home.html") is before
+
+
+def test_dev_mode_reloads_on_mtime_change(page_dir):
+    """测试开发模式（无监听线程）按修改时间重新渲染"""
+    cache = _cache(page_dir, dev_mode=True)
+    before = cache.get("home.html")
+    _touch(page_dir / "home.html", "<h1>changed</h1>")
+    after = cache.get("home.html")
+    assert after.body == b"<h1>changed</h1>"
+    assert after.etag != before.etag
+
+
+def test_dev_mode_watcher_invalidates(page_dir):
+    """测试 watchfiles 监听到文件变化后丢弃缓存"""
+    pytest.importorskip("watchfiles")
+    cache = _cache(page_dir, dev_mode=True)
+    cache.get("raw")
+    assert cache.start_watching()
+    try:
+        time.sleep(0.3)
+        (page_dir / "raw.html").write_text("<p>new</p>", encoding="utf-8")
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and "raw" in cache._pages:
+            time.sleep(0.05)
+        assert cache.get("raw").body == b"<p>new</p>"
+    finally:
+        cache.stop_watching()
+
+
+def test_invalidate_by_path(page_dir):
+    cache = _cache(page_dir)
+    cache.warm()
+    cache.invalidate([str(page_dir / "raw.html")])
+    assert set(cache._pages) == {"home.html"}
+    cache.invalidate()
+    assert not cache._pages
+
+
+def test_warm_skips_missing_pages(page_dir, caplog):
+    """测试预渲染时单个页面缺失只记录日志，其余页面照常渲染"""
+    (page_dir / "raw.html").unlink()
+    cache = _cache(page_dir)
+    cache.warm()
+    assert set(cache._pages) == {"home.html"}
+    assert "raw" in caplog.text
+    with pytest.raises(FileNotFoundError):
+        cache.get("raw")
+
+
+def test_app_pages_independent_of_cwd(tmp_path):
+    """测试应用在其他工作目录下启动时仍能找到模板与静态页面"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "from app.main import pages; pages.warm(); print(sorted(pages._pages))"
+    env = {**os.environ, "PYTHONPATH": root}
+    proc = subprocess.run([sys.executable, "-c", code], cwd=str(tmp_path), env=env,
+                          capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == str(sorted(["index.html", "checkout.html", "admin.html", "order_detail.html", "test"]))
+
+
+def test_app_pages(client):
+    """测试应用页面路由返回缓存页面并支持 304"""
+    for path in ("/", "/checkout", "/admin", "/order/1", "/test"):
+        response = client.get(path)
+        assert response.status_code == 200, path
+        assert client.get(path, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
@@ -0,0 +1,77 @@
+"""定价引擎测试：列式整数分计算必须与 Order.total_price() 完全一致"""
+from decimal import Decimal
+from hypothesis import given, settings, strategies as st
+
+from app.models.dish import OptionItem
+from app.models.order import Order, OrderItem
+from app.services import pricing
+from app.services.pricing import OrderPricer, from_cents, line_totals_cents, order_totals_cents, to_cents
+
+
+money = st.decimals(min_value=Decimal("0"), max_value=Decimal("9999.99"), places=2)
+delta = st.decimals(min_value=Decimal("-50"), max_value=Decimal("50"), places=2)
+line = st.tuples(money, st.integers(min_value=1, max_value=99), st.lists(delta, max_size=4))
+orders = st.lists(st.lists(line, min_size=1, max_size=6), max_size=8)
+
+
+def _build_order(lines) -> Order:
+    """用瞬态 ORM 对象构造订单（不入库）"""
+    order = Order()
+    for unit_price, qty, deltas in lines:
+        order.items.append(OrderItem(
+            unit_price=unit_price, qty=qty,
+            selected_options=[OptionItem(price_delta=d) for d in deltas],
+        ))
+    return order
+
+
+@settings(max_examples=200, deadline=None)
+@given(orders)
+def test_order_totals_match_orm(order_lines):
+    """OrderPricer 的行小计与订单总价等于逐对象 Decimal 计算结果"""
+    pricer = OrderPricer()
+    expected_lines, expected_totals = [], {}
+    for key, lines in enumerate(order_lines):
+        order = _build_order(lines)
+        expected_totals[key] = order.total_price()
+        for (unit_price, qty, deltas), item in zip(lines, order.items):
+            pricer.add_line(key, unit_price, qty, sum(deltas, Decimal(0)))
+            expected_lines.append(item.subtotal())
+
+    assert pricer.line_totals() == expected_lines
+    assert pricer.order_totals() == expected_totals
+
+
+@settings(max_examples=100, deadline=None)
+@given(orders)
+def test_pure_python_fallback_matches(order_lines):
+    """未安装 NumPy 时的退化实现与向量化实现结果一致"""
+    index, unit, qty, deltas = [], [], [], []
+    for key, lines in enumerate(order_lines):
+        for unit_price, q, ds in lines:
+            index.append(key)
+            unit.append(to_cents(unit_price))
+            qty.append(q)
+            deltas.append(to_cents(sum(ds, Decimal(0))))
+
+    vectorized = [int(v) for v in order_totals_cents(index, unit, qty, deltas, len(order_lines))]
+    saved, pricing.np = pricing.np, None
+    try:
+        fallback = order_totals_cents(index, unit, qty, deltas, len(order_lines))
+    finally:
+        pricing.np = saved
+    assert fallback == vectorized
+
+
+def test_cents_roundtrip():
+    assert to_cents(Decimal("12.345")) == 1235
+    assert to_cents(None) == 0
+    assert from_cents(1235) == Decimal("12.35")
+    assert [int(v) for v in line_totals_cents([1000], [3], [-150])] == [2550]
+
+
+def test_empty_pricer():
+    pricer = OrderPricer()
+    assert len(pricer) == 0
+    assert pricer.line_totals() == []
+    assert pricer.order_totals() == {}
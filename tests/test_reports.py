@@ -0,0 +1,162 @@
+"""销售汇总与报表测试"""
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import event
+from app.models.dish import Category, Dish
+from app.models.enums import DishStatus
+from app.models.report import DishDailySales, CategoryHourlySales, StatusDailyStats
+from app.schemas.order import OrderCreate, OrderItemCreate
+from app.services.order_service import OrderService
+from app.services.pricing import to_cents, from_cents
+from app.services.report_service import RollupService, ReportService
+
+
+@pytest.fixture
+def menu(db_session, sample_menu):
+    """两个分类、三道菜，菜品A带加价选项"""
+    hot = sample_menu["category"]
+    drink = Category(name="酒水", sort_order=2)
+    db_session.add(drink)
+    db_session.flush()
+    dish_b = Dish(category_id=hot.category_id, name="菜品B", price=Decimal("12.5"),
+                  stock=100, status=DishStatus.ON_SHELF)
+    dish_c = Dish(category_id=drink.category_id, name="饮料C", price=Decimal("6"),
+                  stock=100, status=DishStatus.ON_SHELF)
+    db_session.add_all([dish_b, dish_c])
+    db_session.commit()
+    return {"user": sample_menu["user"], "dishes": [sample_menu["dish"], dish_b, dish_c],
+            "extra": sample_menu["extra"]}
+
+
+def _order(db_session, menu, lines):
+    return OrderService(db_session).create_order(OrderCreate(
+        user_id=menu["user"].user_id,
+        items=[OrderItemCreate(dish_id=d.dish_id, qty=q, option_item_ids=opts) for d, q, opts in lines],
+    ))
+
+
+def _snapshot(db_session):
+    return {
+        "dish": sorted((r.day, r.dish_id, r.qty, r.order_count, r.revenue_cents)
+                       for r in db_session.query(DishDailySales).all() if r.qty or r.order_count),
+        "category": sorted((r.hour, r.category_id, r.qty, r.revenue_cents)
+                           for r in db_session.query(CategoryHourlySales).all() if r.qty),
+        "status": sorted((r.day, r.status, r.order_count, r.revenue_cents)
+                         for r in db_session.query(StatusDailyStats).all() if r.order_count),
+    }
+
+
+def test_cents_roundtrip():
+    """测试金额与分的互转"""
+    assert to_cents(Decimal("12.345")) == 1235
+    assert from_cents(1235) == Decimal("12.35")
+
+
+def test_rollups_follow_order_lifecycle(db_session, menu):
+    """测试下单、完成、取消时汇总表增量更新"""
+    dish_a, dish_b, dish_c = menu["dishes"]
+    o1 = _order(db_session, menu, [(dish_a, 2, [menu["extra"].item_id]), (dish_a, 1, []), (dish_c, 3, [])])
+    o2 = _order(db_session, menu, [(dish_b, 2, [])])
+    o3 = _order(db_session, menu, [(dish_c, 1, [])])
+    service = OrderService(db_session)
+    service.complete_order(o1.order_id)
+    service.cancel_order(o2.order_id)
+
+    reports = ReportService(db_session)
+    rows = {r.dish_id: r for r in reports.dish_daily()}
+    assert rows[dish_a.dish_id].qty == 3
+    assert rows[dish_a.dish_id].order_count == 1
+    assert rows[dish_a.dish_id].revenue == Decimal("95.00")   # (30 + 2.5) * 2 + 30
+    assert rows[dish_b.dish_id].qty == 0                      # 已取消，扣回
+    assert rows[dish_c.dish_id].qty == 4
+
+    summary = reports.summary()
+    assert summary.order_count == 2
+    assert summary.revenue == o1.total_price + o3.total_price
+    assert summary.by_status == {"Completed": 1, "Submitted": 1, "Cancelled": 1}
+
+    hourly = {r.category_name: r for r in reports.category_hourly()}
+    assert hourly["热菜"].revenue == Decimal("95.00")
+    assert hourly["酒水"].qty == 4
+
+    ranking = reports.dish_ranking(limit=2)
+    assert [r.dish_id for r in ranking] == [dish_a.dish_id, dish_c.dish_id]
+
+
+def test_rebuild_matches_incremental(db_session, menu):
+    """测试从历史重建的汇总与增量维护结果一致"""
+    dish_a, dish_b, dish_c = menu["dishes"]
+    orders = [
+        _order(db_session, menu, [(dish_a, 1, [menu["extra"].item_id]), (dish_b, 2, [])]),
+        _order(db_session, menu, [(dish_c, 5, [])]),
+        _order(db_session, menu, [(dish_b, 1, []), (dish_b, 1, [])]),
+    ]
+    service = OrderService(db_session)
+    service.complete_order(orders[0].order_id)
+    service.cancel_order(orders[2].order_id)
+    incremental = _snapshot(db_session)
+
+    assert RollupService(db_session).rebuild() == 3
+    assert _snapshot(db_session) == incremental
+
+
+def test_rebuild_locks_rollups_before_reading_orders(db_session, menu):
+    """测试重建先清空汇总表（取得写锁）再读取订单：读取期间并发累加的增量不会被覆盖"""
+    _order(db_session, menu, [(menu["dishes"][0], 1, [])])
+    statements = []
+    engine = db_session.get_bind()
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement.lstrip().upper())
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        RollupService(db_session).rebuild()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    first_read = next(i for i, s in enumerate(statements) if s.startswith("SELECT"))
+    assert all(s.startswith("DELETE") for s in statements[:first_read]) and first_read == 3
+
+
+def test_bulk_transitions_match_rebuild(db_session, menu):
+    """测试批量完成/取消的增量汇总与重建结果一致"""
+    dish_a, dish_b, dish_c = menu["dishes"]
+    orders = [
+        _order(db_session, menu, [(dish_a, 1, [menu["extra"].item_id]), (dish_c, 2, [])]),
+        _order(db_session, menu, [(dish_b, 3, [])]),
+        _order(db_session, menu, [(dish_a, 2, []), (dish_b, 1, [])]),
+        _order(db_session, menu, [(dish_c, 1, [])]),
+    ]
+    service = OrderService(db_session)
+    assert service.complete_orders([orders[0].order_id, orders[1].order_id]) == [orders[0].order_id, orders[1].order_id]
+    assert service.cancel_orders([o.order_id for o in orders]) == [orders[2].order_id, orders[3].order_id]
+    incremental = _snapshot(db_session)
+    assert ReportService(db_session).summary().by_status == {"Submitted": 0, "Completed": 2, "Cancelled": 2}
+
+    RollupService(db_session).rebuild()
+    assert _snapshot(db_session) == incremental
+
+
+def test_report_date_range(db_session, menu):
+    """测试报表按日期区间筛选"""
+    _order(db_session, menu, [(menu["dishes"][0], 1, [])])
+    today = datetime.utcnow().date()
+
+    reports = ReportService(db_session)
+    assert len(reports.dish_daily(start=today, end=today + timedelta(days=1))) == 1
+    assert reports.dish_daily(end=today) == []
+
+
+def test_reports_api(client, db_session, menu):
+    """测试报表接口"""
+    _order(db_session, menu, [(menu["dishes"][1], 2, [])])
+
+    res = client.get("/api/admin/reports/summary")
+    assert res.status_code == 200
+    assert res.json()["order_count"] == 1
+    assert Decimal(res.json()["revenue"]) == Decimal("25")
+
+    res = client.get("/api/admin/reports/dishes/top", params={"limit": 5})
+    assert res.json()[0]["dish_name"] == "菜品B"
+    assert client.get("/api/admin/reports/status/daily").json()[0]["status"] == "Submitted"
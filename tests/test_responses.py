@@ -0,0 +1,65 @@
+"""JSON 响应序列化测试：输出须与 FastAPI 默认编码一致"""
+import json
+from datetime import datetime
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from app import responses
+from app.models.dish import Category, Dish
+from app.models.enums import DishStatus
+from app.responses import FastJSONResponse, dumps
+from app.schemas.order import OrderDetailResponse, OrderItemResponse
+
+
+def _detail() -> OrderDetailResponse:
+    return OrderDetailResponse(
+        order_id=1, user_id=2, status="Submitted", total_price=Decimal("25.50"), remark="少辣",
+        created_at=datetime(2024, 5, 1, 12, 30, 5, 123456),
+        items=[OrderItemResponse(id=1, dish_id=3, dish_name="宫保鸡丁", qty=2,
+                                 unit_price=Decimal("12.75"), subtotal=Decimal("25.50"))],
+    )
+
+
+def test_matches_jsonable_encoder():
+    """测试 Decimal / datetime / 嵌套模型的编码结果与 jsonable_encoder 一致"""
+    detail = _detail()
+    expected = jsonable_encoder(detail)
+    assert json.loads(dumps(detail)) == expected
+    assert json.loads(dumps([detail, detail.model_construct(**detail.__dict__)])) == [expected, expected]
+    assert json.loads(dumps({"total": Decimal("0.10"), 1: {"a"}})) == {"total": "0.10", "1": ["a"]}
+
+
+def test_stdlib_fallback_matches(monkeypatch):
+    """测试未安装 orjson 时输出相同"""
+    detail = _detail()
+    fast = dumps(detail)
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(dumps(detail)) == json.loads(fast)
+    assert "宫保鸡丁" in dumps(detail).decode("utf-8")
+
+
+def test_response_class():
+    response = FastJSONResponse({"price": Decimal("1.20")})
+    assert response.body == b'{"price":"1.20"}'
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_endpoints_keep_wire_format(client, db_session):
+    """测试直接返回响应的路由仍输出原有字段与格式"""
+    category = Category(name="格式分类", sort_order=1)
+    db_session.add(category)
+    db_session.flush()
+    dish = Dish(category_id=category.category_id, name="格式菜品", price=Decimal("12.5"),
+                stock=5, status=DishStatus.ON_SHELF)
+    db_session.add(dish)
+    db_session.commit()
+
+    dishes = client.get("/api/dishes").json()
+    assert dishes == [{
+        "dish_id": dish.dish_id, "name": "格式菜品", "price": "12.50", "stock": 5,
+        "status": "OnShelf", "image_url": "", "image_src": "", "version": 1,
+    }]
+    assert client.get(f"/api/dishes/{dish.dish_id}").json() == dishes[0]
+    assert client.get("/api/categories").json() == [
+        {"category_id": category.category_id, "name": "格式分类", "sort_order": 1, "version": 1}
+    ]
+    assert client.get("/api/admin/orders").json() == []
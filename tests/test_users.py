@@ -0,0 +1,86 @@
+"""登录与用户缓存测试"""
+import threading
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import metrics
+from app.db import Base
+from app.models.user import User
+from app.schemas.user import UserResponse
+from app.cache import Cache, MemoryBackend
+from app.services.user_service import UserService, user_cache
+
+
+@pytest.fixture(autouse=True)
+def _clear_user_cache():
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
+
+def test_login_creates_then_hits_cache(client, db_session):
+    """测试首次登录创建用户，再次登录命中缓存且返回同一用户"""
+    metrics.CACHE_REQUESTS.reset()
+    first = client.post("/api/login", json={"username": "kiosk-1"})
+    assert first.status_code == 200
+    assert first.json()["is_admin"] is False
+
+    second = client.post("/api/login", json={"username": "kiosk-1"})
+    assert second.json() == first.json()
+    assert db_session.query(User).filter(User.username == "kiosk-1").count() == 1
+    assert metrics.CACHE_REQUESTS.get(cache="user", result="miss") == 1
+    assert metrics.CACHE_REQUESTS.get(cache="user", result="hit") == 1
+
+
+def test_login_returns_existing_user(db_session):
+    db_session.add(User(username="admin", is_admin=True))
+    db_session.commit()
+    user = UserService(db_session).login("admin")
+    assert user.is_admin is True
+    assert db_session.query(User).count() == 1
+
+
+def test_user_cache_is_bounded_lru():
+    cache = Cache("test.users_lru", backend=MemoryBackend(max_entries=2))
+    for n in range(3):
+        cache.set(f"u{n}", UserResponse(user_id=n, username=f"u{n}", is_admin=False))
+    assert cache.get("u0") is None
+    assert cache.get("u1").user_id == 1     # u1 变为最近使用
+    cache.set("u3", UserResponse(user_id=3, username="u3", is_admin=False))
+    assert cache.get("u2") is None
+    assert {cache.get("u1").user_id, cache.get("u3").user_id} == {1, 3}
+    cache.invalidate(["u1"])
+    assert cache.get("u1") is None and len(cache) == 1
+
+
+def test_concurrent_login_same_name(tmp_path):
+    """测试并发创建同名用户：不触发唯一约束错误，所有请求得到同一个 user_id"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'users.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    barrier = threading.Barrier(8)
+    results, errors = [], []
+
+    def login():
+        db = Session()
+        try:
+            barrier.wait()
+            results.append(UserService(db).login("guest").user_id)
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=login) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert not errors
+        assert len(results) == 8 and len(set(results)) == 1
+        db = Session()
+        assert db.query(User).count() == 1
+        db.close()
+    finally:
+        engine.dispose()